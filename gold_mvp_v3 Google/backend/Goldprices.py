@@ -4,14 +4,29 @@ VitaNova Gold Price API Server with Authentication
 Main Flask application combining gold price APIs and user authentication
 """
 
+import time
+_import_started = time.perf_counter()
+
 import http.client
 import json
 import csv
 import os
-import requests
+from bisect import bisect_left, bisect_right
+import signal
+import sys
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from datetime import datetime, timedelta
+from shared_prices import get_segment, close_segment
+from price_store import DAILY_CSV_PATH, HISTORICAL_CSV_PATH, price_store
+from price_quotes import issue_quote
+from lifecycle import mark_ready, is_ready, register_shutdown_hook, run_shutdown_hooks
+from app_logging import get_logger
+
+logger = get_logger('prices')
+
+# Per-phase startup timings in milliseconds (reported by diagnose.py)
+STARTUP_TIMINGS = {'imports': (time.perf_counter() - _import_started) * 1000}
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -31,15 +46,15 @@ except ImportError:
     import secrets
     app.config['SECRET_KEY'] = secrets.token_hex(32)
 
-# CSV file paths for gold prices
-DAILY_CSV_PATH = os.path.join(BASE_DIR, 'DailyGold.csv')
-HISTORICAL_CSV_PATH = os.path.join(BASE_DIR, 'HistoricalMVPGold.csv')
+# CSV file paths for gold prices (parsed and cached by price_store)
 LAST_HISTORICAL_MONTH_FILE = os.path.join(BASE_DIR, 'last_historical_month.txt')
 
-# Fixed USD to AED exchange rate (pegged currency)
-USD_TO_AED_RATE = 3.6728
-# Grams per troy ounce
-GRAMS_PER_OUNCE = 31.1035
+# Fixed USD to AED exchange rate (pegged currency) and grams per troy ounce
+try:
+    from config import USD_TO_AED_RATE, GRAMS_PER_OUNCE
+except ImportError:
+    USD_TO_AED_RATE = 3.6728
+    GRAMS_PER_OUNCE = 31.1035
 
 # APISED Gold API Configuration
 # Host: gold.g.apised.com
@@ -51,28 +66,108 @@ APISED_API_KEY = "sk_FfA3E90701ED46464540dAE68655797368A43C7Ec9bA7352"
 # Standard number of data points for charts
 CHART_DATA_POINTS = 8
 CHART_DATA_POINTS_1D = 9
+# Largest ?points= for a downsampled CUSTOM chart
+MAX_CHART_POINTS = 1000
+
+# /price serves the shared latest tick instead of calling APISED while it is
+# younger than this (0 = always call APISED)
+PRICE_CACHE_SECONDS = int(os.environ.get('PRICE_CACHE_SECONDS', 30))
+
+# /price/history responses are reused for this long while no new tick arrives
+HISTORY_CACHE_SECONDS = int(os.environ.get('HISTORY_CACHE_SECONDS', 60))
+# Set to 0 to skip the order warm-up (journal replay, partition sealing,
+# holdings build), e.g. for diagnose.py, which must not touch order data
+WARM_ORDERS = os.environ.get('VITANOVA_WARM_ORDERS', '1') != '0'
+# Timeframes built during warm-up so the first chart request is a cache hit
+WARM_TIMEFRAMES = ['1D', '1W', '1M', '6M', '1Y', '5Y', '15Y']
+
+# /price/at: most timestamps per request, and how far (days) the nearest
+# recorded price may be before the price is interpolated instead (0 = no limit)
+MAX_PRICE_AT_BATCH = int(os.environ.get('MAX_PRICE_AT_BATCH', 1000))
+PRICE_AT_TOLERANCE_DAYS = float(os.environ.get('PRICE_AT_TOLERANCE_DAYS', 1))
 
 
 # ============== AUTHENTICATION INITIALIZATION ==============
+# GCS client and account CSVs are only touched on first auth request
+_phase_started = time.perf_counter()
 try:
     from auth_routes import init_auth
     init_auth(app)
     AUTH_ENABLED = True
-    print("🔐 Authentication system enabled")
+    logger.info("Authentication system enabled")
 except ImportError as e:
     AUTH_ENABLED = False
-    print(f"⚠️ Authentication system not available: {e}")
+    logger.warning("Authentication system not available: %s", e)
+STARTUP_TIMINGS['auth_init'] = (time.perf_counter() - _phase_started) * 1000
 
 
 # ============== ORDERS INITIALIZATION ==============
+# orders.csv is created on the first order, not at import
+_phase_started = time.perf_counter()
 try:
-    from orders_handler import init_orders
+    from orders_handler import init_orders, warm_orders
     init_orders(app)
     ORDERS_ENABLED = True
-    print("📦 Orders system enabled")
+    logger.info("Orders system enabled")
 except ImportError as e:
     ORDERS_ENABLED = False
-    print(f"⚠️ Orders system not available: {e}")
+    logger.warning("Orders system not available: %s", e)
+STARTUP_TIMINGS['orders_init'] = (time.perf_counter() - _phase_started) * 1000
+
+
+# ============== PRICE ALERTS INITIALIZATION ==============
+# price_alerts.csv is read on the first tick or alert request
+try:
+    from price_alerts import init_alerts, check_price_alerts
+    init_alerts(app)
+    ALERTS_ENABLED = True
+except ImportError as e:
+    ALERTS_ENABLED = False
+    logger.warning("Price alerts not available: %s", e)
+
+
+# ============== ANALYTICS INITIALIZATION ==============
+# Rolling windows are built on the first /price/analytics request
+try:
+    from price_analytics import init_analytics
+    init_analytics(app)
+    ANALYTICS_ENABLED = True
+except ImportError as e:
+    ANALYTICS_ENABLED = False
+    logger.warning("Price analytics not available: %s", e)
+
+
+# ============== QUOTE TABLE INITIALIZATION ==============
+# The table is built on the first request after each tick
+try:
+    from quote_table import init_quote_table
+    init_quote_table(app)
+    QUOTE_TABLE_ENABLED = True
+except ImportError as e:
+    QUOTE_TABLE_ENABLED = False
+    logger.warning("Quote table not available: %s", e)
+
+
+# ============== FX INITIALIZATION ==============
+# Rates start from the pegs in config.py and refresh in the background
+try:
+    from fx_rates import fx_rates, SUPPORTED_CURRENCIES
+    FX_ENABLED = True
+except ImportError as e:
+    FX_ENABLED = False
+    SUPPORTED_CURRENCIES = ('AED',)
+    logger.warning("FX conversion not available: %s", e)
+
+
+# ============== BACKTEST INITIALIZATION ==============
+# Needs NumPy; the price arrays are built on the first backtest request
+try:
+    from price_backtest import init_backtest
+    init_backtest(app)
+    BACKTEST_ENABLED = True
+except ImportError as e:
+    BACKTEST_ENABLED = False
+    logger.warning("Backtest calculator not available: %s", e)
 
 
 # ============== GOLD PRICE HELPER FUNCTIONS ==============
@@ -86,7 +181,7 @@ def get_last_logged_historical_month():
                 if content:
                     return content  # Format: MM/YYYY
     except Exception as e:
-        print(f"⚠️ Error reading last historical month: {e}")
+        logger.warning("Error reading last historical month: %s", e)
     return None
 
 
@@ -95,9 +190,9 @@ def set_last_logged_historical_month(month_str):
     try:
         with open(LAST_HISTORICAL_MONTH_FILE, 'w') as f:
             f.write(month_str)
-        print(f"📝 Updated last historical month to: {month_str}")
+        logger.info("Updated last historical month to %s", month_str)
     except Exception as e:
-        print(f"❌ Error writing last historical month: {e}")
+        logger.error("Error writing last historical month: %s", e)
 
 
 def append_to_historical_csv(price_aed_per_gram):
@@ -127,17 +222,18 @@ def append_to_historical_csv(price_aed_per_gram):
                 round(price_g_aed, 9)
             ])
         
-        print(f"📊 HISTORICAL PRICE LOGGED for {month_str}:")
-        print(f"   - Price/gram (AED): {price_g_aed:.2f}")
-        print(f"   - Price/gram (USD): {price_g_usd:.6f}")
-        print(f"   - Price/oz (USD): {price_oz_usd:.2f}")
+        logger.info("Historical price logged for %s", month_str, extra={'fields': {
+            'price_g_aed': round(price_g_aed, 2),
+            'price_g_usd': round(price_g_usd, 6),
+            'price_oz_usd': round(price_oz_usd, 2)
+        }})
         
         # Update the tracking file
         set_last_logged_historical_month(month_str)
         
         return True
     except Exception as e:
-        print(f"❌ Error appending to historical CSV: {e}")
+        logger.error("Error appending to historical CSV: %s", e)
         return False
 
 
@@ -160,9 +256,8 @@ def check_and_log_monthly_historical(price_aed_per_gram):
         # Already logged this month, skip
         return False
     
-    print(f"\n🗓️ First day of {current_month_str} detected!")
-    print(f"   Last logged month: {last_logged_month or 'None'}")
-    print(f"   Logging first price of the month to historical CSV...")
+    logger.info("First day of %s: logging first price of the month to historical CSV",
+                current_month_str, extra={'fields': {'last_logged_month': last_logged_month}})
     
     # Log to historical CSV
     return append_to_historical_csv(price_aed_per_gram)
@@ -177,80 +272,32 @@ def append_price_to_csv(price):
         writer = csv.writer(csvfile)
         writer.writerow([timestamp, f"{price:.2f}"])
     
-    print(f"✅ Price {price:.2f} AED/gram appended with timestamp {timestamp}")
+    logger.info("Price appended to DailyGold.csv",
+                extra={'fields': {'price': round(price, 2), 'csv_timestamp': timestamp}})
+    
+    # Share the tick with every worker
+    segment = get_segment()
+    previous = segment.read() if segment else None
+    if segment:
+        segment.publish(now.replace(microsecond=0), round(price, 2))
+    
+    # Fire the alerts this tick crossed since the previous one
+    if ALERTS_ENABLED and previous:
+        check_price_alerts(round(previous['price'], 2), round(price, 2))
     
     # Check if we need to log to historical CSV (first price of the month)
     check_and_log_monthly_historical(price)
 
 
-def parse_daily_timestamp(ts_str):
-    """Parse DailyGold.csv timestamp format: SS/MM/HH/DD/MM/YYYY"""
-    try:
-        parts = ts_str.split('/')
-        if len(parts) == 6:
-            sec, minute, hour, day, month, year = parts
-            return datetime(int(year), int(month), int(day), int(hour), int(minute), int(sec))
-    except:
-        pass
-    return None
-
-
-def parse_historical_date(date_str):
-    """Parse HistoricalMVPGold.csv date format: MM/YYYY"""
-    try:
-        parts = date_str.split('/')
-        if len(parts) == 2:
-            month, year = parts
-            return datetime(int(year), int(month), 1)
-    except:
-        pass
-    return None
-
-
-def load_daily_prices():
-    """Load all prices from DailyGold.csv"""
-    prices = []
-    if not os.path.exists(DAILY_CSV_PATH):
-        return prices
-    
-    with open(DAILY_CSV_PATH, 'r', newline='') as csvfile:
-        reader = csv.reader(csvfile)
-        header = next(reader, None)
-        
-        for row in reader:
-            if len(row) >= 2:
-                ts = parse_daily_timestamp(row[0])
-                try:
-                    price = float(row[1])
-                    if ts:
-                        prices.append({'timestamp': ts, 'price': price})
-                except:
-                    pass
-    
-    return prices
-
-
-def load_historical_prices():
-    """Load all prices from HistoricalMVPGold.csv"""
-    prices = []
-    if not os.path.exists(HISTORICAL_CSV_PATH):
-        return prices
-    
-    with open(HISTORICAL_CSV_PATH, 'r', newline='') as csvfile:
-        reader = csv.reader(csvfile)
-        header = next(reader, None)
-        
-        for row in reader:
-            if len(row) >= 5:
-                ts = parse_historical_date(row[0])
-                try:
-                    price = float(row[4])
-                    if ts:
-                        prices.append({'timestamp': ts, 'price': price})
-                except:
-                    pass
-    
-    return prices
+def init_shared_prices():
+    """Seed the shared price segment from DailyGold.csv if this process created it"""
+    segment = get_segment()
+    if segment is None:
+        return False
+    if segment.created or segment.read() is None:
+        segment.seed(price_store.daily_prices())
+        logger.info("Shared price segment seeded from DailyGold.csv")
+    return True
 
 
 def generate_target_timestamps(timeframe, start_date, end_date, now):
@@ -357,6 +404,107 @@ def interpolate_price(target_ts, all_prices):
     return None
 
 
+def lookup_price(target_ts, all_prices, timestamps, max_tolerance_days=None):
+    """
+    Price at target_ts by the rules of find_closest_price and
+    interpolate_price, in O(log N) using bisect over the sorted timestamps
+    of all_prices (see PriceStore.indexed_prices).
+
+    Returns the closest recorded point when it is within max_tolerance_days
+    (or always, without a tolerance), else the interpolated price.
+    """
+    if not all_prices:
+        return None
+
+    i = bisect_right(timestamps, target_ts)
+    before = all_prices[i - 1] if i > 0 else None   # last point at or before
+    after = all_prices[i] if i < len(all_prices) else None  # first point after
+
+    # Nearest point, earlier one on a tie (the first of equal timestamps)
+    if after is not None and (before is None or after['timestamp'] - target_ts < target_ts - before['timestamp']):
+        closest = after
+    else:
+        closest = all_prices[bisect_left(timestamps, before['timestamp'])]
+    diff = abs((closest['timestamp'] - target_ts).total_seconds())
+    if not max_tolerance_days or diff <= max_tolerance_days * 24 * 60 * 60:
+        return {'timestamp': target_ts, 'price': closest['price'],
+                'actual_timestamp': closest['timestamp'], 'interpolated': False}
+
+    if before and after:
+        total_diff = (after['timestamp'] - before['timestamp']).total_seconds()
+        if total_diff > 0:
+            ratio = (target_ts - before['timestamp']).total_seconds() / total_diff
+            price = before['price'] + (after['price'] - before['price']) * ratio
+            return {'timestamp': target_ts, 'price': price, 'interpolated': True}
+    return {'timestamp': target_ts, 'price': (before or after)['price'], 'interpolated': True}
+
+
+def lttb_downsample(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets: keep `threshold` of the time-ordered
+    price points (first and last included) that best preserve the shape of
+    the line, spikes included, in one pass over the points.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    xs = [p['timestamp'].timestamp() for p in points]
+    ys = [p['price'] for p in points]
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0  # last selected point
+
+    for i in range(threshold - 2):
+        # Average of the next bucket: the third corner of the triangle
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        # The point of this bucket that makes the largest triangle with the last pick
+        ax, ay = xs[a], ys[a]
+        best, best_area = None, -1.0
+        for j in range(int(i * bucket_size) + 1, int((i + 1) * bucket_size) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def parse_request_timestamp(value):
+    """ISO timestamp from a request, as naive local time like the price CSVs"""
+    ts = datetime.fromisoformat(str(value).strip().replace('Z', '').replace('+00:00', ''))
+    return ts.replace(tzinfo=None)
+
+
+def warm_caches():
+    """
+    Load the price CSVs (from the warm-start snapshot when it is still
+    valid), seed the shared segment, index orders.csv and build the standard
+    chart responses, then mark the process ready. With a preloaded app this runs once in the
+    master before workers fork.
+    """
+    if not price_store.load_snapshot():
+        price_store.refresh()
+    register_shutdown_hook('price snapshot', price_store.save_snapshot)
+    init_shared_prices()
+    if ORDERS_ENABLED and WARM_ORDERS:
+        warm_orders()
+    for timeframe in WARM_TIMEFRAMES:
+        price_store.cached_response(
+            ('history', timeframe, None, None), HISTORY_CACHE_SECONDS,
+            lambda: build_price_history(timeframe)
+        )
+    mark_ready()
+    logger.info("Price caches warm", extra={'fields': {'points': len(price_store.all_prices())}})
+
+
 # ============== GOLD PRICE API ROUTES ==============
 
 @app.route("/")
@@ -367,9 +515,16 @@ def home():
         'version': '2.0',
         'auth_enabled': AUTH_ENABLED,
         'endpoints': {
+            'ready': '/ready',
             'gold_price': {
                 '/price': 'Get current gold price',
-                '/price/history': 'Get historical price data',
+                '/price/quote': 'Get a signed checkout price quote',
+                '/price/at': 'Get prices at a batch of timestamps',
+                '/price/table': 'Get prices for every product and unit',
+                '/price/backtest': 'Backtest lump-sum and monthly DCA purchases',
+                '/price/analytics': 'Get SMA, EMA, volatility and returns',
+                '/price/history': 'Get historical price data (?currency=AED|USD|SAR|KWD)',
+                '/fx/rates': 'Get the exchange rates used for ?currency=',
                 '/price/stats': 'Get price statistics'
             },
             'auth': {
@@ -387,9 +542,32 @@ def home():
     })
 
 
+@app.route("/ready")
+def ready():
+    """Readiness probe: 503 until the price caches are warm"""
+    if not is_ready():
+        return jsonify({'ready': False}), 503
+    return jsonify({'ready': True, 'price_points': len(price_store.all_prices())})
+
+
 @app.route("/price")
 def price():
     """Get current gold price from APISED and append to DailyGold.csv"""
+    # Serve the shared latest tick while it is fresh
+    segment = get_segment()
+    if segment and PRICE_CACHE_SECONDS > 0:
+        cached = segment.latest(PRICE_CACHE_SECONDS)
+        if cached:
+            logger.info("Served shared price", extra={'sample_every': 100})
+            return jsonify({
+                "price": round(cached['price'], 2),
+                "timestamp": cached['timestamp'].isoformat(),
+                "currency": "AED",
+                "unit": "gram",
+                "karat": "24k",
+                "source": "gold.g.apised.com"
+            })
+    
     try:
         # APISED API request using http.client (as per their documentation)
         conn = http.client.HTTPSConnection(APISED_API_HOST, timeout=15)
@@ -402,27 +580,21 @@ def price():
             'x-api-key': APISED_API_KEY
         }
         
-        print(f"📡 Fetching from APISED: https://{APISED_API_HOST}{full_endpoint}")
-        
         conn.request("GET", full_endpoint, '', headers)
         res = conn.getresponse()
         
-        print(f"📡 APISED Response Status: {res.status}")
-        
         if res.status != 200:
             error_body = res.read().decode('utf-8')
-            print(f"❌ APISED HTTP Error: {res.status} - {error_body}")
+            logger.error("APISED HTTP error %s", res.status, extra={'fields': {'body': error_body[:200]}})
             return jsonify({"error": f"API returned status {res.status}: {error_body}"}), 500
         
         raw_data = res.read().decode('utf-8')
-        print(f"📡 APISED Raw Response: {raw_data[:500]}...")
-        
         data = json.loads(raw_data)
         conn.close()
         
         if data.get("status") == "error" or "error" in data:
             error_msg = data.get('message') or data.get('error') or 'Unknown error'
-            print(f"❌ APISED Error: {error_msg}")
+            logger.error("APISED error: %s", error_msg)
             return jsonify({"error": error_msg}), 500
         
         # APISED returns data in various formats, try to extract gold price
@@ -461,17 +633,16 @@ def price():
                         break
         
         if gold_price is None:
-            print(f"❌ Could not extract price from APISED response: {data}")
+            logger.error("Could not extract price from APISED response",
+                         extra={'fields': {'response': raw_data[:500]}})
             return jsonify({"error": "Could not extract price from API response", "raw_response": data}), 500
         
         # Ensure price is a number
         gold_price = float(gold_price)
+        logger.info("Fetched price from APISED", extra={'fields': {'price': round(gold_price, 2)}})
         
         append_price_to_csv(gold_price)
         
-        print(f"📊 APISED Response:")
-        print(f"   - Price per gram (24k AED): {gold_price:.2f} AED")
-        
         return jsonify({
             "price": round(gold_price, 2),
             "timestamp": datetime.now().isoformat(),
@@ -481,21 +652,92 @@ def price():
             "source": "gold.g.apised.com"
         })
     except http.client.HTTPException as e:
-        print(f"❌ APISED HTTP Exception: {e}")
+        logger.error("APISED HTTP exception: %s", e)
         return jsonify({"error": f"HTTP error: {str(e)}"}), 500
     except TimeoutError:
-        print(f"❌ APISED Timeout")
+        logger.error("APISED timeout")
         return jsonify({"error": "API request timed out"}), 500
     except ConnectionError as e:
-        print(f"❌ APISED Connection Error: {e}")
+        logger.error("APISED connection error: %s", e)
         return jsonify({"error": f"Connection error: {str(e)}"}), 500
     except Exception as e:
-        print(f"❌ Error fetching price: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error fetching price: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/price/quote")
+def price_quote():
+    """Signed short-lived quote of the latest shared price, for /orders/create"""
+    quote = issue_quote()
+    if quote is None:
+        return jsonify({"error": "No current price to quote, fetch /price first"}), 503
+    return jsonify(quote)
+
+
+@app.route("/price/at", methods=['GET', 'POST'])
+def price_at():
+    """
+    Prices at many timestamps in one request.
+
+    GET  /price/at?ts=2025-06-01T10:30:00&ts=...   (or ts=a,b,c)
+    POST /price/at  {"timestamps": [...], "tolerance_days": 1}
+
+    Each timestamp gets the closest recorded price when one lies within
+    tolerance_days (default PRICE_AT_TOLERANCE_DAYS, 0 = no limit), else
+    a price interpolated between its neighbours, flagged 'interpolated'.
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        raw = body.get('timestamps')
+        tolerance = body.get('tolerance_days', PRICE_AT_TOLERANCE_DAYS)
+    else:
+        raw = [v for arg in request.args.getlist('ts') for v in arg.split(',') if v.strip()]
+        tolerance = request.args.get('tolerance_days', PRICE_AT_TOLERANCE_DAYS)
+
+    if not isinstance(raw, list) or not raw:
+        return jsonify({'error': 'timestamps must be a non-empty list'}), 400
+    if len(raw) > MAX_PRICE_AT_BATCH:
+        return jsonify({'error': f'At most {MAX_PRICE_AT_BATCH} timestamps per request'}), 400
+    try:
+        tolerance = float(tolerance)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'tolerance_days must be a number'}), 400
+
+    targets = []
+    invalid = []
+    for index, value in enumerate(raw):
+        try:
+            targets.append(parse_request_timestamp(value))
+        except (TypeError, ValueError):
+            invalid.append(index)
+    if invalid:
+        return jsonify({'error': 'Invalid timestamp, use ISO 8601', 'invalid_indexes': invalid[:20]}), 400
+
+    all_prices, timestamps = price_store.indexed_prices()
+    data = []
+    for value, target_ts in zip(raw, targets):
+        point = lookup_price(target_ts, all_prices, timestamps, tolerance)
+        entry = {
+            'requested': value,
+            'timestamp': target_ts.isoformat(),
+            'price': round(point['price'], 2) if point else None,
+            'interpolated': point['interpolated'] if point else False
+        }
+        if point and 'actual_timestamp' in point:
+            entry['actual_timestamp'] = point['actual_timestamp'].isoformat()
+        data.append(entry)
+
+    return jsonify({
+        'count': len(data),
+        'interpolated_count': sum(1 for d in data if d['interpolated']),
+        'tolerance_days': tolerance,
+        'currency': 'AED',
+        'unit': 'gram',
+        'karat': '24k',
+        'data': data
+    })
+
+
 @app.route("/price/history")
 def price_history():
     """Get historical price data for charts from CSV files."""
@@ -503,7 +745,52 @@ def price_history():
     
     start_date_param = request.args.get('start_date')
     end_date_param = request.args.get('end_date')
+    currency = request.args.get('currency', 'AED').upper()
+    if currency not in SUPPORTED_CURRENCIES:
+        return jsonify({'error': f"Unsupported currency, use one of: {', '.join(SUPPORTED_CURRENCIES)}"}), 400
     
+    # CUSTOM only: every recorded price in the range, downsampled to this many points
+    points = None
+    if timeframe == 'CUSTOM' and request.args.get('points'):
+        try:
+            points = int(request.args.get('points'))
+        except ValueError:
+            points = 0
+        if not 3 <= points <= MAX_CHART_POINTS:
+            return jsonify({'error': f'points must be between 3 and {MAX_CHART_POINTS}'}), 400
+    
+    cache_key = ('history', timeframe, start_date_param, end_date_param)
+    fx_snapshot = None
+    if currency != 'AED':
+        # Converted responses are cached per rate table too, built with the
+        # same (version, rates) snapshot as the key
+        fx_snapshot = fx_rates.snapshot()
+        cache_key += (currency, fx_snapshot[0])
+    if points:
+        cache_key += ('points', points)
+    payload = price_store.cached_response(
+        cache_key, HISTORY_CACHE_SECONDS,
+        lambda: build_price_history(timeframe, start_date_param, end_date_param, currency, points, fx_snapshot)
+    )
+    return jsonify(payload)
+
+
+@app.route("/fx/rates")
+def fx_rates_table():
+    """Exchange rates used to convert prices (?currency= on /price/history)"""
+    if not FX_ENABLED:
+        return jsonify({'error': 'FX conversion not available'}), 503
+    return jsonify(fx_rates.table())
+
+
+def build_price_history(timeframe, start_date_param=None, end_date_param=None, currency='AED', points=None,
+                        fx_snapshot=None):
+    """
+    Build the /price/history response body for a timeframe (prices in
+    `currency`, converted with the fx_rates snapshot when given). With
+    `points`, a CUSTOM range returns that many recorded prices picked by
+    LTTB instead of the evenly spaced nearest points.
+    """
     now = datetime.now()
     
     if timeframe == 'CUSTOM' and start_date_param and end_date_param:
@@ -517,7 +804,7 @@ def price_history():
             if end_date > now:
                 end_date = now
         except Exception as e:
-            print(f"Date parsing error: {e}")
+            logger.warning("Date parsing error: %s", e)
             start_date = datetime(2000, 1, 1)
             end_date = now
     elif timeframe == '1D':
@@ -537,14 +824,20 @@ def price_history():
         start_date = ranges.get(timeframe, ranges['1M'])
         end_date = now
     
-    historical = load_historical_prices()
-    daily = load_daily_prices()
-    all_prices = historical + daily
-    all_prices.sort(key=lambda x: x['timestamp'])
-    
-    targets = generate_target_timestamps(timeframe, start_date, end_date, now)
+    all_prices = fx_rates.converted_prices(currency, fx_snapshot) if currency != 'AED' else price_store.all_prices()
     
-    result_data = []
+    if timeframe == 'CUSTOM' and points:
+        # Only the prices inside the range are visited (bisect for the bounds)
+        lo = bisect_left(all_prices, start_date, key=lambda p: p['timestamp'])
+        hi = bisect_right(all_prices, end_date, key=lambda p: p['timestamp'])
+        targets = []
+        result_data = [
+            {'timestamp': p['timestamp'].isoformat(), 'price': round(p['price'], 2)}
+            for p in lttb_downsample(all_prices[lo:hi], points)
+        ]
+    else:
+        targets = generate_target_timestamps(timeframe, start_date, end_date, now)
+        result_data = []
     
     for target_info in targets:
         target_ts = target_info['timestamp']
@@ -633,9 +926,12 @@ def price_history():
         period_change_percent = 0
     
     expected_points = CHART_DATA_POINTS_1D if timeframe == '1D' else CHART_DATA_POINTS
+    if timeframe == 'CUSTOM' and points:
+        expected_points = points
     
-    return jsonify({
+    return {
         'timeframe': timeframe,
+        'currency': currency,
         'count': len(result_data),
         'expected_points': expected_points,
         'start_date': start_date.isoformat(),
@@ -643,13 +939,32 @@ def price_history():
         'period_change': round(period_change, 2) if period_change is not None else None,
         'period_change_percent': round(period_change_percent, 2) if period_change_percent is not None else None,
         'data': result_data
-    })
+    }
 
 
 @app.route("/price/stats")
 def price_stats():
-    """Get price statistics from CSV data"""
-    daily_prices = load_daily_prices()
+    """Get price statistics from the shared segment, falling back to CSV data"""
+    segment = get_segment()
+    shared = segment.stats() if segment else None
+    if shared:
+        current = shared['current']
+        yesterday_close = shared['yesterday_close']
+        change = None
+        change_percent = None
+        if current and yesterday_close:
+            change = current - yesterday_close
+            change_percent = (change / yesterday_close) * 100
+        
+        return jsonify({
+            'current': current,
+            'today_high': shared['today_high'],
+            'today_low': shared['today_low'],
+            'change': round(change, 2) if change else None,
+            'change_percent': round(change_percent, 2) if change_percent else None
+        })
+    
+    daily_prices = price_store.daily_prices()
     
     if not daily_prices:
         return jsonify({
@@ -688,6 +1003,13 @@ def price_stats():
     })
 
 
+# ============== CACHE WARM-UP ==============
+_phase_started = time.perf_counter()
+warm_caches()
+STARTUP_TIMINGS['warm_caches'] = (time.perf_counter() - _phase_started) * 1000
+STARTUP_TIMINGS['total'] = (time.perf_counter() - _import_started) * 1000
+
+
 # ============== MAIN ==============
 
 if __name__ == "__main__":
@@ -710,11 +1032,21 @@ if __name__ == "__main__":
     if ORDERS_ENABLED:
         print("📦 Orders endpoints available at /orders/*")
     
+    if ALERTS_ENABLED:
+        print("🔔 Price alert endpoints available at /alerts/*")
+    
     print("✅ Server ready on http://127.0.0.1:5000")
     print("\n📍 Gold Price Endpoints:")
     print("  GET  /price - Fetch current price from APISED")
     print("  GET  /price/history?timeframe=1D - Get chart data points")
     print("  GET  /price/stats - Get today's statistics")
+    print("  GET  /price/at?ts=... - Get prices at a batch of timestamps")
+    if QUOTE_TABLE_ENABLED:
+        print("  GET  /price/table - Get prices for every product and unit")
+    if ANALYTICS_ENABLED:
+        print("  GET  /price/analytics?sma=20&ema=12,26 - Get moving averages and volatility")
+    if BACKTEST_ENABLED:
+        print("  GET  /price/backtest?mode=dca&amount=500&start=2010-01 - Backtest purchases")
     
     if ORDERS_ENABLED:
         print("\n📦 Order Management Endpoints:")
@@ -729,5 +1061,15 @@ if __name__ == "__main__":
         print("  GET  /auth/me - Get current user info")
         print("  GET  /auth/check - Check auth status")
     
+    print("\n⚠️ Development server only. In production run:")
+    print("  gunicorn -c gunicorn.conf.py Goldprices:app")
+    
+    # Cloud Run and docker stop send SIGTERM; exit through the shutdown hooks
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
     port = int(os.environ.get('PORT', 8080))
-    app.run(host="0.0.0.0", port=port)
\ No newline at end of file
+    try:
+        app.run(host="0.0.0.0", port=port)
+    finally:
+        run_shutdown_hooks()
+        close_segment(unlink=True)
\ No newline at end of file
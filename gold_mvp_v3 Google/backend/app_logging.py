@@ -0,0 +1,179 @@
+"""
+VitaNova Logging
+================
+Structured, non-blocking logging for the API server.
+
+Request threads only put records on an in-memory queue; a background
+listener formats them as one JSON object per line (the shape Cloud Logging
+parses: severity, message, plus any structured fields) and writes stdout.
+
+Configuration (environment):
+    VITANOVA_LOG_LEVEL    default level, e.g. INFO
+    VITANOVA_LOG_LEVELS   per-module levels, e.g. "prices=WARNING,orders=DEBUG"
+
+Usage:
+    from app_logging import get_logger
+    logger = get_logger('orders')
+    logger.info("Order saved", extra={'fields': {'order_id': oid}})
+    logger.info("Served cached price", extra={'sample_every': 100})
+"""
+
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+ROOT_LOGGER = 'vitanova'
+
+DEFAULT_LEVEL = os.environ.get('VITANOVA_LOG_LEVEL', 'INFO').upper()
+MODULE_LEVELS = os.environ.get('VITANOVA_LOG_LEVELS', '')
+
+# Records kept in memory while the writer catches up; beyond this they are dropped
+QUEUE_SIZE = 10000
+
+_setup_lock = threading.Lock()
+_queue_handler = None
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, severity, logger, message, fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'severity': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        sampled = getattr(record, 'sampled', None)
+        if sampled:
+            entry['sampled_1_in'] = sampled
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Pass only 1 in N records that carry extra={'sample_every': N},
+    counted per logger and message template. Other records always pass.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        every = getattr(record, 'sample_every', None)
+        if not every or every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % every:
+            return False
+        record.sampled = every
+        return True
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def prepare(self, record):
+        # Resolve the message now but keep the traceback separate for the JSON
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def _parse_module_levels(spec):
+    """'prices=WARNING,orders=DEBUG' -> {'vitanova.prices': 'WARNING', ...}"""
+    levels = {}
+    for part in spec.split(','):
+        if '=' in part:
+            name, level = part.split('=', 1)
+            name = name.strip()
+            if not name.startswith(ROOT_LOGGER):
+                name = f"{ROOT_LOGGER}.{name}"
+            levels[name] = level.strip().upper()
+    return levels
+
+
+def _start_listener():
+    """Start the background writer on a fresh queue (also used after fork)"""
+    global _listener
+    log_queue = queue.Queue(QUEUE_SIZE)
+    _queue_handler.queue = log_queue
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+
+def setup_logging():
+    """
+    Configure the 'vitanova' logger tree once per process.
+    Safe to call repeatedly; workers forked from a preloaded master restart
+    the writer thread automatically.
+    """
+    global _queue_handler
+    with _setup_lock:
+        if _queue_handler is not None:
+            return
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(DEFAULT_LEVEL)
+        root.propagate = False
+        for name, level in _parse_module_levels(MODULE_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _queue_handler = _NonBlockingQueueHandler(queue.Queue(QUEUE_SIZE))
+        _queue_handler.addFilter(SamplingFilter())
+        root.addHandler(_queue_handler)
+        _start_listener()
+
+        # Threads do not survive fork: give each worker its own writer
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_start_listener)
+
+        # Registered first so it runs last, after the other hooks have logged
+        from lifecycle import register_shutdown_hook
+        register_shutdown_hook('logging', flush_logging)
+
+
+def flush_logging():
+    """Write out everything still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name):
+    """Get a module logger under the 'vitanova' tree, configuring logging if needed"""
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
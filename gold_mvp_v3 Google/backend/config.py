@@ -40,10 +40,20 @@ HCAPTCHA_SECRET_KEY = os.environ.get('HCAPTCHA_SECRET_KEY') or '0x00000000000000
 # ============== TOKEN EXPIRATION ==============
 EMAIL_VERIFICATION_EXPIRATION = 3600  # 1 hour in seconds
 PASSWORD_RESET_EXPIRATION = 1800  # 30 minutes in seconds
+PRICE_QUOTE_EXPIRATION = 900  # 15 minutes, the checkout price lock
+PRICE_ALERT_CONFIRM_EXPIRATION = 86400  # 24 hours to confirm a price alert subscription
 
 # ============== CSV PATHS ==============
 EMAIL_PENDING_CSV = os.path.join(BASE_DIR, 'emails_pending_verification.csv')
 PASSWORD_RESET_CSV = os.path.join(BASE_DIR, 'password_reset_requests.csv')
+PRICE_ALERT_EMAIL_CSV = os.environ.get('VITANOVA_PRICE_ALERT_EMAILS', os.path.join(BASE_DIR, 'price_alert_emails.csv'))
+PRICE_ALERT_CONFIRM_CSV = os.environ.get('VITANOVA_PRICE_ALERT_CONFIRMATIONS',
+                                         os.path.join(BASE_DIR, 'price_alert_confirmations.csv'))
+
+# ============== PRICING ==============
+USD_TO_AED_RATE = 3.6728  # Fixed USD to AED exchange rate (pegged currency)
+GRAMS_PER_OUNCE = 31.1035  # Grams per troy ounce
+VAT_RATE = 0.05  # UAE VAT, charged on the gold cost
 
 # ============== PASSWORD REQUIREMENTS ==============
 PASSWORD_MIN_LENGTH = 8
@@ -2,16 +2,87 @@
 VitaNova Diagnostic Script
 ===========================
 Run this to see the exact error when starting the server
+
+    python diagnose.py            # import checks + startup timing report
+    python diagnose.py --startup  # startup timing report only
 """
 
 import sys
 import os
+import time
+import importlib
+import subprocess
 
 # Change to backend directory
-backend_dir = r'C:\Users\yehia\Downloads\gold_mvp_v2\backend'
+backend_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(backend_dir)
 sys.path.insert(0, backend_dir)
 
+# Cold-start budget for importing Goldprices (imports + init + warm-up)
+COLD_START_BUDGET_MS = float(os.environ.get('COLD_START_BUDGET_MS', 1500))
+
+# Imported in this order so each line shows only the cost it adds
+STARTUP_MODULES = [
+    'flask',
+    'flask_cors',
+    'config',
+    'lifecycle',
+    'shared_prices',
+    'price_store',
+    'orders_handler',
+    'auth_routes',
+]
+
+
+def startup_report():
+    """
+    Time a cold start in this (fresh) interpreter: each backend module's
+    import, then Goldprices' own init phases. The order warm-up is skipped
+    (VITANOVA_WARM_ORDERS=0) so the report never writes order data.
+    Returns True if within budget.
+    """
+    print("=" * 70)
+    print("VITANOVA STARTUP TIMING")
+    print("=" * 70)
+
+    started = time.perf_counter()
+    print("\nImports (first import pays for its dependencies):")
+    for name in STARTUP_MODULES:
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            status = ""
+        except Exception as e:
+            status = f"  ❌ {type(e).__name__}: {e}"
+        print(f"  {name:<20} {(time.perf_counter() - t0) * 1000:8.1f} ms{status}")
+
+    t0 = time.perf_counter()
+    goldprices = importlib.import_module('Goldprices')
+    goldprices_ms = (time.perf_counter() - t0) * 1000
+    total_ms = (time.perf_counter() - started) * 1000
+
+    print("\nGoldprices init phases:")
+    for phase, ms in goldprices.STARTUP_TIMINGS.items():
+        print(f"  {phase:<20} {ms:8.1f} ms")
+    print(f"  {'(module total)':<20} {goldprices_ms:8.1f} ms")
+
+    # The report used its own price segment; remove it
+    importlib.import_module('shared_prices').close_segment(unlink=True)
+
+    within_budget = total_ms <= COLD_START_BUDGET_MS
+    print(f"\nCold start: {total_ms:.1f} ms / budget {COLD_START_BUDGET_MS:.0f} ms "
+          f"{'✅ OK' if within_budget else '❌ OVER BUDGET'}")
+    print("=" * 70)
+    return within_budget
+
+
+if '--startup' in sys.argv:
+    # Keep the timing run away from a live server's shared price segment
+    os.environ['VITANOVA_PRICE_SHM'] = f"vitanova_diag_{os.getpid()}"
+    # Time the imports, not the journal replay / partition sealing on live orders
+    os.environ['VITANOVA_WARM_ORDERS'] = '0'
+    sys.exit(0 if startup_report() else 1)
+
 print("=" * 70)
 print("VITANOVA SERVER DIAGNOSTIC")
 print("=" * 70)
@@ -60,3 +131,7 @@ else:
     print("Share this output to get help fixing it.")
 
 print("=" * 70)
+
+# Timing needs a fresh interpreter; the import checks above already loaded modules
+print()
+subprocess.run([sys.executable, os.path.abspath(__file__), '--startup'])
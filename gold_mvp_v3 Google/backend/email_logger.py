@@ -7,7 +7,10 @@ Log emails to CSV for later batch sending/verification
 import csv
 import os
 from datetime import datetime
-from config import EMAIL_PENDING_CSV, PASSWORD_RESET_CSV
+from config import EMAIL_PENDING_CSV, PASSWORD_RESET_CSV, PRICE_ALERT_EMAIL_CSV, PRICE_ALERT_CONFIRM_CSV
+from app_logging import get_logger
+
+logger = get_logger('email')
 
 
 def ensure_csv_exists(filepath, headers):
@@ -45,10 +48,10 @@ def log_verification_email(email, username, token):
                 '',  # sent_at (empty until sent)
                 ''   # verified_at (empty until verified)
             ])
-        print(f"📧 Verification email logged for: {email}")
+        logger.info("Verification email logged", extra={'fields': {'email': email}})
         return True
     except Exception as e:
-        print(f"❌ Error logging verification email: {e}")
+        logger.error("Error logging verification email: %s", e)
         return False
 
 
@@ -77,10 +80,84 @@ def log_password_reset(email, token):
                 '',  # sent_at
                 ''   # used_at
             ])
-        print(f"🔑 Password reset logged for: {email}")
+        logger.info("Password reset logged", extra={'fields': {'email': email}})
+        return True
+    except Exception as e:
+        logger.error("Error logging password reset: %s", e)
+        return False
+
+
+def log_price_alert(email, alert_id, direction, threshold, price):
+    """
+    Log a triggered price alert email to CSV
+    
+    Args:
+        email: Subscriber's email address
+        alert_id: The alert that fired
+        direction: 'above' or 'below'
+        threshold: Alert threshold (AED/gram)
+        price: Price that crossed it (AED/gram)
+        
+    Returns:
+        bool: True if logged successfully
+    """
+    headers = ['email', 'alert_id', 'direction', 'threshold', 'price', 'timestamp', 'status', 'sent_at']
+    ensure_csv_exists(PRICE_ALERT_EMAIL_CSV, headers)
+    
+    try:
+        with open(PRICE_ALERT_EMAIL_CSV, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                email,
+                alert_id,
+                direction,
+                threshold,
+                f"{price:.2f}",
+                datetime.now().isoformat(),
+                'pending',
+                ''  # sent_at
+            ])
+        logger.info("Price alert email logged", extra={'fields': {'email': email, 'alert_id': alert_id}})
+        return True
+    except Exception as e:
+        logger.error("Error logging price alert email: %s", e)
+        return False
+
+
+def log_price_alert_confirmation(email, alert_id, direction, threshold, token):
+    """
+    Log a price alert confirmation email to CSV
+    
+    Args:
+        email: Subscriber's email address
+        alert_id: The alert waiting for confirmation
+        direction: 'above' or 'below'
+        threshold: Alert threshold (AED/gram)
+        token: Confirmation token
+        
+    Returns:
+        bool: True if logged successfully
+    """
+    headers = ['email', 'alert_id', 'direction', 'threshold', 'token', 'timestamp', 'status', 'sent_at']
+    ensure_csv_exists(PRICE_ALERT_CONFIRM_CSV, headers)
+    
+    try:
+        with open(PRICE_ALERT_CONFIRM_CSV, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                email,
+                alert_id,
+                direction,
+                threshold,
+                token,
+                datetime.now().isoformat(),
+                'pending',
+                ''  # sent_at
+            ])
+        logger.info("Price alert confirmation logged", extra={'fields': {'email': email, 'alert_id': alert_id}})
         return True
     except Exception as e:
-        print(f"❌ Error logging password reset: {e}")
+        logger.error("Error logging price alert confirmation: %s", e)
         return False
 
 
@@ -122,7 +199,7 @@ def update_verification_status(email, status, column='status'):
         
         return True
     except Exception as e:
-        print(f"❌ Error updating verification status: {e}")
+        logger.error("Error updating verification status: %s", e)
         return False
 
 
@@ -144,7 +221,7 @@ def get_pending_verification_emails():
                 if row.get('status') == 'pending':
                     pending.append(row)
     except Exception as e:
-        print(f"❌ Error reading pending emails: {e}")
+        logger.error("Error reading pending emails: %s", e)
     
     return pending
 
@@ -167,7 +244,7 @@ def get_pending_password_resets():
                 if row.get('status') == 'pending':
                     pending.append(row)
     except Exception as e:
-        print(f"❌ Error reading pending resets: {e}")
+        logger.error("Error reading pending resets: %s", e)
     
     return pending
 
@@ -198,5 +275,5 @@ def mark_reset_as_used(email):
         
         return True
     except Exception as e:
-        print(f"❌ Error marking reset as used: {e}")
+        logger.error("Error marking reset as used: %s", e)
         return False
@@ -0,0 +1,152 @@
+"""
+VitaNova FX Rates
+=================
+Gold prices in SAR, KWD and USD as well as AED.
+
+Rates are kept in a small table (units of each currency per 1 USD) that
+starts from the pegs in config.py and, when VITANOVA_FX_URL is set, is
+refreshed from that URL in the background every FX_REFRESH_SECONDS;
+requests keep using the cached table meanwhile and never wait for it.
+
+A converted price series is one vectorized multiply of the AED price
+array per currency, memoized until the prices or the rates change. For
+USD, months from HistoricalMVPGold.csv use its own Price_g_USD column,
+i.e. the exchange rate of that month rather than today's.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+import requests
+from app_logging import get_logger
+from config import USD_TO_AED_RATE
+from price_store import price_store
+
+logger = get_logger('prices.fx')
+
+SUPPORTED_CURRENCIES = ('AED', 'USD', 'SAR', 'KWD')
+
+# Units per 1 USD until the first refresh (AED and SAR are pegged)
+DEFAULT_USD_RATES = {'USD': 1.0, 'AED': USD_TO_AED_RATE, 'SAR': 3.75, 'KWD': 0.307}
+
+# JSON with {"rates": {"AED": ..., "SAR": ..., "KWD": ...}} against USD (optional)
+FX_RATES_URL = os.environ.get('VITANOVA_FX_URL', '')
+FX_REFRESH_SECONDS = int(os.environ.get('VITANOVA_FX_REFRESH_SECONDS', 3600))
+
+
+class FxRates:
+    """Cached rate table with a background refresh"""
+
+    def __init__(self, url=FX_RATES_URL, refresh_seconds=FX_REFRESH_SECONDS):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        # (version, rates) replaced as one object, so readers never pair a
+        # version with the other version's rates
+        self._snapshot = (0, dict(DEFAULT_USD_RATES))
+        self.updated_at = None
+        self.source = 'default'
+        self._checked_at = 0.0
+        self._refreshing = threading.Lock()
+        self._series = {}  # currency -> (prices version, rates version, converted points)
+        self._series_lock = threading.Lock()
+
+    # ---------- rate table ----------
+
+    @property
+    def version(self):
+        return self._snapshot[0]
+
+    @property
+    def rates(self):
+        return self._snapshot[1]
+
+    def _refresh(self):
+        try:
+            response = requests.get(self.url, timeout=10)
+            response.raise_for_status()
+            fetched = response.json().get('rates', {})
+            version, current = self._snapshot
+            rates = dict(current)
+            for currency in SUPPORTED_CURRENCIES:
+                value = float(fetched.get(currency, 0) or 0)
+                if value > 0:
+                    rates[currency] = value
+            rates['USD'] = 1.0
+            if rates != current:
+                self._snapshot = (version + 1, rates)
+            self.updated_at = time.time()
+            self.source = self.url
+            logger.info("FX rates refreshed", extra={'fields': {c: rates[c] for c in SUPPORTED_CURRENCIES}})
+        except (requests.RequestException, ValueError, AttributeError) as e:
+            logger.warning("FX rates refresh failed, keeping cached rates: %s", e)
+        finally:
+            self._refreshing.release()
+
+    def snapshot(self):
+        """(version, rates) read together, starting a background refresh when it is due"""
+        if self.url and time.time() - self._checked_at >= self.refresh_seconds:
+            if self._refreshing.acquire(blocking=False):
+                self._checked_at = time.time()
+                threading.Thread(target=self._refresh, name='fx-refresh', daemon=True).start()
+        return self._snapshot
+
+    def current(self):
+        """The rate table (see snapshot())"""
+        return self.snapshot()[1]
+
+    def factor(self, currency, snapshot=None):
+        """Multiplier from AED to `currency`"""
+        rates = (snapshot or self.snapshot())[1]
+        return rates[currency] / rates['AED']
+
+    # ---------- converted series ----------
+
+    def converted_prices(self, currency, snapshot=None):
+        """
+        all_prices() in `currency`: same timestamps, converted prices.
+        Memoized until the prices or the rates change.
+
+        Args:
+            snapshot: (version, rates) from snapshot(), when the caller has
+                already keyed something on that version
+        """
+        if currency == 'AED':
+            return price_store.all_prices()
+        snapshot = snapshot or self.snapshot()
+        factor = self.factor(currency, snapshot)
+        # Version read before the prices: if they move on meanwhile, the
+        # entry is stored under the older key and simply rebuilt next time
+        prices_version = price_store.version
+        all_prices, timestamps = price_store.indexed_prices()
+        key = (prices_version, snapshot[0])
+        cached = self._series.get(currency)
+        if cached and cached[0:2] == key and len(cached[2]) == len(all_prices):
+            return cached[2]
+
+        with self._series_lock:
+            aed = np.fromiter((p['price'] for p in all_prices), dtype=np.float64, count=len(all_prices))
+            converted = aed * factor
+            if currency == 'USD':
+                usd = np.fromiter((p.get('price_usd') or np.nan for p in all_prices),
+                                  dtype=np.float64, count=len(all_prices))
+                converted = np.where(np.isnan(usd), converted, usd)
+            points = [{'timestamp': ts, 'price': price} for ts, price in zip(timestamps, converted.tolist())]
+            self._series[currency] = key + (points,)
+        return points
+
+    def table(self):
+        """Rates per 1 AED, for the API"""
+        rates = self.current()
+        return {
+            'base': 'AED',
+            'rates': {c: round(rates[c] / rates['AED'], 6) for c in SUPPORTED_CURRENCIES},
+            'usd_rates': {c: rates[c] for c in SUPPORTED_CURRENCIES},
+            'source': self.source,
+            'updated_at': self.updated_at,
+            'refresh_seconds': self.refresh_seconds if self.url else None
+        }
+
+
+fx_rates = FxRates()
@@ -0,0 +1,68 @@
+"""
+VitaNova Production Server Config
+=================================
+Run with:  gunicorn -c gunicorn.conf.py Goldprices:app
+
+The app is preloaded so the price CSVs, the shared price segment and the
+chart caches are built once in the master and inherited by every worker.
+Threaded workers suit the request mix: most time is spent waiting on the
+APISED call or on small file appends, not on CPU.
+"""
+
+import multiprocessing
+import os
+import secrets
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+
+# One process per core, several threads each for the I/O-bound upstream call
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Load Goldprices (and warm its caches) before forking
+preload_app = True
+
+# APISED calls time out after 15s; leave headroom before the worker is killed
+timeout = 30
+# On SIGTERM, give in-flight requests time to finish their appends
+graceful_timeout = 20
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+# Picked once per master: other instances and restarts start elsewhere
+WORKER_ID_BASE = secrets.randbits(16)
+
+
+def when_ready(server):
+    # Master only, before any worker exists: the one place sealing may run
+    # (opt in with VITANOVA_ORDER_AUTOSEAL=1; otherwise `python order_store.py seal`)
+    from order_store import autoseal
+    try:
+        moved = autoseal()
+        if moved:
+            server.log.info("Sealed %s order rows into monthly partitions", moved)
+    except Exception:
+        server.log.exception("Sealing order partitions failed; orders.csv left as is")
+    server.log.info("VitaNova API ready with %s workers x %s threads", workers, threads)
+
+
+def post_fork(server, worker):
+    # Worker id for order IDs (order_ids.py): ages keep this master's workers
+    # apart, the random base keeps it apart from other masters
+    from order_ids import MAX_WORKERS
+    os.environ['VITANOVA_WORKER_ID'] = str((WORKER_ID_BASE + worker.age) % MAX_WORKERS)
+
+
+def worker_exit(server, worker):
+    # Flush anything the worker still holds (pending appends, snapshots)
+    from lifecycle import run_shutdown_hooks
+    run_shutdown_hooks()
+
+
+def on_exit(server):
+    # Master goes last: remove the shared price segment
+    from shared_prices import close_segment
+    close_segment(unlink=True)
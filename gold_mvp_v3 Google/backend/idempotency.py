@@ -0,0 +1,260 @@
+"""
+VitaNova Idempotency Keys
+=========================
+Replay protection for order writes. A client sends the same
+`Idempotency-Key` header on every retry of one request; the first request
+runs, later ones get its stored response back without touching the order
+store.
+
+Recent keys live in an in-memory LRU; every key is also recorded in a small
+SQLite table (idempotency.db) so a retry that lands on another worker, or
+arrives after a restart, is still recognised.
+
+A key is claimed before the request runs. A retry that arrives while the
+first attempt is still running gets 409; a key reused with a different
+body gets 422. Server errors (5xx) release the key so the client can retry.
+A claim older than IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS with no response
+belongs to a worker that died mid-request, and the next retry takes it over.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, jsonify, current_app
+from app_logging import get_logger
+from store_utils import LocalConnection
+
+logger = get_logger('orders.idempotency')
+
+BASE_DIR = os.path.dirname(__file__)
+
+IDEMPOTENCY_DB = os.environ.get('VITANOVA_IDEMPOTENCY_DB', os.path.join(BASE_DIR, 'idempotency.db'))
+# Keys held in memory per process
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('VITANOVA_IDEMPOTENCY_CACHE', 10000))
+# How long a key is honoured
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('VITANOVA_IDEMPOTENCY_TTL', 24 * 3600))
+# A claim still without a response after this long is abandoned (requests are
+# killed after gunicorn's 30s timeout) and may be taken over by a retry
+IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS = int(os.environ.get('VITANOVA_IDEMPOTENCY_CLAIM_TIMEOUT', 60))
+# Lookup/claim rounds before answering 409 when the key keeps changing hands
+CLAIM_ATTEMPTS = 3
+MAX_KEY_LENGTH = 255
+
+HEADER = 'Idempotency-Key'
+
+
+class IdempotencyStore:
+    """LRU of recent keys in front of the idempotency_keys table"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key          TEXT PRIMARY KEY,
+            fingerprint  TEXT NOT NULL,
+            status       INTEGER,
+            response     TEXT,
+            created_at   REAL NOT NULL,
+            claimed_at   REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_idempotency_created ON idempotency_keys(created_at);
+    """
+
+    def __init__(self, path=IDEMPOTENCY_DB, cache_size=IDEMPOTENCY_CACHE_SIZE,
+                 ttl_seconds=IDEMPOTENCY_TTL_SECONDS, claim_timeout=IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS):
+        self.path = path
+        self.cache_size = cache_size
+        self.ttl_seconds = ttl_seconds
+        self.claim_timeout = claim_timeout
+        self._cache = OrderedDict()   # key -> (fingerprint, status, body, created_at)
+        self._lock = threading.Lock()
+        self._connections = LocalConnection(path)
+        self._ready = False
+        self._ready_lock = threading.Lock()
+        self._last_purge = 0
+
+    # ---------- storage ----------
+
+    def connection(self):
+        """One connection per thread (and per process: never reused across fork)"""
+        return self._connections.get()
+
+    def ensure(self):
+        if self._ready:
+            return
+        with self._ready_lock:
+            if not self._ready:
+                self.connection().executescript(self.SCHEMA)
+                self._ready = True
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _purge_expired(self, now):
+        """Drop expired keys from the table (at most once a minute)"""
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        self.connection().execute(
+            "DELETE FROM idempotency_keys WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+
+    # ---------- protocol ----------
+
+    def lookup(self, key):
+        """
+        Stored entry for a key: (fingerprint, status, body, created_at),
+        with status None while the first request is still running.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+        if entry is None or entry[1] is None:
+            self.ensure()
+            row = self.connection().execute(
+                "SELECT fingerprint, status, response, created_at FROM idempotency_keys WHERE key = ?",
+                (key,)
+            ).fetchone()
+            entry = tuple(row) if row else None
+            if entry is not None and entry[1] is not None:
+                self._remember(key, entry)
+        if entry is not None and now - entry[3] > self.ttl_seconds:
+            return None
+        return entry
+
+    def claim(self, key, fingerprint):
+        """
+        Reserve a key before running the request, or take over an abandoned
+        claim for the same request. False if someone else holds it.
+        """
+        self.ensure()
+        now = time.time()
+        conn = self.connection()
+        self._purge_expired(now)
+        # An expired key may be reused
+        conn.execute(
+            "DELETE FROM idempotency_keys WHERE key = ? AND created_at < ?",
+            (key, now - self.ttl_seconds)
+        )
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO idempotency_keys (key, fingerprint, created_at, claimed_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, fingerprint, now, now)
+        )
+        if cursor.rowcount == 1:
+            return True
+        cursor = conn.execute(
+            "UPDATE idempotency_keys SET claimed_at = ? WHERE key = ? AND fingerprint = ? "
+            "AND status IS NULL AND claimed_at < ?",
+            (now, key, fingerprint, now - self.claim_timeout)
+        )
+        if cursor.rowcount == 1:
+            logger.warning("Took over an abandoned idempotency key", extra={'fields': {'key': key}})
+            return True
+        return False
+
+    def complete(self, key, fingerprint, status, body):
+        """Store the response for a claimed key"""
+        now = time.time()
+        self.connection().execute(
+            "UPDATE idempotency_keys SET status = ?, response = ? WHERE key = ?",
+            (status, body, key)
+        )
+        self._remember(key, (fingerprint, status, body, now))
+
+    def release(self, key):
+        """Give up a claimed key (the request failed and may be retried)"""
+        self.connection().execute(
+            "DELETE FROM idempotency_keys WHERE key = ? AND status IS NULL", (key,)
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store():
+    """Process-wide idempotency store (created on first use)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = IdempotencyStore()
+    return _store
+
+
+def _replay(status, body):
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Honour the Idempotency-Key header on a JSON POST view.
+    Requests without the header run as before.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER, '').strip()
+        if request.method != 'POST' or not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'success': False, 'error': f'{HEADER} is too long'}), 400
+
+        key = f"{request.path}:{key}"
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        store = get_idempotency_store()
+
+        try:
+            claimed = False
+            for _ in range(CLAIM_ATTEMPTS):
+                entry = store.lookup(key)
+                if entry is not None and entry[1] is not None:
+                    break  # answered: replay it
+                if store.claim(key, fingerprint):
+                    claimed, entry = True, None
+                    break
+                # Held by another request, or released meanwhile: look again
+        except sqlite3.Error as e:
+            # Dedupe is best effort: never block orders on it
+            logger.error("Idempotency store unavailable: %s", e)
+            return view(*args, **kwargs)
+
+        if not claimed:
+            if entry is None:
+                return jsonify({'success': False, 'error': 'Original request is still in progress'}), 409
+            stored_fingerprint, status, body, _ = entry
+            if stored_fingerprint != fingerprint:
+                return jsonify({'success': False, 'error': f'{HEADER} was used with a different request'}), 422
+            if status is None:
+                return jsonify({'success': False, 'error': 'Original request is still in progress'}), 409
+            logger.info("Replayed idempotent response", extra={'fields': {'key': key, 'status': status}})
+            return _replay(status, body)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            store.release(key)
+            raise
+
+        try:
+            if response.status_code >= 500:
+                store.release(key)
+            else:
+                store.complete(key, fingerprint, response.status_code, response.get_data(as_text=True))
+        except sqlite3.Error as e:
+            logger.error("Could not record idempotent response: %s", e)
+        return response
+
+    return wrapper
@@ -0,0 +1,53 @@
+"""
+VitaNova Server Lifecycle
+=========================
+Readiness flag and graceful-shutdown hooks shared by the dev server
+(Goldprices.py __main__) and the production launcher (gunicorn.conf.py)
+"""
+
+import threading
+
+_ready = threading.Event()
+_shutdown_hooks = []
+_shutdown_lock = threading.Lock()
+_shut_down = False
+
+
+def mark_ready():
+    """Mark this process as ready to receive traffic"""
+    _ready.set()
+
+
+def is_ready():
+    """True once caches are warm"""
+    return _ready.is_set()
+
+
+def register_shutdown_hook(name, func):
+    """
+    Register a function to run on graceful shutdown
+
+    Args:
+        name: Label used in shutdown logging
+        func: Callable taking no arguments (e.g. flushes pending appends)
+    """
+    _shutdown_hooks.append((name, func))
+
+
+def run_shutdown_hooks():
+    """Run every registered hook once, newest first. Safe to call repeatedly."""
+    global _shut_down
+    with _shutdown_lock:
+        if _shut_down:
+            return
+        _shut_down = True
+        _ready.clear()
+        # Imported here: app_logging registers its own hook from this module
+        from app_logging import get_logger
+        logger = get_logger('lifecycle')
+        for name, func in reversed(_shutdown_hooks):
+            try:
+                func()
+                logger.info("Shutdown hook done", extra={'fields': {'hook': name}})
+            except Exception as e:
+                logger.error("Shutdown hook %s failed: %s", name, e)
@@ -0,0 +1,103 @@
+"""
+VitaNova Order IDs
+==================
+Time-ordered 10-character order IDs in the existing A-Z/0-9 alphabet:
+
+    TTTTTT WW SS
+    |      |  +- sequence within the second  (2 base36 chars, 1296/s)
+    |      +---- worker id                   (2 base36 chars, 0-1295)
+    +----------- seconds since 2024-01-01 UTC (6 base36 chars, ~69 years)
+
+Digits sort before letters in ASCII, so IDs compare as strings in the order
+they were issued and orders append to an order_id index in key order.
+
+The worker id comes from VITANOVA_WORKER_ID, which gunicorn.conf.py sets
+to a random per-master base plus the worker's age: distinct among the
+workers of one master, and only rarely overlapping another instance's (or
+a restarted master's) range, since there are 1296 ids. Without it, the id
+is random per process. Two processes sharing an id repeat an ID only if
+they also issue the same sequence number in the same second;
+orders_handler.generate_order_id() checks the store, which catches that
+for writers of the same store, and repeats after a restart with the
+clock set back. IDs issued before this format were random and carry no
+time information.
+"""
+
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+BASE = len(ALPHABET)
+
+ID_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+TIME_CHARS = 6
+WORKER_CHARS = 2
+SEQUENCE_CHARS = 2
+
+MAX_WORKERS = BASE ** WORKER_CHARS
+MAX_SEQUENCE = BASE ** SEQUENCE_CHARS
+
+
+def _encode(value, width):
+    """Fixed-width base36"""
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, BASE)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def _worker_id():
+    """This process's worker id (VITANOVA_WORKER_ID, else random)"""
+    try:
+        return int(os.environ['VITANOVA_WORKER_ID']) % MAX_WORKERS
+    except (KeyError, ValueError):
+        return secrets.randbelow(MAX_WORKERS)
+
+
+class OrderIdGenerator:
+    """
+    Monotonic order IDs for one process.
+
+    The sequence resets each second; if it runs out, or the clock steps
+    back, the generator keeps counting from its own last second instead,
+    so IDs never repeat or go backwards within a process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._worker = 0
+        self._second = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # New process (e.g. a forked worker): new worker id
+                self._pid = os.getpid()
+                self._worker = _worker_id()
+                self._second, self._sequence = -1, 0
+
+            now = int(time.time() - ID_EPOCH)
+            if now > self._second:
+                self._second, self._sequence = now, 0
+            else:
+                self._sequence += 1
+                if self._sequence >= MAX_SEQUENCE:
+                    self._second, self._sequence = self._second + 1, 0
+
+            return (_encode(self._second, TIME_CHARS) +
+                    _encode(self._worker, WORKER_CHARS) +
+                    _encode(self._sequence, SEQUENCE_CHARS))
+
+
+_generator = OrderIdGenerator()
+
+
+def next_order_id():
+    """Next order ID for this process"""
+    return _generator.next_id()
@@ -0,0 +1,199 @@
+"""
+VitaNova Customer Order Index
+=============================
+customer_id -> byte ranges of that customer's rows in orders.csv, so an
+order-history lookup seeks straight to the customer's rows instead of
+scanning the whole file.
+
+The index follows the file by byte offset: rows appended by this or any
+other worker are indexed on the next lookup. If the file shrinks, is
+rewritten, or a seek lands on a row for someone else, the index is rebuilt.
+"""
+
+import csv
+import io
+import os
+import threading
+
+from app_logging import get_logger
+
+logger = get_logger('orders.index')
+
+
+class OrderIndexError(RuntimeError):
+    """The index still points at the wrong rows after a rebuild"""
+
+
+def _file_signature(path):
+    """(size, mtime) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns)
+    except OSError:
+        return None
+
+
+def iter_rows_with_offsets(f, start):
+    """
+    Yield (offset, length, row) for each CSV row in a binary file from
+    `start`, keeping track of where each row begins (rows may span lines).
+    """
+    position = {'next': start}
+
+    def lines():
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                return  # partially written last row; pick it up next time
+            position['next'] += len(raw)
+            yield raw.decode('utf-8')
+
+    row_start = start
+    for row in csv.reader(lines()):
+        yield row_start, position['next'] - row_start, row
+        row_start = position['next']
+
+
+def read_rows_at(f, header, ranges):
+    """
+    Parse the CSV rows at (offset, length, ...) byte ranges of an open binary
+    file into dicts keyed by header. Ranges are read in the order given.
+    """
+    rows = []
+    for offset, length, *_ in ranges:
+        f.seek(offset)
+        raw = f.read(length).decode('utf-8')
+        # Not splitlines(): it also breaks on \x1c-\x1e, \x85, \u2028 and \u2029,
+        # which may appear inside quoted fields such as addresses
+        for row in csv.reader(io.StringIO(raw, newline='')):
+            rows.append(dict(zip(header, row)))
+    return rows
+
+
+class CustomerOrderIndex:
+    """
+    Byte-offset index of orders.csv rows per customer.
+
+    Each entry is (offset, length, *sort_values): the values of
+    `sort_columns` are kept so callers can pick a page of rows from the
+    index alone and read only those. With `id_column`, the set of all
+    values seen in that column is kept too, for existence checks.
+    """
+
+    def __init__(self, path, key_column='customer_id', sort_columns=(), id_column=None):
+        self.path = path
+        self.key_column = key_column
+        self.sort_columns = tuple(sort_columns)
+        self.id_column = id_column
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.header = None
+        self.offsets = {}
+        self.ids = set()
+        self.rows_indexed = 0
+        self._end = 0
+        self._signature = None
+
+    # ---------- building ----------
+
+    def rebuild(self):
+        """Index the whole file from scratch"""
+        with self._lock:
+            self._reset()
+            self._index_tail()
+            logger.info("Customer order index built", extra={'fields': {
+                'customers': len(self.offsets), 'rows': self.rows_indexed
+            }})
+
+    def _index_tail(self):
+        """Index rows appended since the last call"""
+        signature = _file_signature(self.path)
+        if signature is None:
+            self._reset()
+            return
+        if signature[0] < self._end:
+            self._reset()  # file shrank or was replaced
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._end)
+            rows = iter_rows_with_offsets(f, self._end)
+            if self.header is None:
+                for offset, length, row in rows:
+                    self.header = row
+                    self._end = offset + length
+                    break
+                if self.header is None:
+                    return
+            key_pos = self.header.index(self.key_column)
+            sort_pos = [self.header.index(c) for c in self.sort_columns]
+            id_pos = self.header.index(self.id_column) if self.id_column else None
+            width = max([key_pos] + sort_pos + [id_pos or 0]) + 1
+
+            for offset, length, row in rows:
+                if len(row) >= width:
+                    entry = (offset, length) + tuple(row[p] for p in sort_pos)
+                    self.offsets.setdefault(row[key_pos], []).append(entry)
+                    if id_pos is not None:
+                        self.ids.add(row[id_pos])
+                    self.rows_indexed += 1
+                self._end = offset + length
+
+        self._signature = signature if self._end == signature[0] else None
+
+    def sync(self):
+        """Bring the index up to date with the file (cheap when nothing changed)"""
+        with self._lock:
+            signature = _file_signature(self.path)
+            if signature == self._signature and signature is not None:
+                return
+            if (self._signature is not None and signature is not None and
+                    signature[0] == self._signature[0]):
+                # Same size but modified: rewritten in place
+                self._reset()
+            self._index_tail()
+
+    # ---------- lookups ----------
+
+    def _read_ranges(self, ranges):
+        """Read and parse the rows at the given byte ranges"""
+        with open(self.path, 'rb') as f:
+            return read_rows_at(f, self.header, ranges)
+
+    def has_id(self, value):
+        """True if any row has this value in `id_column`"""
+        with self._lock:
+            self.sync()
+            return value in self.ids
+
+    def entries_for(self, key):
+        """Index entries (offset, length, *sort_values) for one customer, in file order"""
+        with self._lock:
+            self.sync()
+            return list(self.offsets.get(key, ()))
+
+    def rows_for(self, key, select=None):
+        """
+        Rows for one customer, in file order, as dicts keyed by the header.
+        `select(entries) -> entries` narrows which rows are read.
+        Rebuilds and retries once if the stored offsets no longer match;
+        raises OrderIndexError if they still do not.
+        """
+        with self._lock:
+            self.sync()
+            for attempt in range(2):
+                ranges = list(self.offsets.get(key, ()))
+                if select is not None:
+                    ranges = select(ranges)
+                if not ranges:
+                    return []
+                rows = self._read_ranges(ranges)
+                if all(row.get(self.key_column) == key for row in rows):
+                    return rows
+                if attempt:
+                    break
+                logger.warning("Customer order index out of sync, rebuilding")
+                self.rebuild()
+            logger.error("Customer order index still out of sync after rebuild",
+                         extra={'fields': {'customer_id': key, 'path': self.path}})
+            raise OrderIndexError(f"Order index for {self.path} does not match the file")
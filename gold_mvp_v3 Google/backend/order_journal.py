@@ -0,0 +1,267 @@
+"""
+VitaNova Order Journal
+======================
+Write-ahead journal in front of the order store. A request appends its
+validated order rows to orders.journal as one JSON line, fsyncs, and
+returns; a background thread applies journal entries to the order store
+(order_store.py) in batches.
+
+Entries are applied idempotently (orders already in the store are
+skipped), so after a crash the journal is simply replayed from the last
+applied offset. The applier also updates the sales aggregates and the
+customer holdings, after the store and before the offset moves; both
+count each order ID once, so a replay completes them too.
+
+Any number of threads and worker processes may append: appends hold a
+shared file lock and use O_APPEND, while applying and compaction take
+exclusive locks.
+
+Set VITANOVA_ORDER_JOURNAL=0 to write straight to the order store instead.
+"""
+
+import json
+import os
+import threading
+
+from app_logging import get_logger
+from order_store import get_order_store, FileLock
+
+logger = get_logger('orders.journal')
+
+BASE_DIR = os.path.dirname(__file__)
+
+ORDER_JOURNAL_ENABLED = os.environ.get('VITANOVA_ORDER_JOURNAL', '1').lower() not in ('0', 'false', 'no')
+JOURNAL_PATH = os.environ.get('VITANOVA_ORDER_JOURNAL_PATH', os.path.join(BASE_DIR, 'orders.journal'))
+
+# Background apply cadence (seconds) when no append wakes the worker
+JOURNAL_APPLY_INTERVAL = 1.0
+# Truncate the journal once everything in it is applied and it is this big
+JOURNAL_COMPACT_BYTES = 1 << 20
+
+
+class OrderJournal:
+    """Append-only, fsynced order journal with a background applier"""
+
+    def __init__(self, path=JOURNAL_PATH, store=None):
+        self.path = path
+        self.offset_path = path + '.applied'
+        self.store = store or get_order_store()
+        # Shared for appenders, exclusive for compaction
+        self._journal_lock_path = path + '.lock'
+        # Exclusive: one applier at a time across processes
+        self._apply_lock = FileLock(path + '.apply.lock')
+        self._worker_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+
+    # ---------- intake ----------
+
+    def append(self, orders):
+        """
+        Durably journal one or more orders (lists of rows in ORDER_COLUMNS
+        order) with a single write and fsync.
+        """
+        line = json.dumps({'orders': orders}, ensure_ascii=False, default=str) + '\n'
+        data = line.encode('utf-8')
+        with FileLock(self._journal_lock_path, shared=True):
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self._ensure_worker()
+        self._wake.set()
+
+    # ---------- applying ----------
+
+    def _read_offset(self):
+        try:
+            with open(self.offset_path, 'r') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_offset(self, offset):
+        tmp_path = self.offset_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.offset_path)
+
+    def pending(self):
+        """True if the journal holds entries not yet applied"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        return size != self._read_offset()
+
+    def _read_pending(self):
+        """
+        (applied offset, bytes of complete lines after it, orders in them)
+        """
+        offset = self._read_offset()
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                if size < offset:
+                    offset = 0  # compacted or replaced
+                f.seek(offset)
+                chunk = f.read(size - offset)
+        except FileNotFoundError:
+            return offset, 0, []
+
+        end = chunk.rfind(b'\n') + 1  # a partial last line is left for later
+        orders = []
+        for raw in chunk[:end].splitlines():
+            if not raw.strip():
+                continue
+            try:
+                orders.extend(json.loads(raw)['orders'])
+            except (ValueError, KeyError, TypeError) as e:
+                logger.error("Skipping unreadable journal entry: %s", e,
+                             extra={'fields': {'entry': raw[:200].decode('utf-8', 'replace')}})
+        return offset, end, orders
+
+    def apply_pending(self):
+        """
+        Apply everything journaled since the last applied offset.
+
+        Returns:
+            int: Number of orders written to the store
+        """
+        with self._apply_lock:
+            offset, end, orders = self._read_pending()
+
+            # Replays may meet orders that were applied before a crash
+            new_orders, applied, seen = [], [], set()
+            for rows in orders:
+                if not rows:
+                    continue
+                order_id = rows[0][0]
+                if order_id in seen:
+                    continue
+                seen.add(order_id)
+                applied.append(rows)
+                if not self.store.order_exists(order_id):
+                    new_orders.append(rows)
+            if new_orders:
+                self.store.add_orders(new_orders)
+            # Also for orders stored before a crash: their aggregates may not be
+            if applied:
+                record_aggregates(applied)
+
+            offset += end
+            if end:
+                self._write_offset(offset)
+            self._compact(offset)
+
+        if new_orders:
+            logger.debug("Journal applied", extra={'fields': {'orders': len(new_orders)}})
+        return len(new_orders)
+
+    def _compact(self, applied_offset):
+        """Truncate the journal when everything in it has been applied"""
+        if applied_offset < JOURNAL_COMPACT_BYTES:
+            return
+        with FileLock(self._journal_lock_path):
+            if os.path.getsize(self.path) != applied_offset:
+                return  # appended meanwhile; try next time
+            # Offset first: a crash in between only causes an idempotent replay
+            self._write_offset(0)
+            os.truncate(self.path, 0)
+        logger.info("Order journal compacted", extra={'fields': {'bytes': applied_offset}})
+
+    # ---------- background worker ----------
+
+    def _ensure_worker(self):
+        """Start the applier thread in this process (threads do not survive fork)"""
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name='order-journal', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(JOURNAL_APPLY_INTERVAL)
+            self._wake.clear()
+            try:
+                if self.pending():
+                    self.apply_pending()
+            except Exception as e:
+                logger.exception("Applying order journal failed: %s", e)
+
+    def close(self):
+        """Stop the worker and apply whatever is left"""
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._worker.join(timeout=5)
+        self._worker = None
+        if self.pending():
+            self.apply_pending()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_order_journal():
+    """Process-wide order journal (created on first use)"""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = OrderJournal()
+    return _journal
+
+
+def record_aggregates(orders):
+    """
+    Add orders written to the store to the sales aggregates and customer
+    holdings. Both count an order ID once, so calling this again is safe.
+    """
+    from sales_reports import record_sales
+    from portfolio import record_holdings
+    record_sales(orders)
+    record_holdings(orders)
+
+
+def submit_orders(orders):
+    """Persist orders: through the journal when enabled, else straight to the store"""
+    if ORDER_JOURNAL_ENABLED:
+        get_order_journal().append(orders)
+    else:
+        get_order_store().add_orders(orders)
+        record_aggregates(orders)
+
+
+def replay_journal():
+    """Apply anything left in the journal by a previous run (app warm-up)"""
+    if not ORDER_JOURNAL_ENABLED:
+        return 0
+    journal = get_order_journal()
+    applied = journal.apply_pending() if journal.pending() else 0
+    if applied:
+        logger.info("Replayed order journal", extra={'fields': {'orders': applied}})
+    from lifecycle import register_shutdown_hook
+    register_shutdown_hook('order journal', journal.close)
+    return applied
+
+
+def sync_journal():
+    """Apply pending entries now, so a read sees the caller's own writes"""
+    if ORDER_JOURNAL_ENABLED:
+        journal = get_order_journal()
+        if journal.pending():
+            journal.apply_pending()
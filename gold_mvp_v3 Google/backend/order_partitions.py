@@ -0,0 +1,186 @@
+"""
+VitaNova Order Partitions
+=========================
+Sealed monthly partitions of the CSV order store. orders.csv only holds
+the current month (the hot partition); earlier months are moved to
+
+    order_partitions/orders-YYYY-MM.csv.gz     rows, gzip unless disabled
+    order_partitions/orders-YYYY-MM.idx.json   customer -> row byte ranges
+
+Each index records, per customer, the (offset, length, purchase_date,
+order_id) of every row in the uncompressed partition, so a customer
+lookup only opens the partitions that customer ordered in and only reads
+their rows. Partitions never change once written, except when a late row
+for a sealed month is merged in on the next seal.
+
+Configuration (environment):
+    VITANOVA_ORDER_PARTITIONS       partition directory
+    VITANOVA_ORDER_PARTITION_GZIP   0 to keep sealed partitions uncompressed
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+
+from app_logging import get_logger
+from order_index import iter_rows_with_offsets, read_rows_at
+
+logger = get_logger('orders.partitions')
+
+BASE_DIR = os.path.dirname(__file__)
+
+PARTITIONS_DIR = os.environ.get('VITANOVA_ORDER_PARTITIONS', os.path.join(BASE_DIR, 'order_partitions'))
+PARTITION_GZIP = os.environ.get('VITANOVA_ORDER_PARTITION_GZIP', '1').lower() not in ('0', 'false', 'no')
+
+INDEX_SUFFIX = '.idx.json'
+
+
+def month_of(purchase_date):
+    """'2026-01-25 20:13:52' -> '2026-01', or None if not a date"""
+    if len(purchase_date) >= 7 and purchase_date[4] == '-':
+        return purchase_date[:7]
+    return None
+
+
+class SealedPartition:
+    """One sealed month: rows file plus its customer index"""
+
+    def __init__(self, month, data_path, index_path):
+        self.month = month
+        self.data_path = data_path
+        self.index_path = index_path
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        self.header = index['header']
+        self.rows_count = index['rows']
+        self.customers = {cid: [tuple(e) for e in entries] for cid, entries in index['customers'].items()}
+        self.ids = {e[3] for entries in self.customers.values() for e in entries}
+
+    def _open(self):
+        if self.data_path.endswith('.gz'):
+            return gzip.open(self.data_path, 'rb')
+        return open(self.data_path, 'rb')
+
+    def entries_for(self, customer_id):
+        """Index entries (offset, length, purchase_date, order_id) for a customer"""
+        return self.customers.get(customer_id, [])
+
+    def read_entries(self, entries):
+        """Rows at the given entries as dicts, in file order"""
+        if not entries:
+            return []
+        # Ascending offsets: a gzip stream is then decompressed at most once
+        with self._open() as f:
+            return read_rows_at(f, self.header, sorted(entries))
+
+    def iter_rows(self):
+        """Every row in the partition as a list, in file order"""
+        with self._open() as f:
+            reader = csv.reader(io.TextIOWrapper(f, encoding='utf-8', newline=''))
+            next(reader, None)
+            yield from reader
+
+
+def write_partition(directory, month, header, rows, compress=PARTITION_GZIP):
+    """
+    Write (or replace) a month's partition and its index.
+
+    Returns:
+        SealedPartition
+    """
+    os.makedirs(directory, exist_ok=True)
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(header)
+    writer.writerows(rows)
+    data = text.getvalue().encode('utf-8')
+
+    key_pos = header.index('customer_id')
+    date_pos = header.index('purchase_date')
+    id_pos = header.index('order_id')
+    customers = {}
+    offset_rows = iter_rows_with_offsets(io.BytesIO(data), 0)
+    next(offset_rows, None)  # header
+    for offset, length, row in offset_rows:
+        customers.setdefault(row[key_pos], []).append([offset, length, row[date_pos], row[id_pos]])
+
+    base = os.path.join(directory, f"orders-{month}")
+    data_path = base + ('.csv.gz' if compress else '.csv')
+    index_path = base + INDEX_SUFFIX
+    for path, payload in ((data_path, gzip.compress(data) if compress else data),
+                          (index_path, json.dumps({'month': month, 'header': header, 'rows': len(rows),
+                                                   'customers': customers}).encode('utf-8'))):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    # A month is stored either compressed or not, never both
+    stale = base + ('.csv' if compress else '.csv.gz')
+    if os.path.exists(stale):
+        os.remove(stale)
+    return SealedPartition(month, data_path, index_path)
+
+
+class PartitionSet:
+    """All sealed partitions in a directory, reloaded when the directory changes"""
+
+    def __init__(self, directory=PARTITIONS_DIR):
+        self.directory = directory
+        self.partitions = {}  # month -> SealedPartition
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Load partitions written since the last call (e.g. by another process)"""
+        try:
+            signature = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            signature = None
+        if signature == self._signature:
+            return
+        with self._lock:
+            partitions = {}
+            if signature is not None:
+                for name in sorted(os.listdir(self.directory)):
+                    if not (name.startswith('orders-') and name.endswith(INDEX_SUFFIX)):
+                        continue
+                    month = name[len('orders-'):-len(INDEX_SUFFIX)]
+                    base = os.path.join(self.directory, f"orders-{month}")
+                    data_path = base + '.csv.gz' if os.path.exists(base + '.csv.gz') else base + '.csv'
+                    try:
+                        partitions[month] = SealedPartition(month, data_path, base + INDEX_SUFFIX)
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.error("Skipping unreadable order partition %s: %s", month, e)
+            self.partitions = partitions
+            self._signature = signature
+
+    def months(self):
+        self.refresh()
+        return sorted(self.partitions)
+
+    def get(self, month):
+        self.refresh()
+        return self.partitions.get(month)
+
+    def for_customer(self, customer_id, since=None):
+        """(partition, entries) for the partitions a customer has rows in, oldest month first"""
+        self.refresh()
+        since_month = month_of(since) if since else None
+        found = []
+        for month in sorted(self.partitions):
+            if since_month and month < since_month:
+                continue
+            entries = self.partitions[month].entries_for(customer_id)
+            if entries:
+                found.append((self.partitions[month], entries))
+        return found
+
+    def has_id(self, order_id):
+        self.refresh()
+        return any(order_id in p.ids for p in self.partitions.values())
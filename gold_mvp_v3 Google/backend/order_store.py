@@ -0,0 +1,610 @@
+"""
+VitaNova Order Storage
+======================
+Storage backends for orders_handler.py. Both take and return order rows
+in the orders.csv column layout (one row per item), so the route code
+does not care where orders live.
+
+    csv     orders.csv, append-only, with the per-customer byte-offset index;
+            finished months are sealed into compressed monthly partitions
+    sqlite  orders.db in WAL mode: orders + order_items tables, indexed by
+            customer_id, order_id and purchase_date; one transaction per order
+
+Order history is paged newest first on (purchase_date, order_id): a page
+is `limit` orders strictly older than the `after` key, optionally no older
+than `since`. Only the rows of the orders on that page are read.
+
+Select with VITANOVA_ORDER_STORE=csv|sqlite (default csv).
+Import existing CSV orders (all partitions) into SQLite, or seal finished
+months out of orders.csv, with:
+
+    python order_store.py import-csv [path/to/orders.csv]
+    python order_store.py seal
+
+Sealing rewrites orders.csv, so it never happens as a side effect of
+importing the app: only this command, or the gunicorn master before it
+forks workers when VITANOVA_ORDER_AUTOSEAL=1 (see autoseal()).
+"""
+
+import csv
+import os
+import sqlite3
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:
+    # Windows development machines: single process, the thread locks are enough
+    fcntl = None
+
+from app_logging import get_logger
+from store_utils import LocalConnection
+from order_index import CustomerOrderIndex
+from order_partitions import PartitionSet, PARTITIONS_DIR, month_of, write_partition
+
+logger = get_logger('orders.store')
+
+BASE_DIR = os.path.dirname(__file__)
+
+ORDER_STORE_BACKEND = os.environ.get('VITANOVA_ORDER_STORE', 'csv').lower()
+ORDERS_CSV = os.environ.get('VITANOVA_ORDERS_CSV', os.path.join(BASE_DIR, 'orders.csv'))
+ORDERS_DB = os.environ.get('VITANOVA_ORDERS_DB', os.path.join(BASE_DIR, 'orders.db'))
+# Seal finished months out of orders.csv when the gunicorn master starts (off by default)
+ORDER_AUTOSEAL = os.environ.get('VITANOVA_ORDER_AUTOSEAL', '0').lower() not in ('0', 'false', 'no')
+
+# orders.csv layout; every backend reads and writes rows in this order
+ORDER_COLUMNS = [
+    'order_id', 'customer_id', 'product', 'quantity',
+    'gold_price_gram', 'purchase_date', 'payment_type',
+    'commission_type', 'commission_amount', 'tax_amount',
+    'total', 'whatsapp_number', 'emirate', 'city', 'address'
+]
+
+# Columns that describe the order as a whole vs. one item of it
+ORDER_HEADER_COLUMNS = [
+    'order_id', 'customer_id', 'purchase_date', 'payment_type',
+    'whatsapp_number', 'emirate', 'city', 'address'
+]
+ORDER_ITEM_COLUMNS = [
+    'product', 'quantity', 'gold_price_gram', 'commission_type',
+    'commission_amount', 'tax_amount', 'total'
+]
+
+# Index entry fields the CSV store pages on
+PAGE_COLUMNS = ('purchase_date', 'order_id')
+
+
+def page_keys(keys, limit, after=None, since=None):
+    """
+    Pick one page from (purchase_date, order_id) keys, newest first.
+
+    Returns:
+        tuple: (keys on the page, True if older keys remain)
+    """
+    keys = set(keys)
+    if after is not None:
+        keys = {k for k in keys if k < after}
+    if since:
+        keys = {k for k in keys if k[0] >= since}
+    ordered = sorted(keys, reverse=True)
+    return ordered[:limit], len(ordered) > limit
+
+
+def row_matches(row, start_day=None, end_day=None, emirate=None, customer_id=None):
+    """Export filter on an order row dict; days are YYYY-MM-DD, inclusive"""
+    day = (row.get('purchase_date') or '')[:10]
+    if start_day and day < start_day:
+        return False
+    if end_day and day > end_day:
+        return False
+    if emirate and row.get('emirate') != emirate:
+        return False
+    if customer_id and row.get('customer_id') != customer_id:
+        return False
+    return True
+
+
+class FileLock:
+    """Exclusive (or shared) flock on a side file, plus a thread lock for this process"""
+
+    def __init__(self, path, shared=False):
+        self.path = path
+        self.shared = shared
+        self._thread_lock = threading.Lock() if not shared else None
+
+    def __enter__(self):
+        if self._thread_lock:
+            self._thread_lock.acquire()
+        fd = None
+        if fcntl is not None:
+            fd = open(self.path, 'a')
+            fcntl.flock(fd, fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        self._fd = fd
+        return self
+
+    def __exit__(self, *exc):
+        fd = self._fd
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            fd.close()
+        if self._thread_lock:
+            self._thread_lock.release()
+
+
+class CsvOrderStore:
+    """
+    orders.csv (current month) with a per-customer offset index, plus
+    sealed monthly partitions for earlier months (order_partitions.py)
+    """
+
+    name = 'csv'
+
+    def __init__(self, path=ORDERS_CSV, partitions_dir=PARTITIONS_DIR):
+        self.path = path
+        self.index = CustomerOrderIndex(path, sort_columns=PAGE_COLUMNS, id_column='order_id')
+        self.partitions = PartitionSet(partitions_dir)
+        self._ready = False
+        # Appends and sealing exclude each other across processes
+        self._file_lock = FileLock(path + '.lock')
+
+    def ensure(self):
+        """Create orders.csv with headers if it doesn't exist"""
+        if self._ready:
+            return
+        if not os.path.exists(self.path):
+            with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow(ORDER_COLUMNS)
+            logger.info("Created orders CSV: %s", self.path)
+        self._ready = True
+
+    def warm(self):
+        """Load the sealed partitions and build the customer index (read-only)"""
+        self.partitions.refresh()
+        self.index.rebuild()
+
+    def add_order(self, rows):
+        """Append one order's rows (lists in ORDER_COLUMNS order)"""
+        self.ensure()
+        with self._file_lock:
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(rows)
+        self.index.sync()
+
+    def add_orders(self, orders):
+        """Append several orders' rows in one write, then fsync once"""
+        self.ensure()
+        with self._file_lock:
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                for rows in orders:
+                    writer.writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+        self.index.sync()
+
+    def order_exists(self, order_id):
+        """True if an order with this ID was already written"""
+        if os.path.exists(self.path) and self.index.has_id(order_id):
+            return True
+        return self.partitions.has_id(order_id)
+
+    def _hot_rows(self, customer_id, select=None):
+        if not os.path.exists(self.path):
+            return []
+        return self.index.rows_for(customer_id, select=select)
+
+    def customer_rows(self, customer_id):
+        """All rows for a customer, oldest partition first, as dicts"""
+        rows = []
+        for partition, entries in self.partitions.for_customer(customer_id):
+            rows.extend(partition.read_entries(entries))
+        rows.extend(self._hot_rows(customer_id))
+        return rows
+
+    def customer_page(self, customer_id, limit, after=None, since=None):
+        """
+        Rows of one page of a customer's orders. The page is picked from the
+        indexes alone; only partitions holding orders on the page are read.
+
+        Returns:
+            tuple: (rows as dicts, True if older orders remain)
+        """
+        cold = self.partitions.for_customer(customer_id, since=since)
+        hot = self.index.entries_for(customer_id) if os.path.exists(self.path) else []
+
+        keys = [tuple(e[2:4]) for _, entries in cold for e in entries]
+        keys.extend(tuple(e[2:4]) for e in hot)
+        page, has_more = page_keys(keys, limit, after, since)
+        wanted = {k[1] for k in page}
+        if not wanted:
+            return [], has_more
+
+        rows = []
+        for partition, entries in cold:
+            rows.extend(partition.read_entries([e for e in entries if e[3] in wanted]))
+        if hot:
+            rows.extend(self._hot_rows(customer_id, select=lambda es: [e for e in es if e[3] in wanted]))
+        return rows, has_more
+
+    def iter_all_rows(self):
+        """Every order row as a dict: sealed months oldest first, then orders.csv"""
+        for month in self.partitions.months():
+            partition = self.partitions.get(month)
+            for row in partition.iter_rows():
+                yield dict(zip(partition.header, row))
+        if os.path.exists(self.path):
+            with open(self.path, 'r', newline='', encoding='utf-8') as f:
+                yield from csv.DictReader(f)
+
+    def export_rows(self, start_day=None, end_day=None, emirate=None, customer_id=None):
+        """
+        Stream matching order rows as dicts, oldest partition first. Sealed
+        months outside the date range are skipped; a customer filter reads
+        through the customer indexes instead of scanning.
+        """
+        filters = dict(start_day=start_day, end_day=end_day, emirate=emirate, customer_id=customer_id)
+        if customer_id:
+            for row in self.customer_rows(customer_id):
+                if row_matches(row, **filters):
+                    yield row
+            return
+
+        start_month = start_day[:7] if start_day else None
+        end_month = end_day[:7] if end_day else None
+        for month in self.partitions.months():
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            partition = self.partitions.get(month)
+            for values in partition.iter_rows():
+                row = dict(zip(partition.header, values))
+                if row_matches(row, **filters):
+                    yield row
+        if os.path.exists(self.path):
+            with open(self.path, 'r', newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    if row_matches(row, **filters):
+                        yield row
+
+    def seal(self, current_month=None):
+        """
+        Move rows from months before `current_month` (default: this month)
+        out of orders.csv into sealed partitions. Safe to re-run after a
+        crash: rows already in a partition are not added twice.
+
+        Returns:
+            int: Number of rows moved
+        """
+        current_month = current_month or datetime.now().strftime('%Y-%m')
+        if not os.path.exists(self.path):
+            return 0
+
+        with self._file_lock:
+            with open(self.path, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    return 0
+                date_pos = header.index('purchase_date')
+                keep, by_month = [], {}
+                for row in reader:
+                    month = month_of(row[date_pos]) if len(row) > date_pos else None
+                    if month and month < current_month:
+                        by_month.setdefault(month, []).append(row)
+                    else:
+                        keep.append(row)
+            if not by_month:
+                return 0
+
+            moved = 0
+            for month, rows in sorted(by_month.items()):
+                existing = self.partitions.get(month)
+                if existing is not None:
+                    # Merge: skip rows the partition already has (an interrupted seal)
+                    already = Counter(tuple(r) for r in existing.iter_rows())
+                    late = []
+                    for row in rows:
+                        if already[tuple(row)]:
+                            already[tuple(row)] -= 1
+                        else:
+                            late.append(row)
+                    rows = [list(r) for r in existing.iter_rows()] + late
+                    moved += len(late)
+                else:
+                    moved += len(rows)
+                write_partition(self.partitions.directory, month, header, rows)
+
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(keep)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+        self.partitions.refresh()
+        self.index.rebuild()
+        logger.info("Sealed order partitions", extra={'fields': {
+            'months': sorted(by_month), 'rows_moved': moved, 'hot_rows': len(keep)
+        }})
+        return moved
+
+
+class SqliteOrderStore:
+    """orders.db: orders + order_items in WAL mode"""
+
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id        TEXT PRIMARY KEY,
+            customer_id     TEXT NOT NULL,
+            purchase_date   TEXT NOT NULL,
+            payment_type    TEXT,
+            whatsapp_number TEXT,
+            emirate         TEXT,
+            city            TEXT,
+            address         TEXT
+        );
+        CREATE TABLE IF NOT EXISTS order_items (
+            item_id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id          TEXT NOT NULL REFERENCES orders(order_id),
+            product           TEXT,
+            quantity          INTEGER,
+            gold_price_gram   REAL,
+            commission_type   TEXT,
+            commission_amount REAL,
+            tax_amount        REAL,
+            total             REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_orders_customer_page ON orders(customer_id, purchase_date, order_id);
+        CREATE INDEX IF NOT EXISTS idx_orders_purchase_date ON orders(purchase_date);
+        CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id);
+    """
+
+    def __init__(self, path=ORDERS_DB):
+        self.path = path
+        self._connections = LocalConnection(path, row_factory=sqlite3.Row, pragmas=('foreign_keys=ON',))
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def connection(self):
+        """One connection per thread (and per process: never reused across fork)"""
+        return self._connections.get()
+
+    def ensure(self):
+        """Create tables and indexes if needed"""
+        if self._ready:
+            return
+        with self._ready_lock:
+            if not self._ready:
+                self.connection().executescript(self.SCHEMA)
+                self._ready = True
+
+    def warm(self):
+        self.ensure()
+
+    def _insert_rows(self, conn, rows, ignore_existing=False):
+        """Insert item rows, creating each order header once"""
+        verb = 'INSERT OR IGNORE' if ignore_existing else 'INSERT'
+        seen = set()
+        skipped = set()
+        for row in rows:
+            record = dict(zip(ORDER_COLUMNS, row))
+            if record['order_id'] not in seen:
+                seen.add(record['order_id'])
+                cursor = conn.execute(
+                    f"{verb} INTO orders ({', '.join(ORDER_HEADER_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(ORDER_HEADER_COLUMNS))})",
+                    [record[c] for c in ORDER_HEADER_COLUMNS]
+                )
+                if ignore_existing and cursor.rowcount == 0:
+                    skipped.add(record['order_id'])
+            if record['order_id'] in skipped:
+                continue
+            conn.execute(
+                f"INSERT INTO order_items (order_id, {', '.join(ORDER_ITEM_COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' * len(ORDER_ITEM_COLUMNS))})",
+                [record['order_id']] + [record[c] for c in ORDER_ITEM_COLUMNS]
+            )
+
+    def add_order(self, rows):
+        """Write one order (header + all items) in a single transaction"""
+        self.ensure()
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._insert_rows(conn, rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def add_orders(self, orders):
+        """Write several orders in a single transaction"""
+        self.ensure()
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for rows in orders:
+                self._insert_rows(conn, rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def order_exists(self, order_id):
+        """True if an order with this ID was already written"""
+        self.ensure()
+        row = self.connection().execute(
+            "SELECT 1 FROM orders WHERE order_id = ?", (order_id,)
+        ).fetchone()
+        return row is not None
+
+    def customer_rows(self, customer_id):
+        """All rows for a customer, oldest first, in the orders.csv shape"""
+        self.ensure()
+        cursor = self.connection().execute(
+            f"SELECT {', '.join('o.' + c for c in ORDER_HEADER_COLUMNS)}, "
+            f"{', '.join('i.' + c for c in ORDER_ITEM_COLUMNS)} "
+            "FROM orders o JOIN order_items i ON i.order_id = o.order_id "
+            "WHERE o.customer_id = ? ORDER BY o.purchase_date, o.order_id, i.item_id",
+            (customer_id,)
+        )
+        return [dict(row) for row in cursor]
+
+    def customer_page(self, customer_id, limit, after=None, since=None):
+        """
+        Rows of one page of a customer's orders: a keyset query on
+        (purchase_date, order_id) picks the orders, then their items.
+
+        Returns:
+            tuple: (rows as dicts, True if older orders remain)
+        """
+        self.ensure()
+        conn = self.connection()
+        where, params = ["customer_id = ?"], [customer_id]
+        if after is not None:
+            where.append("(purchase_date, order_id) < (?, ?)")
+            params.extend(after)
+        if since:
+            where.append("purchase_date >= ?")
+            params.append(since)
+        order_ids = [row[0] for row in conn.execute(
+            f"SELECT order_id FROM orders WHERE {' AND '.join(where)} "
+            "ORDER BY purchase_date DESC, order_id DESC LIMIT ?",
+            params + [limit + 1]
+        )]
+        has_more = len(order_ids) > limit
+        order_ids = order_ids[:limit]
+        if not order_ids:
+            return [], has_more
+
+        cursor = conn.execute(
+            f"SELECT {', '.join('o.' + c for c in ORDER_HEADER_COLUMNS)}, "
+            f"{', '.join('i.' + c for c in ORDER_ITEM_COLUMNS)} "
+            "FROM orders o JOIN order_items i ON i.order_id = o.order_id "
+            f"WHERE o.order_id IN ({', '.join('?' * len(order_ids))}) "
+            "ORDER BY o.purchase_date, o.order_id, i.item_id",
+            order_ids
+        )
+        return [dict(row) for row in cursor], has_more
+
+    def iter_all_rows(self):
+        """Every order row as a dict in the orders.csv shape, oldest first"""
+        self.ensure()
+        cursor = self.connection().execute(
+            f"SELECT {', '.join('o.' + c for c in ORDER_HEADER_COLUMNS)}, "
+            f"{', '.join('i.' + c for c in ORDER_ITEM_COLUMNS)} "
+            "FROM orders o JOIN order_items i ON i.order_id = o.order_id "
+            "ORDER BY o.purchase_date, o.order_id, i.item_id"
+        )
+        for row in cursor:
+            yield dict(row)
+
+    def export_rows(self, start_day=None, end_day=None, emirate=None, customer_id=None):
+        """Stream matching order rows as dicts, oldest first, straight off a cursor"""
+        self.ensure()
+        where, params = [], []
+        if start_day:
+            where.append("o.purchase_date >= ?")
+            params.append(start_day)
+        if end_day:
+            # Inclusive day: everything before the start of the next day
+            next_day = datetime.strptime(end_day, '%Y-%m-%d') + timedelta(days=1)
+            where.append("o.purchase_date < ?")
+            params.append(next_day.strftime('%Y-%m-%d'))
+        if emirate:
+            where.append("o.emirate = ?")
+            params.append(emirate)
+        if customer_id:
+            where.append("o.customer_id = ?")
+            params.append(customer_id)
+        cursor = self.connection().execute(
+            f"SELECT {', '.join('o.' + c for c in ORDER_HEADER_COLUMNS)}, "
+            f"{', '.join('i.' + c for c in ORDER_ITEM_COLUMNS)} "
+            "FROM orders o JOIN order_items i ON i.order_id = o.order_id "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+            "ORDER BY o.purchase_date, o.order_id, i.item_id",
+            params
+        )
+        for row in cursor:
+            yield dict(row)
+
+    def import_csv(self, csv_path=None):
+        """
+        Import an orders.csv file (default: the whole CSV store, sealed
+        partitions included) in one transaction. Orders already in the
+        database are skipped, so the import can be re-run safely.
+
+        Returns:
+            int: Number of item rows read from the CSV
+        """
+        self.ensure()
+        if csv_path is None:
+            records = CsvOrderStore().iter_all_rows()
+            rows = [[record.get(c, '') for c in ORDER_COLUMNS] for record in records]
+        else:
+            with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                rows = [[record.get(c, '') for c in ORDER_COLUMNS] for record in reader]
+
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._insert_rows(conn, rows, ignore_existing=True)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        logger.info("Imported orders CSV into SQLite", extra={'fields': {'rows': len(rows), 'db': self.path}})
+        return len(rows)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_order_store():
+    """The configured order store (created on first use)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if ORDER_STORE_BACKEND == 'sqlite':
+                    _store = SqliteOrderStore()
+                else:
+                    _store = CsvOrderStore()
+    return _store
+
+
+def autoseal():
+    """
+    Seal finished months out of orders.csv if VITANOVA_ORDER_AUTOSEAL is on
+    and the CSV store is in use. Called from the gunicorn master (when_ready
+    in gunicorn.conf.py), once, before workers fork.
+
+    Returns:
+        int: Number of rows moved
+    """
+    if not ORDER_AUTOSEAL:
+        return 0
+    store = get_order_store()
+    if store.name != 'csv':
+        return 0
+    return store.seal()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == 'import-csv':
+        source = sys.argv[2] if len(sys.argv) > 2 else None
+        count = SqliteOrderStore().import_csv(source)
+        print(f"✅ Imported {count} rows from {source or 'the CSV order store'} into {ORDERS_DB}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'seal':
+        moved = CsvOrderStore().seal()
+        print(f"✅ Sealed {moved} rows into {PARTITIONS_DIR}")
+    else:
+        print(__doc__)
@@ -1,141 +1,257 @@
 """
 Simple Order Handler for VitaNova
 =================================
-Handles order creation and retrieval with CSV storage
+Handles order creation and retrieval (storage backend in order_store.py)
 """
 
+import base64
 import csv
-import os
-import random
-import string
+import io
+import json
+import time
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from app_logging import get_logger
+from order_store import get_order_store, ORDER_COLUMNS
+from order_journal import submit_orders, replay_journal, sync_journal
+from order_ids import next_order_id
+from idempotency import idempotent
+from price_quotes import redeem_quote, check_client_price, QuoteError, REQUIRE_PRICE_QUOTE
+from sales_reports import reports_bp, reports_auth_error
+from quote_table import price_lines
+from portfolio import portfolio_bp, warm_holdings
+
+logger = get_logger('orders')
 
 orders_bp = Blueprint('orders', __name__)
 
-# CSV file path - same directory as this file
-ORDERS_CSV = os.path.join(os.path.dirname(__file__), 'orders.csv')
+# Orders accepted by one /orders/bulk request
+MAX_BULK_ORDERS = 500
+
+# /orders/export buffers about this many bytes before sending a chunk
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Order history page sizes (?limit=)
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(purchase_date, order_id):
+    """Opaque `after` cursor for the (purchase_date, order_id) of the last order on a page"""
+    raw = f"{purchase_date}|{order_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
 
-def init_orders_csv():
-    """Initialize orders CSV with headers if it doesn't exist"""
-    if not os.path.exists(ORDERS_CSV):
-        with open(ORDERS_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                'order_id', 'customer_id', 'product', 'quantity', 
-                'gold_price_gram', 'purchase_date', 'payment_type',
-                'commission_type', 'commission_amount', 'tax_amount', 
-                'total', 'whatsapp_number', 'emirate', 'city', 'address'
-            ])
-        print(f"✅ Created orders CSV: {ORDERS_CSV}")
-    else:
-        print(f"📁 Orders CSV exists: {ORDERS_CSV}")
+def decode_cursor(cursor):
+    """(purchase_date, order_id) from an `after` cursor; ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        purchase_date, order_id = raw.split('|', 1)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    return purchase_date, order_id
+
+
+def group_order_rows(rows):
+    """Group orders.csv-shaped rows into orders with their items, newest first"""
+    orders = {}
 
-# Initialize on import
-init_orders_csv()
+    for row in rows:
+        oid = row['order_id']
+
+        if oid not in orders:
+            orders[oid] = {
+                'order_id': oid,
+                'purchase_date': row.get('purchase_date', ''),
+                'payment_type': row.get('payment_type', ''),
+                'whatsapp_number': row.get('whatsapp_number', ''),
+                'emirate': row.get('emirate', ''),
+                'city': row.get('city', ''),
+                'address': row.get('address', ''),
+                'items': [],
+                'total': 0
+            }
+
+        # Add item
+        item_total = float(row.get('total', 0))
+        orders[oid]['items'].append({
+            'product': row.get('product', ''),
+            'quantity': int(row.get('quantity', 1)),
+            'gold_price_gram': float(row.get('gold_price_gram', 0)),
+            'commission_type': row.get('commission_type', ''),
+            'commission_amount': float(row.get('commission_amount', 0)),
+            'tax_amount': float(row.get('tax_amount', 0)),
+            'total': item_total
+        })
+        orders[oid]['total'] += item_total
+
+    orders_list = list(orders.values())
+    orders_list.sort(key=lambda x: (x['purchase_date'], x['order_id']), reverse=True)
+    return orders_list
+
+
+# New IDs checked against the store before giving up
+ORDER_ID_ATTEMPTS = 5
 
 
 def generate_order_id():
-    """Generate a unique 10-character order ID"""
-    chars = string.ascii_uppercase + string.digits
-    return ''.join(random.choices(chars, k=10))
+    """
+    Generate a time-ordered 10-character order ID (see order_ids.py),
+    checked against the stored orders
+    """
+    store = get_order_store()
+    for _ in range(ORDER_ID_ATTEMPTS):
+        order_id = next_order_id()
+        if not store.order_exists(order_id):
+            return order_id
+        logger.warning("Order ID collision, retrying", extra={'fields': {'order_id': order_id}})
+    raise RuntimeError('Could not generate a unique order ID')
+
+
+def price_order(data):
+    """
+    Take the gold price from the order's quote_token instead of the
+    client's gold_price_gram. Without a token the order is rejected, or,
+    when quotes are not required, its price is checked against the latest
+    tick.
+
+    Returns:
+        tuple: (order data, error message or None)
+    """
+    token = data.get('quote_token')
+    try:
+        if token is None or token == '':
+            if REQUIRE_PRICE_QUOTE:
+                return data, 'Missing price quote'
+            check_client_price(data.get('gold_price_gram'))
+            return data, None
+        price = redeem_quote(token)
+    except QuoteError as e:
+        return data, str(e)
+
+    client_price = data.get('gold_price_gram')
+    try:
+        if client_price and abs(float(client_price) - price) >= 0.01:
+            logger.warning("Client price differs from quote", extra={'fields': {
+                'customer_id': data.get('customer_id', ''), 'client_price': client_price, 'quote_price': price
+            }})
+    except (TypeError, ValueError):
+        pass
+    return dict(data, gold_price_gram=price), None
+
+
+def validate_order(data):
+    """Error message for an order payload that cannot be accepted, or None"""
+    if not data.get('customer_id', ''):
+        return 'Missing customer_id'
+
+    items = data.get('items', [])
+    if not items or len(items) == 0:
+        return 'No items in order'
+
+    gold_price = data.get('gold_price_gram', 0)
+    try:
+        if not gold_price or float(gold_price) <= 0:
+            return 'Invalid gold price'
+        for item in items:
+            float(item.get('weight', 0))
+            int(item.get('quantity', 1))
+            float(item.get('commission', 0))
+    except (TypeError, ValueError, AttributeError):
+        return 'Invalid gold price or item values'
+    return None
+
+
+def build_order_rows(data, order_id, purchase_date):
+    """
+    One row per item, in orders.csv column order
+
+    Returns:
+        tuple: (rows, order total)
+    """
+    customer_id = data.get('customer_id', '')
+    gold_price = float(data.get('gold_price_gram', 0))
+    commission_type = data.get('commission_type', 'fixed')
+    whatsapp = data.get('whatsapp_number', '')
+    emirate = data.get('emirate', '')
+    city = data.get('city', '')
+    address = data.get('address', '')
+    payment_type = data.get('payment_type', 'Cash on Delivery')
+
+    rows = []
+    order_total = 0
+    for item in data.get('items', []):
+        weight = float(item.get('weight', 0))
+        quantity = int(item.get('quantity', 1))
+        commission_per_unit = float(item.get('commission', 0))
+
+        # Same pricing as the /price/table quote table (gold cost, 5% VAT, commission)
+        _, tax_amount, commission_total, total = price_lines(gold_price, weight, quantity, commission_per_unit)
+
+        rows.append([
+            order_id,
+            customer_id,
+            f"{weight}g Gold Commodity 24K",
+            quantity,
+            round(gold_price, 2),
+            purchase_date,
+            payment_type,
+            commission_type,
+            round(commission_total, 2),
+            round(tax_amount, 2),
+            round(total, 2),
+            whatsapp,
+            emirate,
+            city,
+            address
+        ])
+        order_total += total
+    return rows, order_total
 
 
 @orders_bp.route('/orders/create', methods=['POST', 'OPTIONS'])
+@idempotent
 def create_order():
-    """Create a new order and save to CSV"""
+    """Create a new order and save it to the order store"""
     # Handle CORS preflight
     if request.method == 'OPTIONS':
         return '', 200
     
-    print("\n" + "="*50)
-    print("📦 NEW ORDER REQUEST RECEIVED")
-    print("="*50)
-    
     try:
         # Get JSON data
         data = request.get_json()
-        print(f"📥 Received data: {data}")
         
         if not data:
-            print("❌ No JSON data received")
+            logger.warning("Order rejected: no JSON data received")
             return jsonify({'success': False, 'error': 'No data received'}), 400
         
-        # Extract required fields with defaults
         customer_id = data.get('customer_id', '')
-        items = data.get('items', [])
-        gold_price = data.get('gold_price_gram', 0)
-        commission_type = data.get('commission_type', 'fixed')
-        whatsapp = data.get('whatsapp_number', '')
-        emirate = data.get('emirate', '')
-        city = data.get('city', '')
-        address = data.get('address', '')
-        payment_type = data.get('payment_type', 'Cash on Delivery')
         
-        print(f"📋 Customer ID: {customer_id}")
-        print(f"📋 Items: {items}")
-        print(f"📋 Gold Price: {gold_price}")
-        print(f"📋 WhatsApp: {whatsapp}")
-        
-        # Validate
-        if not customer_id:
-            print("❌ Missing customer_id")
-            return jsonify({'success': False, 'error': 'Missing customer_id'}), 400
-        
-        if not items or len(items) == 0:
-            print("❌ No items in order")
-            return jsonify({'success': False, 'error': 'No items in order'}), 400
-        
-        if not gold_price or float(gold_price) <= 0:
-            print("❌ Invalid gold price")
-            return jsonify({'success': False, 'error': 'Invalid gold price'}), 400
+        # Price from the signed quote, then validate
+        data, error = price_order(data)
+        if not error:
+            error = validate_order(data)
+        if error:
+            logger.warning("Order rejected: %s", error, extra={'fields': {'customer_id': customer_id}})
+            return jsonify({'success': False, 'error': error}), 400
         
         # Generate order ID
         order_id = generate_order_id()
         purchase_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        print(f"🆔 Generated Order ID: {order_id}")
+        rows, order_total = build_order_rows(data, order_id, purchase_date)
         
-        # Write to CSV
-        rows_written = 0
-        with open(ORDERS_CSV, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            
-            for item in items:
-                weight = float(item.get('weight', 0))
-                quantity = int(item.get('quantity', 1))
-                commission_per_unit = float(item.get('commission', 0))
-                
-                # Calculate totals
-                gold_cost = float(gold_price) * weight * quantity
-                commission_total = commission_per_unit * quantity
-                tax_amount = gold_cost * 0.05  # 5% VAT
-                total = gold_cost + tax_amount + commission_total
-                
-                row = [
-                    order_id,
-                    customer_id,
-                    f"{weight}g Gold Commodity 24K",
-                    quantity,
-                    round(float(gold_price), 2),
-                    purchase_date,
-                    payment_type,
-                    commission_type,
-                    round(commission_total, 2),
-                    round(tax_amount, 2),
-                    round(total, 2),
-                    whatsapp,
-                    emirate,
-                    city,
-                    address
-                ]
-                
-                writer.writerow(row)
-                rows_written += 1
-                print(f"✅ Wrote row: {weight}g x{quantity} = {total:.2f} AED")
+        # Journal the whole order at once (applied to the store, sales
+        # aggregates and holdings in the background)
+        submit_orders([rows])
+        rows_written = len(rows)
         
-        print(f"✅ ORDER {order_id} SAVED - {rows_written} rows written")
-        print("="*50 + "\n")
+        logger.info("Order saved", extra={'fields': {
+            'order_id': order_id,
+            'customer_id': customer_id,
+            'items': rows_written,
+            'total': round(order_total, 2)
+        }})
         
         return jsonify({
             'success': True,
@@ -145,77 +261,231 @@ def create_order():
         }), 201
         
     except Exception as e:
-        print(f"❌ ERROR creating order: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error creating order: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@orders_bp.route('/orders/bulk', methods=['POST', 'OPTIONS'])
+@idempotent
+def create_orders_bulk():
+    """
+    Create many orders in one request.
+
+    Body: {"orders": [<same payload as /orders/create>, ...]} or a bare list.
+    Every order is validated first; the valid ones are written together in
+    one store commit and each gets its own result, in request order.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    try:
+        data = request.get_json()
+        payloads = data.get('orders') if isinstance(data, dict) else data
+
+        if not isinstance(payloads, list) or not payloads:
+            return jsonify({'success': False, 'error': 'No orders received'}), 400
+        if len(payloads) > MAX_BULK_ORDERS:
+            return jsonify({
+                'success': False,
+                'error': f'Too many orders (max {MAX_BULK_ORDERS} per request)'
+            }), 400
+
+        started = time.perf_counter()
+        purchase_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        results = []
+        batch = []
+
+        for position, payload in enumerate(payloads):
+            if isinstance(payload, dict):
+                payload, error = price_order(payload)
+                error = error or validate_order(payload)
+            else:
+                error = 'Invalid order'
+            if error:
+                results.append({'index': position, 'success': False, 'error': error})
+                continue
+            order_id = generate_order_id()
+            rows, order_total = build_order_rows(payload, order_id, purchase_date)
+            batch.append(rows)
+            results.append({
+                'index': position,
+                'success': True,
+                'order_id': order_id,
+                'items_count': len(rows),
+                'total': round(order_total, 2)
+            })
+
+        # One journal append + fsync for the batch
+        if batch:
+            submit_orders(batch)
+
+        elapsed = time.perf_counter() - started
+        accepted = len(batch)
+        logger.info("Bulk orders saved", extra={'fields': {
+            'accepted': accepted,
+            'rejected': len(payloads) - accepted,
+            'items': sum(len(rows) for rows in batch),
+            'ms': round(elapsed * 1000, 1),
+            'orders_per_second': round(accepted / elapsed, 1) if elapsed > 0 else None
+        }})
+
+        return jsonify({
+            'success': accepted == len(payloads),
+            'accepted': accepted,
+            'rejected': len(payloads) - accepted,
+            'results': results
+        }), 201 if accepted else 400
+
+    except Exception as e:
+        logger.exception("Error creating bulk orders: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @orders_bp.route('/orders/customer/<customer_id>', methods=['GET'])
 def get_customer_orders(customer_id):
-    """Get all orders for a customer"""
-    print(f"\n📋 Fetching orders for customer: {customer_id}")
-    
+    """
+    Get a customer's orders, newest first.
+
+    Query params (any of them turns on paging):
+        limit: Orders per page (default 20, max 100)
+        after: `next_cursor` from the previous page
+        since: Only orders on or after this date (YYYY-MM-DD)
+
+    Without them every order is returned, as before.
+    """
     try:
-        if not os.path.exists(ORDERS_CSV):
-            print("📁 No orders file exists")
-            return jsonify({'orders': [], 'orders_count': 0})
-        
-        # Read all orders for this customer
-        orders = {}
-        
-        with open(ORDERS_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row.get('customer_id') == customer_id:
-                    oid = row['order_id']
-                    
-                    if oid not in orders:
-                        orders[oid] = {
-                            'order_id': oid,
-                            'purchase_date': row.get('purchase_date', ''),
-                            'payment_type': row.get('payment_type', ''),
-                            'whatsapp_number': row.get('whatsapp_number', ''),
-                            'emirate': row.get('emirate', ''),
-                            'city': row.get('city', ''),
-                            'address': row.get('address', ''),
-                            'items': [],
-                            'total': 0
-                        }
-                    
-                    # Add item
-                    item_total = float(row.get('total', 0))
-                    orders[oid]['items'].append({
-                        'product': row.get('product', ''),
-                        'quantity': int(row.get('quantity', 1)),
-                        'gold_price_gram': float(row.get('gold_price_gram', 0)),
-                        'commission_type': row.get('commission_type', ''),
-                        'commission_amount': float(row.get('commission_amount', 0)),
-                        'tax_amount': float(row.get('tax_amount', 0)),
-                        'total': item_total
-                    })
-                    orders[oid]['total'] += item_total
-        
-        # Convert to list and sort by date (newest first)
-        orders_list = list(orders.values())
-        orders_list.sort(key=lambda x: x['purchase_date'], reverse=True)
-        
-        print(f"📦 Found {len(orders_list)} orders for customer {customer_id}")
-        
+        # Orders still in the journal are applied first, so a customer sees their latest order
+        sync_journal()
+
+        limit_param = request.args.get('limit')
+        after_param = request.args.get('after')
+        since = request.args.get('since') or None
+
+        if limit_param is None and after_param is None and since is None:
+            # Read only this customer's rows (indexed in every backend)
+            orders_list = group_order_rows(get_order_store().customer_rows(customer_id))
+
+            logger.debug("Orders fetched", extra={'fields': {'customer_id': customer_id, 'orders': len(orders_list)}})
+
+            return jsonify({
+                'customer_id': customer_id,
+                'orders_count': len(orders_list),
+                'orders': orders_list
+            })
+
+        try:
+            limit = int(limit_param) if limit_param else DEFAULT_PAGE_SIZE
+            after = decode_cursor(after_param) if after_param else None
+        except ValueError:
+            return jsonify({'error': 'Invalid limit or cursor'}), 400
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        # Only the rows of the orders on this page are read
+        rows, has_more = get_order_store().customer_page(customer_id, limit, after=after, since=since)
+        orders_list = group_order_rows(rows)
+
+        next_cursor = None
+        if has_more and orders_list:
+            last = orders_list[-1]
+            next_cursor = encode_cursor(last['purchase_date'], last['order_id'])
+
+        logger.debug("Orders page fetched", extra={'fields': {
+            'customer_id': customer_id, 'orders': len(orders_list), 'has_more': has_more
+        }})
+
         return jsonify({
             'customer_id': customer_id,
             'orders_count': len(orders_list),
-            'orders': orders_list
+            'orders': orders_list,
+            'has_more': has_more,
+            'next_cursor': next_cursor
         })
-        
+
     except Exception as e:
-        print(f"❌ ERROR fetching orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error fetching orders: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
+@orders_bp.route('/orders/export', methods=['GET'])
+def export_orders():
+    """
+    Stream order rows for finance, one line per item.
+
+    Query params:
+        format: csv (default) or ndjson
+        from, to: YYYY-MM-DD purchase dates, inclusive
+        emirate, customer_id: exact matches
+
+    Requires X-Reports-Token; disabled (503) while VITANOVA_REPORTS_TOKEN is
+    unset, since rows carry customers' phone numbers and addresses.
+    """
+    error = reports_auth_error()
+    if error:
+        return error
+
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': "Invalid format, use csv or ndjson"}), 400
+    filters = {
+        'start_day': request.args.get('from') or None,
+        'end_day': request.args.get('to') or None,
+        'emirate': request.args.get('emirate') or None,
+        'customer_id': request.args.get('customer_id') or None,
+    }
+    try:
+        for key in ('start_day', 'end_day'):
+            if filters[key]:
+                filters[key] = datetime.strptime(filters[key], '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'Invalid date, use YYYY-MM-DD'}), 400
+
+    # Export what has been acknowledged, not only what has been applied
+    sync_journal()
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == 'csv':
+            writer.writerow(ORDER_COLUMNS)
+        rows = 0
+        for row in get_order_store().export_rows(**filters):
+            values = [row.get(c, '') for c in ORDER_COLUMNS]
+            if fmt == 'csv':
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(ORDER_COLUMNS, values)), ensure_ascii=False, default=str))
+                buffer.write('\n')
+            rows += 1
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        logger.info("Orders exported", extra={'fields': dict(filters, format=fmt, rows=rows)})
+
+    filename = f"orders-export.{fmt}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+def warm_orders():
+    """
+    Prepare the order store (index orders.csv or open orders.db), apply
+    anything a previous run left in the order journal and build the
+    customer holdings if they are missing (app warm-up)
+    """
+    get_order_store().warm()
+    replay_journal()
+    warm_holdings()
+
+
 def init_orders(app):
     """Initialize orders blueprint"""
     app.register_blueprint(orders_bp)
-    print("✅ Orders handler initialized")
+    app.register_blueprint(reports_bp)
+    app.register_blueprint(portfolio_bp)
+    logger.info("Orders handler initialized")
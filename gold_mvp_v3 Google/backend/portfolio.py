@@ -0,0 +1,258 @@
+"""
+VitaNova Portfolio
+==================
+Per-customer gold holdings, valued at the latest price.
+
+customer_holdings (in sales.db, next to the sales aggregates) keeps one
+row per customer with their orders, grams and cost basis. It is built from
+the order store once, the first time the app warms up without it, and
+after that the order journal applier adds every order that reaches the
+store to its customer's row (holdings_orders remembers the order IDs
+added, so a journal replay never adds one twice). GET
+/portfolio/<customer_id> reads that one row and multiplies by the latest
+shared tick (shared_prices.py), so neither a new order nor a new tick ever
+re-reads the order history.
+
+Rebuild from the order store (e.g. after importing history) with:
+
+    python portfolio.py rebuild
+"""
+
+import sqlite3
+import sys
+import threading
+
+from flask import Blueprint, jsonify
+from app_logging import get_logger
+from store_utils import LocalConnection, number
+from sales_reports import SALES_DB, product_weight, uncounted_rows
+from quote_table import current_price
+
+logger = get_logger('portfolio')
+
+portfolio_bp = Blueprint('portfolio', __name__)
+
+HOLDING_MEASURES = ('orders', 'grams', 'cost_basis', 'gold_cost')
+
+
+def aggregate_holdings(rows, totals=None):
+    """
+    Fold order rows (dicts in the orders.csv shape) into
+    {customer_id: [orders, grams, cost_basis, gold_cost]}
+
+    cost_basis is what the customer paid (total, with VAT and commission);
+    gold_cost is the gold alone (price per gram x grams).
+    """
+    totals = {} if totals is None else totals
+    counted = set()
+    for row in rows:
+        customer_id = row.get('customer_id') or ''
+        if not customer_id:
+            continue
+        grams = product_weight(row.get('product')) * number(row.get('quantity'), int)
+        entry = totals.setdefault(customer_id, [0, 0.0, 0.0, 0.0])
+        order_id = row.get('order_id')
+        if order_id not in counted:
+            counted.add(order_id)
+            entry[0] += 1
+        entry[1] += grams
+        entry[2] += number(row.get('total'))
+        entry[3] += grams * number(row.get('gold_price_gram'))
+    return totals
+
+
+class HoldingsCache:
+    """customer_holdings table in sales.db"""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS customer_holdings (
+            customer_id TEXT PRIMARY KEY,
+            orders      INTEGER NOT NULL DEFAULT 0,
+            grams       REAL NOT NULL DEFAULT 0,
+            cost_basis  REAL NOT NULL DEFAULT 0,
+            gold_cost   REAL NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS holdings_orders (
+            order_id    TEXT PRIMARY KEY
+        )
+        """,
+    )
+
+    UPSERT = f"""
+        INSERT INTO customer_holdings (customer_id, {', '.join(HOLDING_MEASURES)})
+        VALUES (?, {', '.join('?' * len(HOLDING_MEASURES))})
+        ON CONFLICT (customer_id) DO UPDATE SET
+        {', '.join(f'{m} = {m} + excluded.{m}' for m in HOLDING_MEASURES)}
+    """
+
+    def __init__(self, path=SALES_DB):
+        self.path = path
+        self._connections = LocalConnection(path, row_factory=sqlite3.Row)
+        self._built = False
+
+    def connection(self):
+        """One connection per thread (and per process: never reused across fork)"""
+        return self._connections.get()
+
+    def exists(self):
+        """True once the tables have been built (by any process)"""
+        if not self._built:
+            # rebuild() creates both tables in one transaction
+            row = self.connection().execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'holdings_orders'"
+            ).fetchone()
+            self._built = row is not None
+        return self._built
+
+    def _write(self, conn, totals):
+        conn.executemany(self.UPSERT, [(cid,) + tuple(values) for cid, values in totals.items()])
+
+    def record(self, rows):
+        """
+        Add newly written order rows to their customers' holdings (one
+        transaction), skipping orders already added. Before the first build
+        there is nothing to add to: the build reads these orders from the store.
+        """
+        rows = list(rows)
+        if not rows or not self.exists():
+            return
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            totals = aggregate_holdings(uncounted_rows(conn, 'holdings_orders', rows))
+            self._write(conn, totals)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def rebuild(self, rows):
+        """
+        Replace all holdings with ones computed from `rows` (every order row).
+        `rows` is read inside the write transaction, so record() calls for
+        orders written meanwhile wait and then add only what it missed.
+
+        Returns:
+            int: Number of customers
+        """
+        order_ids = set()
+
+        def counted(rows):
+            for row in rows:
+                order_ids.add(row.get('order_id'))
+                yield row
+
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            totals = aggregate_holdings(counted(rows))
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            conn.execute('DELETE FROM customer_holdings')
+            conn.execute('DELETE FROM holdings_orders')
+            conn.executemany('INSERT INTO holdings_orders (order_id) VALUES (?)', [(oid,) for oid in order_ids])
+            self._write(conn, totals)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._built = True
+        logger.info("Customer holdings rebuilt", extra={'fields': {'customers': len(totals)}})
+        return len(totals)
+
+    def get(self, customer_id):
+        """A customer's holdings as a dict, or None if they have no orders"""
+        if not self.exists():
+            return None
+        row = self.connection().execute(
+            f"SELECT {', '.join(HOLDING_MEASURES)} FROM customer_holdings WHERE customer_id = ?",
+            (customer_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+
+_holdings = None
+_holdings_lock = threading.Lock()
+
+
+def get_holdings_cache():
+    """Process-wide holdings cache (created on first use)"""
+    global _holdings
+    if _holdings is None:
+        with _holdings_lock:
+            if _holdings is None:
+                _holdings = HoldingsCache()
+    return _holdings
+
+
+def record_holdings(orders):
+    """
+    Add orders written to the store (lists of rows in ORDER_COLUMNS order)
+    to the holdings; called by the order journal applier.
+    Never fails an order: errors are logged, and `rebuild` repairs.
+    """
+    from order_store import ORDER_COLUMNS
+    try:
+        get_holdings_cache().record(
+            dict(zip(ORDER_COLUMNS, (str(v) for v in row))) for rows in orders for row in rows
+        )
+    except Exception as e:
+        logger.error("Could not update customer holdings: %s", e)
+
+
+def warm_holdings():
+    """Build the holdings from the order store the first time (app warm-up)"""
+    holdings = get_holdings_cache()
+    try:
+        if not holdings.exists():
+            from order_store import get_order_store
+            holdings.rebuild(get_order_store().iter_all_rows())
+    except Exception as e:
+        logger.error("Could not build customer holdings: %s", e)
+
+
+# ============== ROUTES ==============
+
+@portfolio_bp.route('/portfolio/<customer_id>', methods=['GET'])
+def get_portfolio(customer_id):
+    """Current value of a customer's gold: holdings x latest price per gram"""
+    try:
+        holdings = get_holdings_cache().get(customer_id) or {m: 0 for m in HOLDING_MEASURES}
+    except sqlite3.Error as e:
+        logger.exception("Portfolio lookup failed: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+    price, price_ts = current_price()
+    grams = holdings['grams'] or 0
+    cost_basis = holdings['cost_basis'] or 0
+    market_value = grams * price if price is not None else None
+    gain = market_value - cost_basis if market_value is not None else None
+
+    return jsonify({
+        'customer_id': customer_id,
+        'orders': holdings['orders'] or 0,
+        'grams': round(grams, 4),
+        'cost_basis': round(cost_basis, 2),
+        'gold_cost': round(holdings['gold_cost'] or 0, 2),
+        'average_price_gram': round(holdings['gold_cost'] / grams, 2) if grams else None,
+        'price_gram': round(price, 2) if price is not None else None,
+        'price_timestamp': price_ts.isoformat() if price_ts else None,
+        'market_value': round(market_value, 2) if market_value is not None else None,
+        'unrealized_gain': round(gain, 2) if gain is not None else None,
+        'unrealized_gain_percent': round(gain / cost_basis * 100, 2) if gain is not None and cost_basis else None,
+        'currency': 'AED'
+    })
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == 'rebuild':
+        from order_store import get_order_store
+        from order_journal import sync_journal
+        sync_journal()
+        count = get_holdings_cache().rebuild(get_order_store().iter_all_rows())
+        print(f"✅ Rebuilt holdings for {count} customers into {SALES_DB}")
+    else:
+        print(__doc__)
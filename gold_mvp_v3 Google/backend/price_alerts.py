@@ -0,0 +1,370 @@
+"""
+VitaNova Price Alerts
+=====================
+"Notify me when gold crosses X AED/gram" subscriptions.
+
+Alerts are stored in price_alerts.csv and indexed in memory as two sorted
+lists of (threshold, alert_id): one for alerts waiting for the price to
+rise to their threshold, one for the price to fall to it. When a tick
+moves the price from `previous` to `price`, the alerts it crossed are the
+slice between the two prices in one of the lists, found with bisect, so a
+tick costs O(log n + hits) however many alerts are active.
+
+price_alerts.csv is append-only: creating an alert appends its row, and
+confirming, triggering or cancelling it appends the same row again with
+the new status (the last row for an alert_id wins). Every worker follows
+the file from the last byte offset it read, so an event costs O(rows
+written), not a re-read of every alert. Writes hold a file lock, so an
+alert fires in only one process. Triggered alerts fire once, and their email is queued in
+price_alert_emails.csv (email_logger.py).
+
+A new alert is 'pending' until the subscriber follows the confirmation
+link queued to their address (price_alert_confirmations.csv), so nobody
+can sign someone else's email up. Cancelling needs the cancel_token
+returned when the alert was created (tokens.py), not just the customer id.
+The per-customer listing never includes the email addresses.
+"""
+
+import csv
+import io
+import os
+import threading
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+
+from flask import Blueprint, request, jsonify
+from app_logging import get_logger
+from email_logger import log_price_alert, log_price_alert_confirmation
+from order_store import FileLock
+from config import PRICE_ALERT_CONFIRM_EXPIRATION
+from tokens import (generate_alert_cancel_token, verify_alert_cancel_token,
+                    generate_alert_confirm_token, verify_alert_confirm_token)
+from validators import validate_email
+
+logger = get_logger('alerts')
+
+alerts_bp = Blueprint('alerts', __name__)
+
+BASE_DIR = os.path.dirname(__file__)
+
+PRICE_ALERTS_CSV = os.environ.get('VITANOVA_PRICE_ALERTS', os.path.join(BASE_DIR, 'price_alerts.csv'))
+
+# Active alerts (plus unexpired pending ones) one customer may hold
+MAX_ALERTS_PER_CUSTOMER = 20
+
+ALERT_COLUMNS = [
+    'alert_id', 'customer_id', 'email', 'direction', 'threshold',
+    'created_at', 'status', 'triggered_at', 'triggered_price'
+]
+# Returned by the per-customer listing (no email addresses)
+LISTED_COLUMNS = [c for c in ALERT_COLUMNS if c != 'email']
+DIRECTIONS = ('above', 'below')
+
+
+class AlertIndex:
+    """Active alerts by id, plus their thresholds in one sorted list per direction"""
+
+    def __init__(self):
+        self.alerts = {}   # alert_id -> row dict (every status)
+        self.above = []    # sorted (threshold, alert_id): fire when the price rises to it
+        self.below = []    # sorted (threshold, alert_id): fire when the price falls to it
+
+    def add(self, alert):
+        """Add an alert, or replace it with a later record of the same alert_id"""
+        current = self.alerts.get(alert['alert_id'])
+        if current is not None and current['status'] == 'active':
+            side = self._side(current)
+            key = (float(current['threshold']), current['alert_id'])
+            i = bisect_left(side, key)
+            if i < len(side) and side[i] == key:
+                del side[i]
+        self.alerts[alert['alert_id']] = alert
+        if alert['status'] == 'active':
+            insort(self._side(alert), (float(alert['threshold']), alert['alert_id']))
+
+    def _side(self, alert):
+        return self.above if alert['direction'] == 'above' else self.below
+
+    def crossed(self, previous, price):
+        """
+        Ids of active alerts crossed by a move from `previous` to `price`:
+        'above' thresholds in (previous, price], 'below' ones in [price, previous)
+        """
+        if previous is None or price == previous:
+            return []
+        if price > previous:
+            side = self.above
+            lo = bisect_right(side, (previous, chr(0x10FFFF)))
+            hi = bisect_right(side, (price, chr(0x10FFFF)))
+        else:
+            side = self.below
+            lo = bisect_left(side, (price, ''))
+            hi = bisect_left(side, (previous, ''))
+        return [alert_id for _, alert_id in side[lo:hi]]
+
+    def for_customer(self, customer_id):
+        return [a for a in self.alerts.values() if a['customer_id'] == customer_id]
+
+
+class PriceAlerts:
+    """price_alerts.csv with its in-memory AlertIndex, following appends to the file"""
+
+    def __init__(self, path=PRICE_ALERTS_CSV):
+        self.path = path
+        self.index = AlertIndex()
+        self._header = None
+        self._offset = 0
+        self._signature = None
+        self._lock = threading.RLock()
+        self._file_lock_path = path + '.lock'
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def refresh(self):
+        """Apply rows appended to price_alerts.csv since the last read (e.g. by another worker)"""
+        signature = self._stat()
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature is None or signature[0] < self._offset:
+                # Missing, or replaced by a shorter file: start over
+                self.index, self._header, self._offset = AlertIndex(), None, 0
+                if signature is None:
+                    self._signature = None
+                    return
+
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read(signature[0] - self._offset)
+            end = chunk.rfind(b'\n') + 1  # a partially written last row is read next time
+
+            reader = csv.reader(io.StringIO(chunk[:end].decode('utf-8'), newline=''))
+            if self._header is None:
+                self._header = next(reader, None)
+            for values in reader:
+                row = dict(zip(self._header, values))
+                try:
+                    float(row['threshold'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                self.index.add(row)
+
+            self._offset += end
+            self._signature = signature if end == len(chunk) else None
+
+    def _append(self, alerts):
+        """Append alert records and pick them up into the index (caller holds the file lock)"""
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=ALERT_COLUMNS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(alerts)
+        self.refresh()
+
+    # ---------- subscriptions ----------
+
+    def create(self, customer_id, email, direction, threshold):
+        """
+        Add a pending alert (see confirm()).
+
+        Returns:
+            tuple: (alert dict, error message or None)
+        """
+        with FileLock(self._file_lock_path), self._lock:
+            self.refresh()
+            confirmable = (datetime.now() - timedelta(seconds=PRICE_ALERT_CONFIRM_EXPIRATION)).isoformat()
+            held = [a for a in self.index.for_customer(customer_id)
+                    if a['status'] == 'active' or (a['status'] == 'pending' and a['created_at'] > confirmable)]
+            if len(held) >= MAX_ALERTS_PER_CUSTOMER:
+                return None, f'At most {MAX_ALERTS_PER_CUSTOMER} active alerts per customer'
+            alert = {
+                'alert_id': uuid.uuid4().hex[:12],
+                'customer_id': customer_id,
+                'email': email,
+                'direction': direction,
+                'threshold': f"{threshold:.2f}",
+                'created_at': datetime.now().isoformat(),
+                'status': 'pending',
+                'triggered_at': '',
+                'triggered_price': ''
+            }
+            self._append([alert])
+        logger.info("Price alert created, awaiting confirmation", extra={'fields': {
+            'alert_id': alert['alert_id'], 'customer_id': customer_id,
+            'direction': direction, 'threshold': alert['threshold']
+        }})
+        return alert, None
+
+    def confirm(self, alert_id):
+        """Activate a pending alert. Returns True if it is (now or already) active."""
+        with FileLock(self._file_lock_path), self._lock:
+            self.refresh()
+            alert = self.index.alerts.get(alert_id)
+            if not alert or alert['status'] not in ('pending', 'active'):
+                return False
+            if alert['status'] == 'active':
+                return True
+            self._append([dict(alert, status='active')])
+        logger.info("Price alert confirmed", extra={'fields': {'alert_id': alert_id}})
+        return True
+
+    def cancel(self, alert_id):
+        """Cancel a pending or active alert. Returns True if it was cancelled."""
+        with FileLock(self._file_lock_path), self._lock:
+            self.refresh()
+            alert = self.index.alerts.get(alert_id)
+            if not alert or alert['status'] not in ('pending', 'active'):
+                return False
+            self._append([dict(alert, status='cancelled')])
+        logger.info("Price alert cancelled", extra={'fields': {'alert_id': alert_id}})
+        return True
+
+    def for_customer(self, customer_id):
+        self.refresh()
+        return self.index.for_customer(customer_id)
+
+    # ---------- ticks ----------
+
+    def check(self, previous, price):
+        """
+        Fire the alerts crossed by a tick from `previous` to `price`.
+
+        Returns:
+            list: Triggered alert dicts
+        """
+        self.refresh()
+        if not self.index.crossed(previous, price):
+            return []  # the common case: no lock, no write
+
+        triggered = []
+        with FileLock(self._file_lock_path), self._lock:
+            self.refresh()  # another worker may have fired them meanwhile
+            now = datetime.now().isoformat()
+            for alert_id in self.index.crossed(previous, price):
+                triggered.append(dict(
+                    self.index.alerts[alert_id],
+                    status='triggered', triggered_at=now, triggered_price=f"{price:.2f}"
+                ))
+            if triggered:
+                self._append(triggered)
+
+        for alert in triggered:
+            log_price_alert(alert['email'], alert['alert_id'], alert['direction'], alert['threshold'], price)
+        logger.info("Price alerts triggered", extra={'fields': {
+            'count': len(triggered), 'previous': previous, 'price': price
+        }})
+        return triggered
+
+
+_alerts = None
+_alerts_lock = threading.Lock()
+
+
+def get_price_alerts():
+    """Process-wide price alerts (loaded on first use)"""
+    global _alerts
+    if _alerts is None:
+        with _alerts_lock:
+            if _alerts is None:
+                _alerts = PriceAlerts()
+    return _alerts
+
+
+def check_price_alerts(previous, price):
+    """
+    Price ingestion hook: fire alerts crossed since the previous tick.
+    Never fails the tick; errors are logged.
+    """
+    try:
+        return get_price_alerts().check(previous, price)
+    except Exception as e:
+        logger.exception("Checking price alerts failed: %s", e)
+        return []
+
+
+# ============== ROUTES ==============
+
+@alerts_bp.route('/alerts', methods=['POST', 'OPTIONS'])
+def create_alert():
+    """
+    Subscribe to a price alert. It stays pending until confirmed from the
+    link emailed to `email` (GET /alerts/confirm?token=...).
+
+    Body: {"customer_id", "email", "direction": "above" | "below", "threshold": AED/gram}
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    data = request.get_json(silent=True) or {}
+    customer_id = str(data.get('customer_id', '')).strip()
+    email = str(data.get('email', '')).strip().lower()
+    direction = data.get('direction', '')
+
+    if not customer_id:
+        return jsonify({'success': False, 'error': 'Missing customer_id'}), 400
+    valid, error = validate_email(email)
+    if not valid:
+        return jsonify({'success': False, 'error': error}), 400
+    if direction not in DIRECTIONS:
+        return jsonify({'success': False, 'error': "direction must be 'above' or 'below'"}), 400
+    try:
+        threshold = float(data.get('threshold'))
+        if threshold <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid threshold'}), 400
+
+    alert, error = get_price_alerts().create(customer_id, email, direction, threshold)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    log_price_alert_confirmation(email, alert['alert_id'], direction, alert['threshold'],
+                                 generate_alert_confirm_token(alert['alert_id']))
+    # Only returned here: whoever holds it may cancel the alert
+    return jsonify({
+        'success': True,
+        'alert': alert,
+        'cancel_token': generate_alert_cancel_token(alert['alert_id'])
+    }), 201
+
+
+@alerts_bp.route('/alerts/confirm', methods=['GET'])
+def confirm_alert():
+    """Activate a pending alert (?token= from the confirmation email)"""
+    alert_id = verify_alert_confirm_token(request.args.get('token', ''))
+    if not alert_id:
+        return jsonify({'success': False, 'error': 'Invalid or expired confirmation link'}), 400
+    if not get_price_alerts().confirm(alert_id):
+        return jsonify({'success': False, 'error': 'Alert not found'}), 404
+    return jsonify({'success': True, 'alert_id': alert_id})
+
+
+@alerts_bp.route('/alerts/customer/<customer_id>', methods=['GET'])
+def list_alerts(customer_id):
+    """A customer's alerts, newest first, without their email addresses"""
+    alerts = sorted(get_price_alerts().for_customer(customer_id), key=lambda a: a['created_at'], reverse=True)
+    alerts = [{c: alert.get(c, '') for c in LISTED_COLUMNS} for alert in alerts]
+    return jsonify({'customer_id': customer_id, 'alerts_count': len(alerts), 'alerts': alerts})
+
+
+@alerts_bp.route('/alerts/<alert_id>', methods=['DELETE'])
+def cancel_alert(alert_id):
+    """Cancel an active alert (?token= or X-Alert-Token: the cancel_token from its creation)"""
+    token = request.headers.get('X-Alert-Token') or request.args.get('token', '')
+    if not verify_alert_cancel_token(token, alert_id):
+        return jsonify({'success': False, 'error': 'Invalid cancel token'}), 403
+    if not get_price_alerts().cancel(alert_id):
+        return jsonify({'success': False, 'error': 'Alert not found'}), 404
+    return jsonify({'success': True, 'alert_id': alert_id})
+
+
+def init_alerts(app):
+    """Initialize price alerts blueprint"""
+    app.register_blueprint(alerts_bp)
+    logger.info("Price alerts initialized")
@@ -0,0 +1,218 @@
+"""
+VitaNova Price Analytics
+========================
+Moving averages, exponential moving averages, rolling volatility and
+returns over the DailyGold.csv tick series, for chart overlays.
+
+Each window size has a rolling state (running sums over a deque, the last
+EMA value) that is advanced one tick at a time. Requests only feed the
+state the ticks price_store has tailed since the previous request, so
+polling /price/analytics costs O(new ticks + points returned), never a
+pass over the whole history. A window seen for the first time is replayed
+over only the last WARMUP_WINDOWS * size + MAX_ANALYTICS_POINTS ticks:
+enough to fill every value it can return, with the EMA's start-up error
+decayed below 0.1%. It is then kept (up to MAX_TRACKED_WINDOWS).
+"""
+
+import math
+import threading
+from collections import OrderedDict, deque
+
+from flask import Blueprint, request, jsonify
+from app_logging import get_logger
+from price_store import price_store
+
+logger = get_logger('prices.analytics')
+
+analytics_bp = Blueprint('analytics', __name__)
+
+# Window sizes (in ticks) accepted, and how many are kept up to date at once
+MAX_ANALYTICS_WINDOW = 500
+MAX_TRACKED_WINDOWS = 16
+# Series values returned per metric (?points=)
+DEFAULT_ANALYTICS_POINTS = 100
+MAX_ANALYTICS_POINTS = 2000
+
+DEFAULT_WINDOWS = {'sma': [20], 'ema': [20], 'volatility': [20], 'returns': [1, 20]}
+
+# A new window is replayed over this many window lengths before the values it
+# can return; its EMA seed then weighs (1 - 2/(size+1))^(4*size) < 0.04% in them
+WARMUP_WINDOWS = 4
+
+
+class RollingWindow:
+    """SMA, EMA, volatility of log returns and return over the last `size` ticks"""
+
+    def __init__(self, size):
+        self.size = size
+        self.alpha = 2 / (size + 1)
+        self.prices = deque(maxlen=size + 1)  # one extra for the window return
+        self.price_sum = 0.0                   # over the last `size` prices
+        self.log_returns = deque(maxlen=size)
+        self.return_sum = 0.0
+        self.return_sq_sum = 0.0
+        self.ema = None
+        # One value per tick (None until the window is full), the most recent ones only
+        self.series = {metric: deque(maxlen=MAX_ANALYTICS_POINTS) for metric in DEFAULT_WINDOWS}
+
+    def push(self, price):
+        prices = self.prices
+        if prices:
+            r = math.log(price / prices[-1]) if prices[-1] > 0 and price > 0 else 0.0
+            if len(self.log_returns) == self.size:
+                old = self.log_returns[0]
+                self.return_sum -= old
+                self.return_sq_sum -= old * old
+            self.log_returns.append(r)
+            self.return_sum += r
+            self.return_sq_sum += r * r
+
+        if len(prices) >= self.size:
+            self.price_sum -= prices[-self.size]
+        prices.append(price)
+        self.price_sum += price
+
+        self.ema = price if self.ema is None else self.ema + self.alpha * (price - self.ema)
+
+        full = len(prices) >= self.size
+        n = len(self.log_returns)
+        volatility = None
+        if n == self.size and n > 1:
+            variance = (self.return_sq_sum - self.return_sum * self.return_sum / n) / (n - 1)
+            volatility = math.sqrt(max(variance, 0.0)) * 100
+        self.series['sma'].append(self.price_sum / self.size if full else None)
+        self.series['ema'].append(self.ema if full else None)
+        self.series['volatility'].append(volatility)
+        self.series['returns'].append(
+            (price / prices[0] - 1) * 100 if len(prices) == self.size + 1 and prices[0] else None
+        )
+
+
+class PriceAnalytics:
+    """Rolling windows over price_store's daily ticks, advanced as ticks arrive"""
+
+    def __init__(self, store=price_store):
+        self.store = store
+        self.timestamps = []
+        self.windows = OrderedDict()  # size -> RollingWindow, least recently used first
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        """Feed every window the ticks tailed since the last call"""
+        daily = self.store.daily_prices()
+        consumed = len(self.timestamps)
+        if len(daily) < consumed or (consumed and daily[consumed - 1]['timestamp'] != self.timestamps[-1]):
+            # DailyGold.csv was rewritten: start over
+            logger.info("Tick series changed, rebuilding analytics")
+            self.timestamps = []
+            self.windows = OrderedDict((size, RollingWindow(size)) for size in self.windows)
+            consumed = 0
+        for point in daily[consumed:]:
+            self.timestamps.append(point['timestamp'])
+            for window in self.windows.values():
+                window.push(point['price'])
+        return daily
+
+    def window(self, size, daily):
+        """The rolling state for a window size, replayed over recent ticks on first use"""
+        window = self.windows.get(size)
+        if window is None:
+            window = RollingWindow(size)
+            consumed = len(self.timestamps)
+            start = max(0, consumed - WARMUP_WINDOWS * size - MAX_ANALYTICS_POINTS)
+            for point in daily[start:consumed]:
+                window.push(point['price'])
+            self.windows[size] = window
+            while len(self.windows) > MAX_TRACKED_WINDOWS:
+                self.windows.popitem(last=False)
+        else:
+            self.windows.move_to_end(size)
+        return window
+
+    def compute(self, requested, points):
+        """
+        Latest value and last `points` values of each requested metric.
+
+        Args:
+            requested: {'sma': [sizes], 'ema': [...], 'volatility': [...], 'returns': [...]}
+        """
+        with self._lock:
+            daily = self._sync()
+            timestamps = self.timestamps[-points:] if points else []
+            result = {
+                'count': len(self.timestamps),
+                'latest': {
+                    'timestamp': self.timestamps[-1].isoformat(),
+                    'price': round(daily[len(self.timestamps) - 1]['price'], 2)
+                } if self.timestamps else None,
+                'timestamps': [ts.isoformat() for ts in timestamps],
+            }
+            for metric, sizes in requested.items():
+                digits = 2 if metric in ('sma', 'ema') else 4
+                result[metric] = {}
+                for size in sizes:
+                    series = self.window(size, daily).series[metric]
+                    latest = series[-1] if series else None
+                    result[metric][str(size)] = {
+                        'latest': round(latest, digits) if latest is not None else None,
+                        'values': [round(v, digits) if v is not None else None
+                                   for v in (list(series)[-points:] if points else [])]
+                    }
+        return result
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_price_analytics():
+    """Process-wide analytics state (created on first use)"""
+    global _analytics
+    if _analytics is None:
+        with _analytics_lock:
+            if _analytics is None:
+                _analytics = PriceAnalytics()
+    return _analytics
+
+
+def _parse_sizes(value, default):
+    if value is None:
+        return default
+    sizes = sorted({int(v) for v in value.split(',') if v.strip()})
+    if any(size < 1 or size > MAX_ANALYTICS_WINDOW for size in sizes):
+        raise ValueError
+    return sizes
+
+
+# ============== ROUTES ==============
+
+@analytics_bp.route('/price/analytics', methods=['GET'])
+def price_analytics():
+    """
+    Technical indicators over the tick series.
+
+    Query params (comma-separated window sizes, in ticks):
+        sma, ema, volatility (std of log returns, %), returns (%)
+        points: values returned per series (default 100, 0 for latest only)
+    """
+    try:
+        requested = {
+            metric: _parse_sizes(request.args.get(metric), default)
+            for metric, default in DEFAULT_WINDOWS.items()
+        }
+        points = int(request.args.get('points', DEFAULT_ANALYTICS_POINTS))
+    except ValueError:
+        return jsonify({'error': f'Invalid window or points (windows 1-{MAX_ANALYTICS_WINDOW})'}), 400
+    points = max(0, min(points, MAX_ANALYTICS_POINTS))
+    if len({size for sizes in requested.values() for size in sizes}) > MAX_TRACKED_WINDOWS:
+        return jsonify({'error': f'At most {MAX_TRACKED_WINDOWS} distinct windows per request'}), 400
+
+    result = get_price_analytics().compute(requested, points)
+    result.update({'series': 'daily', 'currency': 'AED', 'unit': 'gram'})
+    return jsonify(result)
+
+
+def init_analytics(app):
+    """Initialize price analytics blueprint"""
+    app.register_blueprint(analytics_bp)
+    logger.info("Price analytics initialized")
@@ -0,0 +1,200 @@
+"""
+VitaNova Backtest Calculator
+============================
+"What if I had bought gold?" scenarios over the whole price history
+(HistoricalMVPGold.csv monthly prices since 2000 plus DailyGold.csv ticks).
+
+    lump  invest `amount` AED once, at `start`
+    dca   invest `amount` AED on the first of every month from `start` to `end`
+
+Each scenario is valued at every recorded price between its first purchase
+and `end` with NumPy cumulative sums over the price arrays, so there are
+no per-point Python loops and a request with many scenarios takes a few
+milliseconds. The arrays are rebuilt only when price_store sees new data.
+"""
+
+import math
+import threading
+from datetime import datetime
+
+import numpy as np
+from flask import Blueprint, request, jsonify
+from app_logging import get_logger
+from price_store import price_store
+
+logger = get_logger('prices.backtest')
+
+backtest_bp = Blueprint('backtest', __name__)
+
+# Scenarios accepted by one POST /price/backtest
+MAX_BACKTEST_SCENARIOS = 50
+# Largest `amount` (AED); sums of bigger ones can overflow to infinity
+MAX_BACKTEST_AMOUNT = 1e12
+
+SECONDS_PER_YEAR = 365.25 * 24 * 60 * 60
+MODES = ('lump', 'dca')
+
+_series = None  # (price_store version, timestamps in seconds, prices)
+_series_lock = threading.Lock()
+
+
+def price_arrays():
+    """(timestamps as int64 seconds, prices as float64) of all_prices(), cached per data version"""
+    global _series
+    all_prices, timestamps = price_store.indexed_prices()
+    version = price_store.version
+    series = _series
+    if series is None or series[0] != version:
+        with _series_lock:
+            series = (
+                version,
+                np.array(timestamps, dtype='datetime64[s]').astype(np.int64),
+                np.fromiter((p['price'] for p in all_prices), dtype=np.float64, count=len(all_prices))
+            )
+            _series = series
+    return series[1], series[2]
+
+
+def _to_seconds(value):
+    return int(np.datetime64(value, 's').astype(np.int64))
+
+
+def _isoformat(seconds):
+    return np.datetime64(int(seconds), 's').astype(datetime).isoformat()
+
+
+def _parse_month(value, name):
+    """'2010-01' or '2010-01-15' -> numpy month"""
+    try:
+        return np.datetime64(datetime.strptime(str(value)[:7], '%Y-%m').strftime('%Y-%m'), 'M')
+    except ValueError:
+        raise ValueError(f'Invalid {name}, use YYYY-MM')
+
+
+def run_scenario(ts, prices, mode, amount, start, end=None):
+    """
+    Backtest one scenario over the price arrays.
+
+    Args:
+        ts, prices: price_arrays()
+        mode: 'lump' or 'dca'
+        amount: AED invested (once, or every month)
+        start, end: numpy months; end defaults to the latest price
+
+    Returns:
+        dict: invested, final value, gain, CAGR and max drawdown
+    """
+    end_ts = ts[-1] if end is None else min(ts[-1], _to_seconds(end + 1) - 1)
+    if mode == 'lump':
+        buy_times = np.array([_to_seconds(start)])
+    else:
+        last_month = end if end is not None else np.datetime64(int(ts[-1]), 's').astype('datetime64[M]')
+        buy_times = np.arange(start, last_month + 1, dtype='datetime64[M]').astype('datetime64[s]').astype(np.int64)
+    buy_times = buy_times[buy_times <= end_ts]
+    if buy_times.size == 0:
+        raise ValueError('start is after end or after the latest price')
+
+    # Each purchase uses the last price at or before it (the first one for dates before the data)
+    buy_idx = np.clip(np.searchsorted(ts, buy_times, side='right') - 1, 0, len(ts) - 1)
+    first = int(buy_idx[0])
+    last = int(np.searchsorted(ts, end_ts, side='right') - 1)
+    window = prices[first:last + 1]
+
+    offsets = buy_idx - first
+    grams = np.cumsum(np.bincount(offsets, weights=amount / prices[buy_idx], minlength=window.size))
+    invested = np.cumsum(np.bincount(offsets, minlength=window.size)) * amount
+    value = grams * window
+
+    # Drawdown of value per AED invested, so new contributions are not counted as gains
+    ratio = value / invested
+    peak = np.maximum.accumulate(ratio)
+    max_drawdown = float(np.max(1 - ratio / peak))
+
+    total_invested = float(invested[-1])
+    final_value = float(value[-1])
+    # Years each AED was invested, averaged over contributions (= holding period for lump sum)
+    years = float(np.mean(ts[last] - ts[buy_idx])) / SECONDS_PER_YEAR
+    cagr = (final_value / total_invested) ** (1 / years) - 1 if years > 0 and total_invested > 0 else None
+
+    return {
+        'mode': mode,
+        'amount': amount,
+        'start': _isoformat(ts[first]),
+        'end': _isoformat(ts[last]),
+        'purchases': int(buy_times.size),
+        'invested': round(total_invested, 2),
+        'grams': round(float(grams[-1]), 4),
+        'final_value': round(final_value, 2),
+        'gain': round(final_value - total_invested, 2),
+        'gain_percent': round((final_value / total_invested - 1) * 100, 2),
+        'cagr_percent': round(cagr * 100, 2) if cagr is not None else None,
+        'max_drawdown_percent': round(max_drawdown * 100, 2)
+    }
+
+
+def parse_scenario(raw):
+    """(mode, amount, start, end) from a request scenario; ValueError if invalid"""
+    if not isinstance(raw, dict):
+        raise ValueError('Invalid scenario')
+    mode = raw.get('mode', 'lump')
+    if mode not in MODES:
+        raise ValueError("mode must be 'lump' or 'dca'")
+    try:
+        amount = float(raw.get('amount', 1000))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid amount')
+    if not math.isfinite(amount) or not 0 < amount <= MAX_BACKTEST_AMOUNT:
+        raise ValueError('Invalid amount')
+    if not raw.get('start'):
+        raise ValueError('Missing start (YYYY-MM)')
+    start = _parse_month(raw['start'], 'start')
+    end = _parse_month(raw['end'], 'end') if raw.get('end') else None
+    if end is not None and end < start:
+        raise ValueError('end is before start')
+    return mode, amount, start, end
+
+
+# ============== ROUTES ==============
+
+@backtest_bp.route('/price/backtest', methods=['GET', 'POST'])
+def price_backtest():
+    """
+    Backtest lump-sum and monthly DCA purchases.
+
+    GET  /price/backtest?mode=dca&amount=500&start=2010-01[&end=2020-12]
+    POST /price/backtest  {"scenarios": [{"mode", "amount", "start", "end"}, ...]}
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        raw_scenarios = body.get('scenarios') if isinstance(body, dict) else body
+    else:
+        raw_scenarios = [request.args.to_dict()]
+
+    if not isinstance(raw_scenarios, list) or not raw_scenarios:
+        return jsonify({'error': 'scenarios must be a non-empty list'}), 400
+    if len(raw_scenarios) > MAX_BACKTEST_SCENARIOS:
+        return jsonify({'error': f'At most {MAX_BACKTEST_SCENARIOS} scenarios per request'}), 400
+
+    ts, prices = price_arrays()
+    if ts.size == 0:
+        return jsonify({'error': 'No price data'}), 503
+
+    results = []
+    for position, raw in enumerate(raw_scenarios):
+        try:
+            results.append(run_scenario(ts, prices, *parse_scenario(raw)))
+        except ValueError as e:
+            results.append({'index': position, 'error': str(e)})
+
+    return jsonify({
+        'count': len(results),
+        'currency': 'AED',
+        'data_end': _isoformat(ts[-1]),
+        'results': results
+    })
+
+
+def init_backtest(app):
+    """Initialize backtest blueprint"""
+    app.register_blueprint(backtest_bp)
+    logger.info("Backtest calculator initialized")
@@ -0,0 +1,103 @@
+"""
+VitaNova Price Quotes
+=====================
+Short-lived signed quotes for checkout. /price/quote signs the latest
+shared price tick (shared_prices.py) with the itsdangerous serializer from
+tokens.py; order creation reads the price back out of the token instead of
+trusting the gold_price_gram the client sends. Neither side calls APISED.
+
+Orders need a quote token unless VITANOVA_REQUIRE_QUOTE=0; then an order
+without one is accepted only if its gold_price_gram is within
+QUOTE_PRICE_TOLERANCE of the latest shared tick.
+"""
+
+import math
+import os
+import time
+
+from shared_prices import get_segment
+from tokens import generate_price_quote_token, verify_price_quote_token
+from config import PRICE_QUOTE_EXPIRATION
+from app_logging import get_logger
+
+logger = get_logger('prices.quotes')
+
+# Only quote from a tick at most this old (seconds); older means /price is not being polled
+QUOTE_PRICE_MAX_AGE = int(os.environ.get('QUOTE_PRICE_MAX_AGE', 300))
+
+# Orders without a quote token are rejected unless this is turned off
+REQUIRE_PRICE_QUOTE = os.environ.get('VITANOVA_REQUIRE_QUOTE', '1').lower() not in ('0', 'false', 'no')
+# Largest relative gap between a client price and the latest tick when no quote is required
+QUOTE_PRICE_TOLERANCE = float(os.environ.get('QUOTE_PRICE_TOLERANCE', 0.005))
+
+
+class QuoteError(ValueError):
+    """A quote token that cannot be used"""
+
+
+def issue_quote():
+    """
+    Quote the latest shared price.
+
+    Returns:
+        dict: token, price (AED/gram), timestamps and expiry
+        None: If there is no fresh price to quote
+    """
+    segment = get_segment()
+    tick = segment.latest(QUOTE_PRICE_MAX_AGE) if segment else None
+    if tick is None:
+        return None
+
+    issued_at = time.time()
+    quote = {
+        'price': round(tick['price'], 2),
+        'tick': tick['timestamp'].isoformat(),
+    }
+    return {
+        'token': generate_price_quote_token(quote),
+        'price': quote['price'],
+        'price_timestamp': quote['tick'],
+        'expires_at': issued_at + PRICE_QUOTE_EXPIRATION,
+        'expires_in': PRICE_QUOTE_EXPIRATION,
+        'currency': 'AED',
+        'unit': 'gram',
+        'karat': '24k'
+    }
+
+
+def redeem_quote(token):
+    """
+    Price per gram from a quote token.
+
+    Raises:
+        QuoteError: If the token is invalid or expired
+    """
+    if not isinstance(token, str):
+        raise QuoteError('Invalid price quote')
+    quote = verify_price_quote_token(token)
+    if not isinstance(quote, dict) or 'price' not in quote:
+        raise QuoteError('Price quote expired or invalid, please refresh the price')
+    return float(quote['price'])
+
+
+def check_client_price(price):
+    """
+    A client's gold_price_gram, for an order without a quote (only when
+    REQUIRE_PRICE_QUOTE is off).
+
+    Raises:
+        QuoteError: If there is no fresh tick, or the price is not within
+            QUOTE_PRICE_TOLERANCE of it
+    """
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        raise QuoteError('Invalid gold price')
+    segment = get_segment()
+    tick = segment.latest(QUOTE_PRICE_MAX_AGE) if segment else None
+    if tick is None:
+        raise QuoteError('No current price to check the order against, please try again')
+    if not math.isfinite(price) or abs(price - tick['price']) > tick['price'] * QUOTE_PRICE_TOLERANCE:
+        logger.warning("Client price rejected", extra={'fields': {'client_price': price, 'tick_price': tick['price']}})
+        raise QuoteError('Price is out of date, please refresh the price')
+    return price
@@ -0,0 +1,414 @@
+"""
+VitaNova Price Store
+====================
+Parsed gold price series from DailyGold.csv and HistoricalMVPGold.csv,
+kept in memory and followed incrementally, plus a small response cache
+for the chart endpoints.
+"""
+
+import csv
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from datetime import datetime
+from app_logging import get_logger
+
+logger = get_logger('prices.store')
+
+BASE_DIR = os.path.dirname(__file__)
+
+# CSV file paths for gold prices
+DAILY_CSV_PATH = os.environ.get('VITANOVA_DAILY_CSV', os.path.join(BASE_DIR, 'DailyGold.csv'))
+HISTORICAL_CSV_PATH = os.environ.get('VITANOVA_HISTORICAL_CSV', os.path.join(BASE_DIR, 'HistoricalMVPGold.csv'))
+
+# Warm-start snapshot written on graceful shutdown (gzipped JSON)
+SNAPSHOT_PATH = os.environ.get('PRICE_SNAPSHOT_PATH', os.path.join(BASE_DIR, 'price_cache.snapshot'))
+# Bump when the snapshot layout changes
+SNAPSHOT_FORMAT = 1
+
+# Chart responses kept per process, least recently used dropped first
+# (keys include client-chosen date ranges, so the cache must be bounded)
+MAX_CACHED_RESPONSES = int(os.environ.get('PRICE_RESPONSE_CACHE_SIZE', 256))
+
+
+def parse_daily_timestamp(ts_str):
+    """Parse DailyGold.csv timestamp format: SS/MM/HH/DD/MM/YYYY"""
+    try:
+        parts = ts_str.split('/')
+        if len(parts) == 6:
+            sec, minute, hour, day, month, year = parts
+            return datetime(int(year), int(month), int(day), int(hour), int(minute), int(sec))
+    except:
+        pass
+    return None
+
+
+def parse_historical_date(date_str):
+    """Parse HistoricalMVPGold.csv date format: MM/YYYY"""
+    try:
+        parts = date_str.split('/')
+        if len(parts) == 2:
+            month, year = parts
+            return datetime(int(year), int(month), 1)
+    except:
+        pass
+    return None
+
+
+def parse_daily_row(row):
+    """Parse one DailyGold.csv row into a price point, or None"""
+    if len(row) >= 2:
+        ts = parse_daily_timestamp(row[0])
+        try:
+            price = float(row[1])
+            if ts:
+                return {'timestamp': ts, 'price': price}
+        except:
+            pass
+    return None
+
+
+def parse_historical_row(row):
+    """Parse one HistoricalMVPGold.csv row into a price point (AED, plus USD when present), or None"""
+    if len(row) >= 5:
+        ts = parse_historical_date(row[0])
+        try:
+            price = float(row[4])
+            if ts:
+                point = {'timestamp': ts, 'price': price}
+                try:
+                    point['price_usd'] = float(row[3])
+                except ValueError:
+                    pass
+                return point
+        except:
+            pass
+    return None
+
+
+def load_daily_prices():
+    """Load all prices from DailyGold.csv"""
+    prices = []
+    if not os.path.exists(DAILY_CSV_PATH):
+        return prices
+
+    with open(DAILY_CSV_PATH, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+
+        for row in reader:
+            point = parse_daily_row(row)
+            if point:
+                prices.append(point)
+
+    return prices
+
+
+def load_historical_prices():
+    """Load all prices from HistoricalMVPGold.csv"""
+    prices = []
+    if not os.path.exists(HISTORICAL_CSV_PATH):
+        return prices
+
+    with open(HISTORICAL_CSV_PATH, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+
+        for row in reader:
+            point = parse_historical_row(row)
+            if point:
+                prices.append(point)
+
+    return prices
+
+
+def _file_checksum(path, length=None):
+    """sha256 of a file (or of its first `length` bytes), or None if missing"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            remaining = length
+            while remaining is None or remaining > 0:
+                block = f.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                if remaining is not None:
+                    remaining -= len(block)
+    except OSError:
+        return None
+    if length is not None and remaining:
+        return None  # file is shorter than the snapshot saw
+    return digest.hexdigest()
+
+
+def _encode_points(points):
+    """Price points as JSON-ready [iso timestamp, price, price_usd or None] lists"""
+    return [[p['timestamp'].isoformat(), p['price'], p.get('price_usd')] for p in points]
+
+
+def _decode_points(rows):
+    """Inverse of _encode_points"""
+    points = []
+    for timestamp, price, price_usd in rows:
+        point = {'timestamp': datetime.fromisoformat(timestamp), 'price': float(price)}
+        if price_usd is not None:
+            point['price_usd'] = float(price_usd)
+        points.append(point)
+    return points
+
+
+def _file_signature(path):
+    """(size, mtime) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns)
+    except OSError:
+        return None
+
+
+class PriceStore:
+    """
+    In-memory copy of both price CSVs.
+
+    DailyGold.csv is followed from the last byte offset read, so ticks
+    appended by this or any other worker are picked up without re-parsing
+    the whole file. HistoricalMVPGold.csv is reloaded when it changes.
+    Every change bumps `version`, which keys the response cache.
+    """
+
+    def __init__(self, daily_path=DAILY_CSV_PATH, historical_path=HISTORICAL_CSV_PATH):
+        self.daily_path = daily_path
+        self.historical_path = historical_path
+        self._lock = threading.RLock()
+        self.daily = []
+        self.historical = []
+        self._daily_offset = 0
+        self._daily_signature = None
+        self._historical_signature = None
+        self._all = None
+        self._timestamps = None
+        self._responses = OrderedDict()  # key -> (version, built at, payload)
+        self.version = 0
+        self.loaded = False
+
+    # ---------- loading ----------
+
+    def _read_daily_tail(self):
+        """Parse complete rows appended to DailyGold.csv since the last read"""
+        signature = _file_signature(self.daily_path)
+        if signature == self._daily_signature:
+            return False
+        if signature is None:
+            changed = bool(self.daily)
+            self.daily, self._daily_offset, self._daily_signature = [], 0, None
+            return changed
+
+        size = signature[0]
+        if size < self._daily_offset:
+            # File was rewritten; start over
+            self.daily, self._daily_offset = [], 0
+
+        with open(self.daily_path, 'rb') as f:
+            f.seek(self._daily_offset)
+            chunk = f.read(size - self._daily_offset)
+
+        # Leave a partially written last line for the next read
+        end = chunk.rfind(b'\n') + 1
+        lines = chunk[:end].decode('utf-8').splitlines()
+        if self._daily_offset == 0 and lines:
+            lines = lines[1:]  # header
+
+        new_points = []
+        for row in csv.reader(lines):
+            point = parse_daily_row(row)
+            if point:
+                new_points.append(point)
+
+        self._daily_offset += end
+        self._daily_signature = signature if end == len(chunk) else None
+        if new_points:
+            # New list so readers holding the old one are not mutated under them
+            self.daily = self.daily + new_points
+            return True
+        return False
+
+    def _read_historical(self):
+        """Reload HistoricalMVPGold.csv if it changed"""
+        signature = _file_signature(self.historical_path)
+        if signature == self._historical_signature:
+            return False
+        prices = []
+        if signature is not None:
+            with open(self.historical_path, 'r', newline='') as csvfile:
+                reader = csv.reader(csvfile)
+                next(reader, None)
+                for row in reader:
+                    point = parse_historical_row(row)
+                    if point:
+                        prices.append(point)
+        self.historical = prices
+        self._historical_signature = signature
+        return True
+
+    def refresh(self):
+        """Pick up changes to either CSV. Returns True if the data changed."""
+        with self._lock:
+            changed = self._read_historical()
+            changed = self._read_daily_tail() or changed
+            if changed:
+                self._all = None
+                self._timestamps = None
+                self._responses.clear()
+                self.version += 1
+            self.loaded = True
+            return changed
+
+    # ---------- reads ----------
+
+    def daily_prices(self):
+        """All DailyGold.csv prices in file order"""
+        with self._lock:
+            self.refresh()
+            return self.daily
+
+    def historical_prices(self):
+        """All HistoricalMVPGold.csv prices in file order"""
+        with self._lock:
+            self.refresh()
+            return self.historical
+
+    def all_prices(self):
+        """Historical and daily prices merged and sorted by timestamp"""
+        with self._lock:
+            self.refresh()
+            if self._all is None:
+                merged = self.historical + self.daily
+                merged.sort(key=lambda x: x['timestamp'])
+                self._all = merged
+            return self._all
+
+    def indexed_prices(self):
+        """
+        all_prices() together with its timestamps in the same order, a
+        sorted key list for bisect lookups. Both come from the same version.
+        """
+        with self._lock:
+            prices = self.all_prices()
+            if self._timestamps is None:
+                self._timestamps = [p['timestamp'] for p in prices]
+            return prices, self._timestamps
+
+    # ---------- response cache ----------
+
+    def cached_response(self, key, ttl_seconds, build):
+        """
+        Return build() for key, reusing the last result while the data is
+        unchanged and the entry is younger than ttl_seconds. At most
+        MAX_CACHED_RESPONSES entries are kept.
+        """
+        with self._lock:
+            self.refresh()
+            version = self.version
+            entry = self._responses.get(key)
+            if entry and entry[0] == version and time.time() - entry[1] < ttl_seconds:
+                self._responses.move_to_end(key)
+                return entry[2]
+
+        payload = build()
+
+        with self._lock:
+            if self.version == version:
+                self._responses[key] = (version, time.time(), payload)
+                self._responses.move_to_end(key)
+                while len(self._responses) > MAX_CACHED_RESPONSES:
+                    self._responses.popitem(last=False)
+        return payload
+
+    # ---------- warm-start snapshot ----------
+
+    def save_snapshot(self, path=SNAPSHOT_PATH):
+        """
+        Write the parsed prices to disk as gzipped JSON, with checksums of
+        the source bytes they were built from. Cached responses are not
+        saved: they are stamped with wall-clock time and short-lived, so they
+        would be expired by the time a restarted process loaded them.
+
+        Every worker runs this on exit, so each writes its own temp file and
+        the last complete one wins the rename.
+        """
+        with self._lock:
+            if not self.loaded:
+                return False
+            snapshot = {
+                'format': SNAPSHOT_FORMAT,
+                'saved_at': time.time(),
+                'version': self.version,
+                'daily_offset': self._daily_offset,
+                'daily_checksum': _file_checksum(self.daily_path, self._daily_offset),
+                'historical_checksum': _file_checksum(self.historical_path),
+                'daily': _encode_points(self.daily),
+                'historical': _encode_points(self.historical),
+            }
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=1) as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        points = len(snapshot['daily']) + len(snapshot['historical'])
+        logger.info("Price snapshot saved", extra={'fields': {'points': points}})
+        return True
+
+    def load_snapshot(self, path=SNAPSHOT_PATH):
+        """
+        Restore state from a snapshot if it still matches the source files.
+        Rows appended to DailyGold.csv after the snapshot are tailed in.
+
+        Returns:
+            bool: True if restored, False if missing or stale (caller rebuilds)
+        """
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning("Unreadable price snapshot, rebuilding: %s", e)
+            return False
+
+        if not isinstance(snapshot, dict) or snapshot.get('format') != SNAPSHOT_FORMAT:
+            logger.warning("Price snapshot format changed, rebuilding")
+            return False
+        if (_file_checksum(self.historical_path) != snapshot['historical_checksum'] or
+                _file_checksum(self.daily_path, snapshot['daily_offset']) != snapshot['daily_checksum']):
+            logger.warning("Price snapshot is stale, rebuilding")
+            return False
+        try:
+            daily = _decode_points(snapshot['daily'])
+            historical = _decode_points(snapshot['historical'])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Unreadable price snapshot, rebuilding: %s", e)
+            return False
+
+        with self._lock:
+            self.daily = daily
+            self.historical = historical
+            self._all = None
+            self._timestamps = None
+            self._responses.clear()
+            self.version = snapshot['version']
+            self._daily_offset = snapshot['daily_offset']
+            self._daily_signature = None  # tail anything appended since
+            self._historical_signature = _file_signature(self.historical_path)
+            self.loaded = True
+            self.refresh()
+        logger.info("Price snapshot restored", extra={'fields': {'points': len(self.historical) + len(self.daily)}})
+        return True
+
+
+# Process-wide store (loaded before fork when the app is preloaded)
+price_store = PriceStore()
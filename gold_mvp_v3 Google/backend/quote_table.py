@@ -0,0 +1,152 @@
+"""
+VitaNova Quote Table
+====================
+Prices for every product and unit at the latest tick, computed on the
+server once per tick instead of in every browser. The store sells 24K bars
+only, so every price is 24K.
+
+    products  each bar weight: gold cost, 5% VAT, commission, total
+    units     price per gram and per troy ounce, ex/inc VAT
+
+The table is one NumPy computation over the product weights. price_lines()
+is the arithmetic for both the table and an order's items, so create_order
+and the table can never disagree; it is plain operators, so orders are
+priced with floats and never need NumPy.
+"""
+
+import threading
+
+from flask import Blueprint, jsonify
+from app_logging import get_logger
+from config import GRAMS_PER_OUNCE, VAT_RATE
+
+logger = get_logger('prices.table')
+
+table_bp = Blueprint('quote_table', __name__)
+
+# Bar weights sold in the store (grams) and their default fixed commission (AED per bar)
+PRODUCT_WEIGHTS = (1, 2.5, 5, 10)
+DEFAULT_COMMISSIONS = (30, 40, 60, 80)
+
+UNITS = {'gram': 1.0, 'ounce': GRAMS_PER_OUNCE}
+
+
+def price_lines(price_gram, weights, quantities, commissions):
+    """
+    Gold cost, VAT, commission and total for order lines.
+
+    Args:
+        price_gram: 24K price per gram (AED)
+        weights, quantities, commissions: one line's values (commission is
+            per unit), or NumPy arrays of several lines
+
+    Returns:
+        tuple: (gold_cost, vat, commission_total, total), floats or arrays
+    """
+    gold_cost = price_gram * weights * quantities
+    commission_total = commissions * quantities
+    vat = gold_cost * VAT_RATE
+    total = gold_cost + vat + commission_total
+    return gold_cost, vat, commission_total, total
+
+
+def build_quote_table(price_gram):
+    """Every product and unit at one 24K price per gram"""
+    import numpy as np
+
+    gold_cost, vat, commission, total = price_lines(
+        price_gram, np.array(PRODUCT_WEIGHTS, dtype=np.float64), 1, np.array(DEFAULT_COMMISSIONS, dtype=np.float64)
+    )
+    unit_prices = price_gram * np.array(list(UNITS.values()))
+    unit_prices_vat = unit_prices * (1 + VAT_RATE)
+
+    products = [
+        {
+            'weight': weight,
+            'gold_cost': round(float(gold_cost[i]), 2),
+            'vat': round(float(vat[i]), 2),
+            'commission': round(float(commission[i]), 2),
+            'total': round(float(total[i]), 2)
+        } for i, weight in enumerate(PRODUCT_WEIGHTS)
+    ]
+    units = {
+        unit: {
+            'price': round(float(unit_prices[j]), 2),
+            'price_with_vat': round(float(unit_prices_vat[j]), 2)
+        } for j, unit in enumerate(UNITS)
+    }
+    return {'products': products, 'units': units}
+
+
+def current_price():
+    """(24K price per gram, timestamp) of the latest tick, or (None, None)"""
+    from shared_prices import get_segment
+    segment = get_segment()
+    record = segment.read() if segment else None
+    if record:
+        return record['price'], record['timestamp']
+    from price_store import price_store
+    daily = price_store.daily_prices()
+    if daily:
+        return daily[-1]['price'], daily[-1]['timestamp']
+    return None, None
+
+
+class QuoteTable:
+    """The quote table for the latest tick, rebuilt when the tick changes"""
+
+    def __init__(self):
+        self._tick = None
+        self._table = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns:
+            dict: The table for the latest tick
+            None: If there is no price yet
+        """
+        price, timestamp = current_price()
+        if price is None:
+            return None
+        tick = (price, timestamp)
+        if tick != self._tick:
+            with self._lock:
+                if tick != self._tick:
+                    table = build_quote_table(price)
+                    table.update({
+                        'karat': '24k',
+                        'price_gram_24k': round(price, 2),
+                        'price_timestamp': timestamp.isoformat() if timestamp else None,
+                        'vat_rate': VAT_RATE,
+                        'unit_grams': UNITS,
+                        'currency': 'AED'
+                    })
+                    self._table, self._tick = table, tick
+        return self._table
+
+
+_quote_table = QuoteTable()
+
+
+def get_quote_table():
+    """Process-wide quote table"""
+    return _quote_table
+
+
+# ============== ROUTES ==============
+
+@table_bp.route('/price/table', methods=['GET'])
+def price_table():
+    """Product and unit prices at the latest tick"""
+    table = get_quote_table().get()
+    if table is None:
+        return jsonify({'error': 'No price available yet'}), 503
+    return jsonify(table)
+
+
+def init_quote_table(app):
+    """Initialize quote table blueprint (needs NumPy; order pricing does not)"""
+    import numpy  # noqa: F401  (raises ImportError here, not on the first request)
+    app.register_blueprint(table_bp)
+    logger.info("Quote table initialized")
@@ -0,0 +1,164 @@
+"""
+VitaNova Price Reconciliation
+=============================
+Audit every order's gold_price_gram against the market tick recorded in
+DailyGold.csv around its purchase_date.
+
+Both inputs are time-ordered, so they are streamed side by side as a
+merge-join: one pass over the orders and one over the ticks, holding only
+the tick just before and just after the current order. A small reorder
+buffer absorbs orders written slightly out of time order by concurrent
+workers.
+
+    python reconcile_prices.py [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+                               [--tolerance 0.01] [--max-gap-hours 24]
+                               [--output flagged.csv]
+
+Flagged orders are written as CSV (stdout by default):
+    mismatch  price differs from the nearest tick by more than the tolerance
+    no_tick   no tick within --max-gap-hours of the purchase time
+"""
+
+import argparse
+import csv
+import heapq
+import sys
+from datetime import datetime, timedelta
+
+from price_store import DAILY_CSV_PATH, parse_daily_row
+
+# Relative price difference tolerated between an order and its tick
+DEFAULT_TOLERANCE = 0.01
+# Orders further than this from any tick cannot be checked
+DEFAULT_MAX_GAP_HOURS = 24
+# Orders may arrive this many rows out of time order
+REORDER_WINDOW = 1000
+
+REPORT_COLUMNS = [
+    'status', 'order_id', 'customer_id', 'purchase_date', 'order_price',
+    'tick_time', 'tick_price', 'diff_pct'
+]
+
+
+def iter_ticks(path=DAILY_CSV_PATH):
+    """Stream (timestamp, price) from DailyGold.csv"""
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            point = parse_daily_row(row)
+            if point:
+                yield point['timestamp'], point['price']
+
+
+def iter_orders(rows, counts=None):
+    """
+    One (purchase time, order_id, customer_id, price) per order from order
+    rows, in time order (within REORDER_WINDOW). Unparseable orders are
+    skipped and counted in counts['skipped'].
+    """
+    heap = []
+    last_id = None
+    for row in rows:
+        order_id = row.get('order_id')
+        if order_id == last_id:
+            continue  # further items of the same order
+        last_id = order_id
+        try:
+            ts = datetime.strptime(row.get('purchase_date', ''), '%Y-%m-%d %H:%M:%S')
+            price = float(row.get('gold_price_gram'))
+        except (TypeError, ValueError):
+            if counts is not None:
+                counts['skipped'] = counts.get('skipped', 0) + 1
+            continue
+        heapq.heappush(heap, (ts, order_id, row.get('customer_id', ''), price))
+        if len(heap) > REORDER_WINDOW:
+            yield heapq.heappop(heap)
+    while heap:
+        yield heapq.heappop(heap)
+
+
+def reconcile(orders, ticks, tolerance=DEFAULT_TOLERANCE, max_gap=timedelta(hours=DEFAULT_MAX_GAP_HOURS)):
+    """
+    Merge-join time-ordered orders with time-ordered ticks.
+
+    Yields:
+        dict: One REPORT_COLUMNS record per order, with status 'ok',
+              'mismatch' or 'no_tick'
+    """
+    ticks = iter(ticks)
+    before = None            # last tick at or before the order
+    after = next(ticks, None)  # first tick after it
+
+    for ts, order_id, customer_id, price in orders:
+        while after is not None and after[0] <= ts:
+            before, after = after, next(ticks, None)
+
+        candidates = [t for t in (before, after) if t is not None and abs(t[0] - ts) <= max_gap]
+        record = {
+            'order_id': order_id,
+            'customer_id': customer_id,
+            'purchase_date': ts.strftime('%Y-%m-%d %H:%M:%S'),
+            'order_price': round(price, 2),
+            'tick_time': '',
+            'tick_price': '',
+            'diff_pct': '',
+        }
+        if not candidates:
+            record['status'] = 'no_tick'
+            yield record
+            continue
+
+        tick_ts, tick_price = min(candidates, key=lambda t: abs(t[0] - ts))
+        diff = (price - tick_price) / tick_price if tick_price else 0.0
+        record.update({
+            'status': 'mismatch' if abs(diff) > tolerance else 'ok',
+            'tick_time': tick_ts.strftime('%Y-%m-%d %H:%M:%S'),
+            'tick_price': round(tick_price, 2),
+            'diff_pct': round(diff * 100, 3),
+        })
+        yield record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check order prices against DailyGold.csv ticks')
+    parser.add_argument('--from', dest='start_day', help='first purchase day, YYYY-MM-DD')
+    parser.add_argument('--to', dest='end_day', help='last purchase day, YYYY-MM-DD')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='relative difference allowed (default 0.01 = 1%%)')
+    parser.add_argument('--max-gap-hours', type=float, default=DEFAULT_MAX_GAP_HOURS,
+                        help='furthest tick that still counts (default 24)')
+    parser.add_argument('--output', help='write flagged orders here instead of stdout')
+    args = parser.parse_args(argv)
+
+    from order_store import get_order_store
+    from order_journal import sync_journal
+    sync_journal()
+
+    counts = {'ok': 0, 'mismatch': 0, 'no_tick': 0, 'skipped': 0}
+    rows = get_order_store().export_rows(start_day=args.start_day, end_day=args.end_day)
+    results = reconcile(
+        iter_orders(rows, counts), iter_ticks(),
+        tolerance=args.tolerance, max_gap=timedelta(hours=args.max_gap_hours)
+    )
+
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+        for record in results:
+            counts[record['status']] += 1
+            if record['status'] != 'ok':
+                writer.writerow(record)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    checked = counts['ok'] + counts['mismatch'] + counts['no_tick']
+    print(f"Checked {checked} orders: {counts['ok']} ok, {counts['mismatch']} mismatched, "
+          f"{counts['no_tick']} without a tick, {counts['skipped']} unreadable", file=sys.stderr)
+    return 1 if counts['mismatch'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+VitaNova Sales Reports
+======================
+Sales aggregates maintained as orders are written, so back-office reports
+never scan the order store.
+
+Every order adds to one row per (day, dimension, value) in sales.db:
+
+    all           one row per day
+    emirate       per emirate
+    payment_type  per payment type
+    weight        per bar weight in grams
+
+holding orders, bars, grams, revenue, VAT and commission. The order journal
+applier adds each order as it reaches the store; sales_orders remembers the
+order IDs counted, so a journal replay never counts one twice. GET /reports/sales
+sums those rows over a date range; the cost depends on the number of days
+and values, not on the number of orders.
+
+Rebuild from the order store (e.g. after importing history) with:
+
+    python sales_reports.py rebuild
+"""
+
+import hmac
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+from app_logging import get_logger
+from store_utils import LocalConnection, number
+
+logger = get_logger('reports')
+
+reports_bp = Blueprint('reports', __name__)
+
+BASE_DIR = os.path.dirname(__file__)
+
+SALES_DB = os.environ.get('VITANOVA_SALES_DB', os.path.join(BASE_DIR, 'sales.db'))
+# /reports/* require this value in the X-Reports-Token header; while it is
+# unset they are disabled (503), never open
+REPORTS_TOKEN = os.environ.get('VITANOVA_REPORTS_TOKEN', '')
+
+DIMENSIONS = ('all', 'emirate', 'payment_type', 'weight')
+MEASURES = ('orders', 'bars', 'grams', 'revenue', 'vat', 'commission')
+
+_WEIGHT_RE = re.compile(r'([\d.]+)\s*g', re.IGNORECASE)
+
+
+def product_weight(product):
+    """Grams per bar from a product label like '10.0g Gold Bar 24K' (0 if unknown)"""
+    match = _WEIGHT_RE.match(product or '')
+    try:
+        return float(match.group(1)) if match else 0.0
+    except ValueError:
+        return 0.0
+
+
+def uncounted_rows(conn, table, rows):
+    """
+    The rows whose order ID is not yet in `table` (a one-column order_id
+    table), marking those IDs as counted. Call inside the transaction that
+    adds the rows, so the marks and the totals commit together.
+    """
+    fresh = {}
+    for row in rows:
+        order_id = row.get('order_id')
+        if order_id not in fresh:
+            fresh[order_id] = conn.execute(
+                f"INSERT OR IGNORE INTO {table} (order_id) VALUES (?)", (order_id,)
+            ).rowcount == 1
+        if fresh[order_id]:
+            yield row
+
+
+def aggregate_rows(rows, totals=None):
+    """
+    Fold order rows (dicts in the orders.csv shape) into
+    {(day, dimension, value): [orders, bars, grams, revenue, vat, commission]}
+    """
+    totals = {} if totals is None else totals
+    counted = set()
+    for row in rows:
+        day = (row.get('purchase_date') or '')[:10]
+        if not day:
+            continue
+        weight = product_weight(row.get('product'))
+        bars = number(row.get('quantity'), int)
+        values = [
+            0, bars, weight * bars,
+            number(row.get('total')),
+            number(row.get('tax_amount')),
+            number(row.get('commission_amount'))
+        ]
+        keys = [
+            (day, 'all', ''),
+            (day, 'emirate', row.get('emirate') or ''),
+            (day, 'payment_type', row.get('payment_type') or ''),
+            (day, 'weight', f"{weight:g}"),
+        ]
+        order_id = row.get('order_id')
+        for key in keys:
+            entry = totals.setdefault(key, [0, 0, 0.0, 0.0, 0.0, 0.0])
+            # An order counts once per bucket, however many rows it has
+            if (order_id, key) not in counted:
+                counted.add((order_id, key))
+                entry[0] += 1
+            for i in range(1, len(MEASURES)):
+                entry[i] += values[i]
+    return totals
+
+
+class SalesAggregates:
+    """sales_daily table in sales.db"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day         TEXT NOT NULL,
+            dimension   TEXT NOT NULL,
+            value       TEXT NOT NULL,
+            orders      INTEGER NOT NULL DEFAULT 0,
+            bars        INTEGER NOT NULL DEFAULT 0,
+            grams       REAL NOT NULL DEFAULT 0,
+            revenue     REAL NOT NULL DEFAULT 0,
+            vat         REAL NOT NULL DEFAULT 0,
+            commission  REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, day, value)
+        );
+        CREATE TABLE IF NOT EXISTS sales_orders (
+            order_id    TEXT PRIMARY KEY
+        );
+    """
+
+    UPSERT = f"""
+        INSERT INTO sales_daily (day, dimension, value, {', '.join(MEASURES)})
+        VALUES (?, ?, ?, {', '.join('?' * len(MEASURES))})
+        ON CONFLICT (dimension, day, value) DO UPDATE SET
+        {', '.join(f'{m} = {m} + excluded.{m}' for m in MEASURES)}
+    """
+
+    def __init__(self, path=SALES_DB):
+        self.path = path
+        self._connections = LocalConnection(path, row_factory=sqlite3.Row)
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def connection(self):
+        """One connection per thread (and per process: never reused across fork)"""
+        return self._connections.get()
+
+    def ensure(self):
+        if self._ready:
+            return
+        with self._ready_lock:
+            if not self._ready:
+                self.connection().executescript(self.SCHEMA)
+                self._ready = True
+
+    def _write(self, conn, totals):
+        conn.executemany(self.UPSERT, [key + tuple(values) for key, values in totals.items()])
+
+    def record(self, rows):
+        """
+        Add newly written order rows to the aggregates (one transaction).
+        Orders already counted are skipped.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        self.ensure()
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            totals = aggregate_rows(uncounted_rows(conn, 'sales_orders', rows))
+            self._write(conn, totals)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def rebuild(self, rows):
+        """
+        Replace all aggregates with ones computed from `rows` (every order row).
+
+        `rows` is read inside the write transaction: record() calls for
+        orders written meanwhile wait for it, then count whatever the read
+        did not include (sales_orders has the IDs it did).
+
+        Returns:
+            int: Number of rows read
+        """
+        seen = {'rows': 0}
+        order_ids = set()
+
+        def counted(rows):
+            for row in rows:
+                seen['rows'] += 1
+                order_ids.add(row.get('order_id'))
+                yield row
+
+        self.ensure()
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            totals = aggregate_rows(counted(rows))
+            count = seen['rows']
+            conn.execute('DELETE FROM sales_daily')
+            conn.execute('DELETE FROM sales_orders')
+            conn.executemany('INSERT INTO sales_orders (order_id) VALUES (?)', [(oid,) for oid in order_ids])
+            self._write(conn, totals)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        logger.info("Sales aggregates rebuilt", extra={'fields': {'rows': count, 'buckets': len(totals)}})
+        return count
+
+    def report(self, dimension, start_day, end_day):
+        """Totals per value of a dimension (per day for 'day') between two days, inclusive"""
+        self.ensure()
+        if dimension == 'day':
+            group, where = 'day', "dimension = 'all'"
+        else:
+            group, where = 'value', 'dimension = ?'
+        params = [] if dimension == 'day' else [dimension]
+        cursor = self.connection().execute(
+            f"SELECT {group} AS key, {', '.join(f'SUM({m}) AS {m}' for m in MEASURES)} "
+            f"FROM sales_daily WHERE {where} AND day BETWEEN ? AND ? GROUP BY {group} ORDER BY {group}",
+            params + [start_day, end_day]
+        )
+        return [dict(row) for row in cursor]
+
+
+_aggregates = None
+_aggregates_lock = threading.Lock()
+
+
+def get_sales_aggregates():
+    """Process-wide aggregates (created on first use)"""
+    global _aggregates
+    if _aggregates is None:
+        with _aggregates_lock:
+            if _aggregates is None:
+                _aggregates = SalesAggregates()
+    return _aggregates
+
+
+def record_sales(orders):
+    """
+    Count orders written to the store (lists of rows in ORDER_COLUMNS order);
+    called by the order journal applier.
+    Reporting never fails an order: errors are logged, and `rebuild` repairs.
+    """
+    from order_store import ORDER_COLUMNS
+    try:
+        get_sales_aggregates().record(
+            dict(zip(ORDER_COLUMNS, (str(v) for v in row))) for rows in orders for row in rows
+        )
+    except Exception as e:
+        logger.error("Could not update sales aggregates: %s", e)
+
+
+# ============== ROUTES ==============
+
+def reports_auth_error():
+    """
+    Check the X-Reports-Token header (for /reports/* and /orders/export).
+
+    Returns:
+        None: If the request may read reports
+        tuple: (error response, status) otherwise
+    """
+    if not REPORTS_TOKEN:
+        return jsonify({'error': 'Reports are disabled (VITANOVA_REPORTS_TOKEN is not set)'}), 503
+    supplied = request.headers.get('X-Reports-Token', '')
+    if not hmac.compare_digest(supplied.encode('utf-8'), REPORTS_TOKEN.encode('utf-8')):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return None
+
+
+def _parse_day(value, default):
+    if not value:
+        return default
+    return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+
+@reports_bp.route('/reports/sales', methods=['GET'])
+def sales_report():
+    """
+    Sales totals from the aggregates.
+
+    Query params:
+        by: day (default), emirate, payment_type or weight
+        from, to: YYYY-MM-DD, inclusive (default: this month)
+    """
+    error = reports_auth_error()
+    if error:
+        return error
+
+    by = request.args.get('by', 'day')
+    if by not in ('day',) + DIMENSIONS[1:]:
+        return jsonify({'error': f"Invalid 'by', use one of: day, {', '.join(DIMENSIONS[1:])}"}), 400
+    try:
+        today = datetime.now()
+        start_day = _parse_day(request.args.get('from'), today.strftime('%Y-%m-01'))
+        end_day = _parse_day(request.args.get('to'), today.strftime('%Y-%m-%d'))
+    except ValueError:
+        return jsonify({'error': 'Invalid date, use YYYY-MM-DD'}), 400
+
+    try:
+        rows = get_sales_aggregates().report(by, start_day, end_day)
+    except sqlite3.Error as e:
+        logger.exception("Sales report failed: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+    totals = {m: sum(r[m] or 0 for r in rows) for m in MEASURES}
+    if by == 'weight':
+        # An order with several bar sizes is in several weight buckets
+        totals['orders'] = sum(r['orders'] or 0 for r in get_sales_aggregates().report('day', start_day, end_day))
+    for collection in [totals] + rows:
+        for m in ('grams', 'revenue', 'vat', 'commission'):
+            collection[m] = round(collection[m] or 0, 2)
+
+    return jsonify({
+        'by': by,
+        'from': start_day,
+        'to': end_day,
+        'currency': 'AED',
+        'rows': rows,
+        'totals': totals
+    })
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == 'rebuild':
+        from order_store import get_order_store
+        from order_journal import sync_journal
+        sync_journal()
+        count = get_sales_aggregates().rebuild(get_order_store().iter_all_rows())
+        print(f"✅ Rebuilt sales aggregates from {count} order rows into {SALES_DB}")
+    else:
+        print(__doc__)
@@ -0,0 +1,277 @@
+"""
+VitaNova Shared Price Segment
+=============================
+Latest gold tick and running daily stats kept in a shared memory segment,
+so every worker process serves the same /price and /price/stats answers
+without re-reading DailyGold.csv.
+
+Writers are serialized with a lock file; readers never lock and use a
+seqlock (retry while the sequence number is odd or has changed).
+"""
+
+import math
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+from app_logging import get_logger
+
+try:
+    import fcntl
+except ImportError:
+    # Windows development machines: single process, the thread lock is enough
+    fcntl = None
+
+# Segment name and writer lock file (override per deployment if needed)
+SHM_NAME = os.environ.get('VITANOVA_PRICE_SHM', 'vitanova_price')
+LOCK_FILE = os.environ.get('VITANOVA_PRICE_SHM_LOCK',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), '.price_shm.lock'))
+
+# Layout: sequence number, then the payload
+#   last_ts, last_price, last_day, day_high, day_low, prev_day, prev_close, tick_count
+SEQ_FORMAT = '<Q'
+PAYLOAD_FORMAT = '<ddqddqdQ'
+SEQ_SIZE = struct.calcsize(SEQ_FORMAT)
+SEGMENT_SIZE = SEQ_SIZE + struct.calcsize(PAYLOAD_FORMAT)
+
+logger = get_logger('prices.shared')
+
+# Readers give up after this many torn reads (a writer died mid-update)
+MAX_READ_RETRIES = 1000
+
+_segment = None
+_segment_lock = threading.Lock()
+
+
+class PriceSegment:
+    """Shared latest-tick and daily-stats record with a seqlock."""
+
+    def __init__(self, name=SHM_NAME):
+        self.name = name
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_SIZE)
+            self.created = True
+            self.shm.buf[:SEGMENT_SIZE] = bytes(SEGMENT_SIZE)
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.created = False
+        _untrack(self.shm)
+        self._thread_lock = threading.Lock()
+
+    # ---------- writer side ----------
+
+    def _acquire(self):
+        self._thread_lock.acquire()
+        if fcntl is None:
+            return None
+        lock_fd = open(LOCK_FILE, 'a')
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        return lock_fd
+
+    def _release(self, lock_fd):
+        if lock_fd is not None:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            lock_fd.close()
+        self._thread_lock.release()
+
+    def _write(self, apply):
+        """Run apply(state) -> new state inside the seqlock write section"""
+        lock_fd = self._acquire()
+        try:
+            buf = self.shm.buf
+            seq = struct.unpack_from(SEQ_FORMAT, buf, 0)[0]
+            state = list(struct.unpack_from(PAYLOAD_FORMAT, buf, SEQ_SIZE))
+            new_state = apply(state)
+            if new_state is None:
+                return False
+            struct.pack_into(SEQ_FORMAT, buf, 0, seq + 1)  # odd: write in progress
+            struct.pack_into(PAYLOAD_FORMAT, buf, SEQ_SIZE, *new_state)
+            struct.pack_into(SEQ_FORMAT, buf, 0, seq + 2)  # even: stable
+            return True
+        finally:
+            self._release(lock_fd)
+
+    def publish(self, timestamp, price):
+        """Record a new tick. Ticks older than the current one are ignored."""
+        return self._write(lambda state: _apply_tick(state, timestamp, price))
+
+    def seed(self, ticks):
+        """
+        Load ticks (iterable of {'timestamp', 'price'} in time order)
+        into an empty segment. Does nothing if another process already seeded it.
+        """
+        ticks = list(ticks)
+
+        def apply(state):
+            if state[7] > 0:
+                return None
+            for tick in ticks:
+                state = _apply_tick(state, tick['timestamp'], tick['price']) or state
+            return state
+
+        return self._write(apply)
+
+    # ---------- reader side ----------
+
+    def read(self):
+        """
+        Lock-free read of the current record.
+
+        Returns:
+            dict: Latest tick and daily stats
+            None: If the segment is empty or could not be read consistently
+        """
+        buf = self.shm.buf
+        for _ in range(MAX_READ_RETRIES):
+            seq_before = struct.unpack_from(SEQ_FORMAT, buf, 0)[0]
+            if seq_before & 1:
+                time.sleep(0)
+                continue
+            state = struct.unpack_from(PAYLOAD_FORMAT, buf, SEQ_SIZE)
+            seq_after = struct.unpack_from(SEQ_FORMAT, buf, 0)[0]
+            if seq_before == seq_after:
+                break
+        else:
+            return None
+
+        last_ts, last_price, last_day, day_high, day_low, prev_day, prev_close, count = state
+        if count == 0:
+            return None
+        return {
+            'sequence': seq_before,
+            'timestamp': datetime.fromtimestamp(last_ts),
+            'price': last_price,
+            'day': last_day,
+            'day_high': day_high,
+            'day_low': day_low,
+            'prev_day': prev_day,
+            'prev_close': None if math.isnan(prev_close) else prev_close,
+            'tick_count': count
+        }
+
+    def stats(self, now=None):
+        """
+        Daily stats in the shape of /price/stats (before rounding).
+
+        Returns:
+            dict: current, today_high, today_low, yesterday_close
+            None: If the segment is empty
+        """
+        record = self.read()
+        if record is None:
+            return None
+
+        today = (now or datetime.now()).date().toordinal()
+        current = record['price']
+        yesterday_close = None
+
+        if record['day'] == today:
+            today_high = record['day_high']
+            today_low = record['day_low']
+            if record['prev_day'] == today - 1:
+                yesterday_close = record['prev_close']
+        else:
+            # No tick yet today
+            today_high = current
+            today_low = current
+            if record['day'] == today - 1:
+                yesterday_close = current
+
+        return {
+            'current': current,
+            'today_high': today_high,
+            'today_low': today_low,
+            'yesterday_close': yesterday_close
+        }
+
+    def latest(self, max_age_seconds):
+        """Latest tick if it is younger than max_age_seconds, otherwise None"""
+        record = self.read()
+        if record is None:
+            return None
+        if datetime.now() - record['timestamp'] > timedelta(seconds=max_age_seconds):
+            return None
+        return record
+
+    def close(self, unlink=False):
+        """Detach from the segment, optionally removing it for all processes"""
+        self.shm.close()
+        if unlink:
+            _track(self.shm)
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _apply_tick(state, timestamp, price):
+    """Fold one tick into the running state; None if the tick is out of order"""
+    last_ts, last_price, last_day, day_high, day_low, prev_day, prev_close, count = state
+    ts = timestamp.timestamp()
+    day = timestamp.date().toordinal()
+    price = float(price)
+
+    if count == 0:
+        return [ts, price, day, price, price, 0, math.nan, 1]
+    if ts < last_ts:
+        return None
+
+    if day == last_day:
+        day_high = max(day_high, price)
+        day_low = min(day_low, price)
+    else:
+        prev_day, prev_close = last_day, last_price
+        last_day, day_high, day_low = day, price, price
+
+    return [ts, price, last_day, day_high, day_low, prev_day, prev_close, count + 1]
+
+
+def _track(shm):
+    """Hand the segment back to the resource tracker so unlink() can release it"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.register(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+def _untrack(shm):
+    """
+    Stop multiprocessing's resource tracker from unlinking the segment when
+    this process exits; the segment must outlive individual workers.
+    """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+def get_segment():
+    """
+    Get this process's handle on the shared segment, attaching or creating it.
+
+    Returns:
+        PriceSegment, or None if shared memory is unavailable
+    """
+    global _segment
+    if _segment is None:
+        with _segment_lock:
+            if _segment is None:
+                try:
+                    _segment = PriceSegment()
+                except Exception as e:
+                    logger.warning("Shared price segment not available: %s", e)
+                    return None
+    return _segment
+
+
+def close_segment(unlink=False):
+    """Detach this process from the segment (unlink only from the owning process)"""
+    global _segment
+    with _segment_lock:
+        if _segment is not None:
+            _segment.close(unlink=unlink)
+            _segment = None
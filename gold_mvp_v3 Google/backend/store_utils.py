@@ -0,0 +1,48 @@
+"""
+VitaNova Store Helpers
+======================
+Pieces shared by the SQLite-backed stores (orders.db, idempotency.db,
+sales.db) and the code that folds order rows into them.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+def number(value, cast=float):
+    """`cast(value)`, or cast(0) for a missing or malformed CSV value"""
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return cast(0)
+
+
+class LocalConnection:
+    """
+    One SQLite connection per thread (and per process: never reused across
+    fork), in WAL mode with synchronous=NORMAL.
+
+    Args:
+        path: Database file
+        row_factory: e.g. sqlite3.Row (default: tuples)
+        pragmas: Extra PRAGMA statements, e.g. ('foreign_keys=ON',)
+    """
+
+    def __init__(self, path, row_factory=None, pragmas=()):
+        self.path = path
+        self.row_factory = row_factory
+        self.pragmas = tuple(pragmas)
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            for pragma in ('journal_mode=WAL', 'synchronous=NORMAL') + self.pragmas:
+                conn.execute(f'PRAGMA {pragma}')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
@@ -0,0 +1,104 @@
+"""
+Test setup for the backend modules. Run from the backend directory with:
+
+    python -m pytest -q
+
+Every data path the modules read from the environment points into a
+scratch directory, so a test run never touches the real orders, prices
+or databases: the price CSVs are copies, so the app module still warms
+on real data. Tests that build their own stores use tmp_path.
+"""
+
+import csv
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_DATA_DIR = tempfile.mkdtemp(prefix='vitanova-tests-')
+for name in ('DailyGold.csv', 'HistoricalMVPGold.csv'):
+    shutil.copy(os.path.join(BACKEND_DIR, name), _DATA_DIR)
+os.environ.update({
+    'VITANOVA_PRICE_SHM': f'vitanova_test_{os.getpid()}',
+    'VITANOVA_PRICE_SHM_LOCK': os.path.join(_DATA_DIR, '.price_shm.lock'),
+    'VITANOVA_DAILY_CSV': os.path.join(_DATA_DIR, 'DailyGold.csv'),
+    'VITANOVA_HISTORICAL_CSV': os.path.join(_DATA_DIR, 'HistoricalMVPGold.csv'),
+    'PRICE_SNAPSHOT_PATH': os.path.join(_DATA_DIR, 'price_cache.snapshot'),
+    'VITANOVA_ORDERS_CSV': os.path.join(_DATA_DIR, 'orders.csv'),
+    'VITANOVA_WARM_ORDERS': '0',
+    'VITANOVA_ORDERS_DB': os.path.join(_DATA_DIR, 'orders.db'),
+    'VITANOVA_ORDER_JOURNAL_PATH': os.path.join(_DATA_DIR, 'orders.journal'),
+    'VITANOVA_ORDER_PARTITIONS': os.path.join(_DATA_DIR, 'order_partitions'),
+    'VITANOVA_SALES_DB': os.path.join(_DATA_DIR, 'sales.db'),
+    'VITANOVA_IDEMPOTENCY_DB': os.path.join(_DATA_DIR, 'idempotency.db'),
+    'VITANOVA_PRICE_ALERTS': os.path.join(_DATA_DIR, 'price_alerts.csv'),
+    'VITANOVA_PRICE_ALERT_EMAILS': os.path.join(_DATA_DIR, 'price_alert_emails.csv'),
+    'VITANOVA_PRICE_ALERT_CONFIRMATIONS': os.path.join(_DATA_DIR, 'price_alert_confirmations.csv'),
+})
+
+
+@pytest.fixture
+def make_order():
+    """
+    Factory for one order's rows in ORDER_COLUMNS order:
+    make_order(order_id, customer_id, purchase_date, items=1, address='...')
+    """
+    from order_store import ORDER_COLUMNS
+
+    def make(order_id, customer_id, purchase_date='2026-01-25 20:13:52', items=1, address='Villa 1'):
+        rows = []
+        for i in range(items):
+            row = {
+                'order_id': order_id, 'customer_id': customer_id, 'product': '10.0g Gold Bar 24K',
+                'quantity': str(i + 1), 'gold_price_gram': '588.9', 'purchase_date': purchase_date,
+                'payment_type': 'Cash on Delivery', 'commission_type': 'fixed',
+                'commission_amount': '80.0', 'tax_amount': '294.45', 'total': '6263.45',
+                'whatsapp_number': '0501234567', 'emirate': 'Dubai', 'city': 'Dubai', 'address': address
+            }
+            rows.append([row[c] for c in ORDER_COLUMNS])
+        return rows
+
+    return make
+
+
+@pytest.fixture(scope='session')
+def goldprices():
+    """The app module (imported, and so warmed, once); its shared price segment is removed afterwards"""
+    import Goldprices
+    yield Goldprices
+    from shared_prices import close_segment
+    close_segment(unlink=True)
+
+
+@pytest.fixture
+def run_rebuild(tmp_path):
+    """
+    run_rebuild(module, orders): run `python <module>.py rebuild` against an
+    orders.csv of `orders` in tmp_path; returns a connection to its sales.db
+    """
+    from order_store import ORDER_COLUMNS
+
+    def run(module, orders):
+        with open(tmp_path / 'orders.csv', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(ORDER_COLUMNS)
+            for rows in orders:
+                writer.writerows(rows)
+        env = dict(os.environ,
+                   VITANOVA_ORDERS_CSV=str(tmp_path / 'orders.csv'),
+                   VITANOVA_ORDER_PARTITIONS=str(tmp_path / 'partitions'),
+                   VITANOVA_ORDER_JOURNAL_PATH=str(tmp_path / 'orders.journal'),
+                   VITANOVA_SALES_DB=str(tmp_path / 'sales.db'))
+        result = subprocess.run([sys.executable, f'{module}.py', 'rebuild'], cwd=BACKEND_DIR, env=env,
+                                capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+        return sqlite3.connect(tmp_path / 'sales.db')
+
+    return run
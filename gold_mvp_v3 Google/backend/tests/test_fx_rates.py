@@ -0,0 +1,109 @@
+"""Converted price series and the cached FX rate table (fx_rates.py)"""
+
+from datetime import datetime
+
+import pytest
+import requests
+
+import fx_rates
+from config import USD_TO_AED_RATE
+from fx_rates import FxRates
+
+
+class FakeStore:
+    def __init__(self, points):
+        self.points = points
+        self.version = 1
+
+    def all_prices(self):
+        return self.points
+
+    def indexed_prices(self):
+        return self.points, [p['timestamp'] for p in self.points]
+
+
+class FakeResponse:
+    def __init__(self, body, status=200):
+        self.body, self.status = body, status
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise requests.HTTPError(self.status)
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeStore([
+        {'timestamp': datetime(2025, 12, 1), 'price': 484.09, 'price_usd': 131.8},
+        {'timestamp': datetime(2026, 1, 25, 20, 0), 'price': 500.0},
+    ])
+    monkeypatch.setattr(fx_rates, 'price_store', store)
+    return store
+
+
+def refreshed(fx, monkeypatch, body, status=200):
+    """fx after one background refresh that fetched `body`"""
+    monkeypatch.setattr(fx_rates.requests, 'get', lambda url, timeout: FakeResponse(body, status))
+    fx.snapshot()
+    with fx._refreshing:  # held until the refresh thread is done
+        pass
+    return fx
+
+
+def test_prices_are_converted_from_aed(store):
+    fx = FxRates(url='')
+    sar = fx.converted_prices('SAR')
+    assert [p['timestamp'] for p in sar] == [p['timestamp'] for p in store.points]
+    assert sar[1]['price'] == pytest.approx(500.0 * 3.75 / USD_TO_AED_RATE)
+    assert fx.converted_prices('AED') is store.points
+
+
+def test_usd_uses_the_historical_rate_where_recorded(store):
+    usd = FxRates(url='').converted_prices('USD')
+    assert usd[0]['price'] == 131.8
+    assert usd[1]['price'] == pytest.approx(500.0 / USD_TO_AED_RATE)
+
+
+def test_conversions_are_memoized_until_prices_or_rates_change(store, monkeypatch):
+    fx = FxRates(url='https://fx.example/latest', refresh_seconds=3600)
+    fx._checked_at = float('inf')  # no refresh yet
+    first = fx.converted_prices('KWD')
+    assert fx.converted_prices('KWD') is first
+
+    store.version += 1
+    assert fx.converted_prices('KWD') is not first
+
+    fx._checked_at = 0.0
+    refreshed(fx, monkeypatch, {'rates': {'KWD': 0.31}})
+    assert fx.converted_prices('KWD')[1]['price'] == pytest.approx(500.0 * 0.31 / USD_TO_AED_RATE)
+
+
+def test_refresh_updates_only_valid_rates(monkeypatch):
+    fx = refreshed(FxRates(url='https://fx.example/latest'), monkeypatch,
+                   {'rates': {'SAR': 3.76, 'KWD': 0, 'USD': 2, 'JPY': 150}})
+    assert fx.version == 1
+    assert fx.rates == dict(fx_rates.DEFAULT_USD_RATES, SAR=3.76)
+    assert fx.source == 'https://fx.example/latest'
+
+
+def test_unchanged_rates_keep_the_version(monkeypatch):
+    fx = refreshed(FxRates(url='https://fx.example/latest'), monkeypatch, {'rates': {'SAR': 3.75}})
+    assert fx.version == 0
+    assert fx.updated_at is not None
+
+
+@pytest.mark.parametrize('body, status', [({}, 500), ('not json', 200), ({'rates': {'SAR': 'x'}}, 200)])
+def test_failed_refresh_keeps_the_cached_rates(monkeypatch, body, status):
+    fx = refreshed(FxRates(url='https://fx.example/latest'), monkeypatch, body, status)
+    assert (fx.version, fx.rates, fx.source) == (0, fx_rates.DEFAULT_USD_RATES, 'default')
+    assert not fx._refreshing.locked()
+
+
+def test_no_refresh_without_a_url(monkeypatch):
+    monkeypatch.setattr(fx_rates.requests, 'get', lambda *a, **k: pytest.fail('fetched'))
+    fx = FxRates(url='')
+    assert fx.snapshot() == (0, fx_rates.DEFAULT_USD_RATES)
+    assert fx.table()['rates']['AED'] == 1.0
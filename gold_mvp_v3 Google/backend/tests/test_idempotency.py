@@ -0,0 +1,142 @@
+"""Idempotency-Key replay and conflicts (idempotency.py)"""
+
+import hashlib
+import json
+import time
+
+import pytest
+from flask import Flask, jsonify, request
+
+import idempotency
+from idempotency import IdempotencyStore, idempotent, HEADER, MAX_KEY_LENGTH
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = IdempotencyStore(path=str(tmp_path / 'idempotency.db'))
+    monkeypatch.setattr(idempotency, '_store', store)
+    return store
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def client(store, calls):
+    app = Flask(__name__)
+
+    @app.route('/orders', methods=['POST'])
+    @idempotent
+    def create_order():
+        body = request.get_json()
+        calls.append(body)
+        if body.get('fail'):
+            return jsonify({'success': False}), 503
+        return jsonify({'success': True, 'call': len(calls)}), 201
+
+    @app.route('/orders/bulk', methods=['POST'])
+    @idempotent
+    def create_orders():
+        calls.append(request.get_json())
+        return jsonify({'success': True, 'call': len(calls)}), 201
+
+    return app.test_client()
+
+
+def post(client, body, key='key-1', path='/orders'):
+    headers = {HEADER: key} if key else {}
+    return client.post(path, data=json.dumps(body), content_type='application/json', headers=headers)
+
+
+def test_requests_without_a_key_always_run(client, calls):
+    assert post(client, {'item': 1}, key=None).status_code == 201
+    assert post(client, {'item': 1}, key=None).status_code == 201
+    assert len(calls) == 2
+
+
+def test_retry_replays_the_stored_response(client, calls):
+    first = post(client, {'item': 1})
+    retry = post(client, {'item': 1})
+
+    assert len(calls) == 1
+    assert retry.status_code == first.status_code == 201
+    assert retry.get_json() == first.get_json() == {'success': True, 'call': 1}
+    assert retry.headers.get('Idempotent-Replayed') == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+
+
+def test_replay_survives_a_restart(client, calls, store, monkeypatch):
+    post(client, {'item': 1})
+    monkeypatch.setattr(idempotency, '_store', IdempotencyStore(path=store.path))
+
+    retry = post(client, {'item': 1})
+    assert len(calls) == 1
+    assert retry.get_json() == {'success': True, 'call': 1}
+
+
+def test_key_reused_with_a_different_body_is_rejected(client, calls):
+    post(client, {'item': 1})
+    response = post(client, {'item': 2})
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+def test_keys_are_scoped_to_the_path(client, calls):
+    post(client, {'item': 1}, path='/orders')
+    response = post(client, {'item': 1}, path='/orders/bulk')
+
+    assert response.status_code == 201
+    assert len(calls) == 2
+
+
+def test_retry_while_the_first_request_runs_gets_409(client, calls, store):
+    body = json.dumps({'item': 1}).encode()
+    assert store.claim('/orders:key-1', hashlib.sha256(body).hexdigest())
+
+    response = post(client, {'item': 1})
+    assert response.status_code == 409
+    assert calls == []
+
+
+def test_abandoned_claim_is_taken_over(client, calls, store):
+    body = json.dumps({'item': 1}).encode()
+    assert store.claim('/orders:key-1', hashlib.sha256(body).hexdigest())
+    stale = time.time() - store.claim_timeout - 1
+    store.connection().execute("UPDATE idempotency_keys SET claimed_at = ?", (stale,))
+
+    response = post(client, {'item': 1})
+    assert response.status_code == 201
+    assert len(calls) == 1
+    assert post(client, {'item': 1}).headers.get('Idempotent-Replayed') == 'true'
+
+
+def test_abandoned_claim_is_not_taken_over_with_a_different_body(store):
+    assert store.claim('k', 'fingerprint-1')
+    store.connection().execute("UPDATE idempotency_keys SET claimed_at = 0")
+    assert not store.claim('k', 'fingerprint-2')
+    assert store.claim('k', 'fingerprint-1')
+
+
+def test_server_error_releases_the_key(client, calls):
+    assert post(client, {'fail': True}).status_code == 503
+    assert post(client, {'fail': True}).status_code == 503
+    assert len(calls) == 2
+
+
+def test_expired_key_runs_again(client, calls, store):
+    post(client, {'item': 1})
+    expired = time.time() - store.ttl_seconds - 1
+    store.connection().execute("UPDATE idempotency_keys SET created_at = ?", (expired,))
+    store._cache.clear()
+
+    assert post(client, {'item': 1}).get_json() == {'success': True, 'call': 2}
+
+
+def test_overlong_key_is_rejected(client, calls):
+    response = post(client, {'item': 1}, key='k' * (MAX_KEY_LENGTH + 1))
+    assert response.status_code == 400
+    assert calls == []
+
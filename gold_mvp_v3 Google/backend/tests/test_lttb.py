@@ -0,0 +1,61 @@
+"""LTTB downsampling of price history (lttb_downsample in Goldprices.py)"""
+
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+T0 = datetime(2026, 1, 1)
+
+
+@pytest.fixture(scope='module')
+def lttb_downsample(goldprices):
+    return goldprices.lttb_downsample
+
+
+def points(prices):
+    return [{'timestamp': T0 + timedelta(hours=i), 'price': p} for i, p in enumerate(prices)]
+
+
+@pytest.mark.parametrize('threshold', [0, 1, 2, 10, 11, 1000])
+def test_small_thresholds_and_short_series_are_returned_whole(lttb_downsample, threshold):
+    series = points(range(10))
+    result = lttb_downsample(series, threshold)
+    assert result == series
+    assert result is not series
+
+
+def test_keeps_threshold_points_in_time_order(lttb_downsample):
+    rng = random.Random(7)
+    series = points(rng.uniform(200, 300) for _ in range(1000))
+    for threshold in (3, 4, 50, 333, 999):
+        result = lttb_downsample(series, threshold)
+        assert len(result) == threshold
+        assert result[0] is series[0] and result[-1] is series[-1]
+        positions = [series.index(p) for p in result]
+        assert positions == sorted(set(positions))
+
+
+def test_one_point_per_bucket(lttb_downsample):
+    series = points(math.sin(i / 5) for i in range(102))
+    result = lttb_downsample(series, 12)
+    # 100 inner points in 10 buckets of 10
+    inner = [series.index(p) for p in result[1:-1]]
+    assert [(i - 1) // 10 for i in inner] == list(range(10))
+
+
+def test_spikes_survive(lttb_downsample):
+    prices = [250.0] * 500
+    prices[123], prices[377] = 400.0, 100.0
+    result = lttb_downsample(points(prices), 20)
+    kept = [p['price'] for p in result]
+    assert 400.0 in kept and 100.0 in kept
+
+
+def test_straight_line_stays_straight(lttb_downsample):
+    series = points(250 + i * 0.5 for i in range(300))
+    result = lttb_downsample(series, 30)
+    slopes = {round((b['price'] - a['price']) / (b['timestamp'] - a['timestamp']).total_seconds(), 12)
+              for a, b in zip(result, result[1:])}
+    assert len(slopes) == 1
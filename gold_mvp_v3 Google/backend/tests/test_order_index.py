@@ -0,0 +1,120 @@
+"""Customer order index over orders.csv (order_index.py)"""
+
+import csv
+
+import pytest
+
+from order_index import CustomerOrderIndex, OrderIndexError
+from order_store import CsvOrderStore, ORDER_COLUMNS, PAGE_COLUMNS
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CsvOrderStore(path=str(tmp_path / 'orders.csv'), partitions_dir=str(tmp_path / 'partitions'))
+
+
+def test_rows_for_returns_only_that_customers_rows_in_file_order(store, make_order):
+    store.add_order(make_order('A1', 'alice', items=2))
+    store.add_order(make_order('B1', 'bob'))
+    store.add_order(make_order('A2', 'alice'))
+
+    rows = store.index.rows_for('alice')
+    assert [(r['order_id'], r['quantity']) for r in rows] == [('A1', '1'), ('A1', '2'), ('A2', '1')]
+    assert [r['order_id'] for r in store.index.rows_for('bob')] == ['B1']
+    assert store.index.rows_for('nobody') == []
+
+
+@pytest.mark.parametrize('address', [
+    'Line 1\nLine 2',
+    'Tower \x1c Block \x1d Unit \x1e',
+    'Villa\x85 12',
+    'Street\u2028Building\u2029Flat',
+    'Flat 3, "Palm" Residence',
+])
+def test_rows_with_separators_inside_quoted_fields(store, make_order, address):
+    store.add_order(make_order('A1', 'alice', address=address))
+    store.add_order(make_order('B1', 'bob'))
+
+    [row] = store.index.rows_for('alice')
+    assert row['address'] == address
+    assert row['emirate'] == 'Dubai'
+    assert [r['order_id'] for r in store.index.rows_for('bob')] == ['B1']
+
+
+def test_rows_appended_by_another_writer_are_indexed_on_lookup(store, make_order):
+    store.add_order(make_order('A1', 'alice'))
+    assert store.index.has_id('A1')
+
+    # Another worker appends without going through this index
+    with open(store.path, 'a', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(make_order('A2', 'alice'))
+
+    assert store.index.has_id('A2')
+    assert [r['order_id'] for r in store.index.rows_for('alice')] == ['A1', 'A2']
+
+
+def test_partial_last_row_is_left_for_the_next_sync(store, make_order):
+    store.add_order(make_order('A1', 'alice'))
+    line = ','.join(make_order('A2', 'alice')[0])
+    with open(store.path, 'a', encoding='utf-8') as f:
+        f.write(line[:20])
+    assert not store.index.has_id('A2')
+
+    with open(store.path, 'a', encoding='utf-8') as f:
+        f.write(line[20:] + '\r\n')
+    assert store.index.has_id('A2')
+    assert [r['order_id'] for r in store.index.rows_for('alice')] == ['A1', 'A2']
+
+
+def test_replaced_file_is_reindexed(store, make_order):
+    store.add_order(make_order('A1', 'alice', items=3))
+    store.add_order(make_order('B1', 'bob'))
+    store.index.rows_for('alice')
+
+    with open(store.path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(ORDER_COLUMNS)
+        writer.writerows(make_order('C1', 'carol'))
+
+    assert not store.index.has_id('A1')
+    assert store.index.rows_for('alice') == []
+    assert [r['order_id'] for r in store.index.rows_for('carol')] == ['C1']
+
+
+def test_entries_carry_the_page_columns(store, make_order):
+    store.add_order(make_order('A1', 'alice', purchase_date='2026-01-02 10:00:00'))
+    [entry] = store.index.entries_for('alice')
+    offset, length, purchase_date, order_id = entry
+    assert (purchase_date, order_id) == ('2026-01-02 10:00:00', 'A1')
+    with open(store.path, 'rb') as f:
+        f.seek(offset)
+        assert f.read(length).startswith(b'A1,alice,')
+
+
+def test_stale_offsets_are_rebuilt_once(store, make_order):
+    store.add_order(make_order('A1', 'alice'))
+    store.add_order(make_order('B1', 'bob'))
+    index = store.index
+    index.sync()
+    index.offsets['alice'] = list(index.offsets['bob'])  # points at bob's row
+
+    assert [r['order_id'] for r in index.rows_for('alice')] == ['A1']
+
+
+def test_offsets_still_wrong_after_rebuild_raise(tmp_path, make_order, monkeypatch):
+    path = tmp_path / 'orders.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(ORDER_COLUMNS)
+        writer.writerows(make_order('A1', 'alice') + make_order('B1', 'bob'))
+    index = CustomerOrderIndex(str(path), sort_columns=PAGE_COLUMNS, id_column='order_id')
+    index.rebuild()
+    wrong = list(index.offsets['bob'])
+
+    def rebuild():
+        index.offsets['alice'] = wrong
+    monkeypatch.setattr(index, 'rebuild', rebuild)
+    index.offsets['alice'] = wrong
+
+    with pytest.raises(OrderIndexError):
+        index.rows_for('alice')
@@ -0,0 +1,140 @@
+"""Order journal: append, apply, replay and compaction (order_journal.py)"""
+
+import json
+import os
+
+import pytest
+
+import order_journal
+import portfolio
+import sales_reports
+from order_journal import OrderJournal
+from order_store import CsvOrderStore
+from portfolio import HoldingsCache
+from sales_reports import SalesAggregates
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CsvOrderStore(path=str(tmp_path / 'orders.csv'), partitions_dir=str(tmp_path / 'partitions'))
+
+
+@pytest.fixture
+def aggregates(tmp_path, monkeypatch):
+    """Sales aggregates and holdings in a scratch sales.db, as the applier's targets"""
+    path = str(tmp_path / 'sales.db')
+    sales, holdings = SalesAggregates(path), HoldingsCache(path)
+    holdings.rebuild([])
+    monkeypatch.setattr(sales_reports, '_aggregates', sales)
+    monkeypatch.setattr(portfolio, '_holdings', holdings)
+    return sales, holdings
+
+
+@pytest.fixture
+def journal(tmp_path, store, aggregates, monkeypatch):
+    journal = OrderJournal(path=str(tmp_path / 'orders.journal'), store=store)
+    # Apply explicitly instead of from the background thread
+    monkeypatch.setattr(journal, '_ensure_worker', lambda: None)
+    return journal
+
+
+def order_ids(store):
+    return [row['order_id'] for row in store.iter_all_rows()]
+
+
+def orders_counted(aggregates, customer_id):
+    sales, holdings = aggregates
+    [day] = sales.report('day', '2026-01-01', '2026-12-31')
+    return day['orders'], holdings.get(customer_id)['orders']
+
+
+def test_append_is_pending_until_applied(journal, store, make_order):
+    journal.append([make_order('A1', 'alice', items=2)])
+    journal.append([make_order('B1', 'bob'), make_order('A2', 'alice')])
+
+    assert journal.pending()
+    assert order_ids(store) == []
+
+    assert journal.apply_pending() == 3
+    assert not journal.pending()
+    assert order_ids(store) == ['A1', 'A1', 'B1', 'A2']
+    assert store.order_exists('A2')
+    assert [r['order_id'] for r in store.customer_rows('alice')] == ['A1', 'A1', 'A2']
+
+
+def test_apply_updates_aggregates_once(journal, aggregates, make_order):
+    journal.append([make_order('A1', 'alice', items=2)])
+    journal.apply_pending()
+    assert orders_counted(aggregates, 'alice') == (1, 1)
+
+
+def test_replay_after_a_crash_adds_nothing_twice(journal, store, aggregates, make_order):
+    journal.append([make_order('A1', 'alice')])
+    journal.append([make_order('A2', 'alice')])
+    journal.apply_pending()
+
+    # Crash before the offset was written: everything is replayed
+    journal._write_offset(0)
+    assert journal.apply_pending() == 0
+    assert order_ids(store) == ['A1', 'A2']
+    assert orders_counted(aggregates, 'alice') == (2, 2)
+
+
+def test_replay_completes_aggregates_missed_by_a_crash(journal, store, aggregates, make_order):
+    # Crash after the store write, before the aggregates
+    store.add_orders([make_order('A1', 'alice')])
+    journal.append([make_order('A1', 'alice')])
+
+    assert journal.apply_pending() == 0
+    assert order_ids(store) == ['A1']
+    assert orders_counted(aggregates, 'alice') == (1, 1)
+
+
+def test_duplicate_entries_in_one_batch_are_applied_once(journal, store, make_order):
+    journal.append([make_order('A1', 'alice')])
+    journal.append([make_order('A1', 'alice')])
+    assert journal.apply_pending() == 1
+    assert order_ids(store) == ['A1']
+
+
+def test_partial_last_line_waits_for_the_rest(journal, store, make_order):
+    journal.append([make_order('A1', 'alice')])
+    line = json.dumps({'orders': [make_order('A2', 'alice')]}) + '\n'
+    with open(journal.path, 'a') as f:
+        f.write(line[:30])
+
+    assert journal.apply_pending() == 1
+    assert journal.pending()
+
+    with open(journal.path, 'a') as f:
+        f.write(line[30:])
+    assert journal.apply_pending() == 1
+    assert not journal.pending()
+    assert order_ids(store) == ['A1', 'A2']
+
+
+def test_unreadable_entry_is_skipped(journal, store, make_order):
+    with open(journal.path, 'w') as f:
+        f.write('{not json\n')
+    journal.append([make_order('A1', 'alice')])
+
+    assert journal.apply_pending() == 1
+    assert not journal.pending()
+    assert order_ids(store) == ['A1']
+
+
+def test_applied_journal_is_compacted(journal, make_order, monkeypatch):
+    monkeypatch.setattr(order_journal, 'JOURNAL_COMPACT_BYTES', 1)
+    journal.append([make_order('A1', 'alice')])
+    journal.apply_pending()
+
+    assert os.path.getsize(journal.path) == 0
+    assert journal._read_offset() == 0
+    journal.append([make_order('A2', 'alice')])
+    assert journal.apply_pending() == 1
+
+
+def test_close_applies_what_is_left(journal, store, make_order):
+    journal.append([make_order('A1', 'alice')])
+    journal.close()
+    assert order_ids(store) == ['A1']
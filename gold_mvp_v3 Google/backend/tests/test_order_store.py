@@ -0,0 +1,102 @@
+"""Sealing orders.csv into monthly partitions (order_store.py, order_partitions.py)"""
+
+import csv
+import os
+
+import pytest
+
+import order_store
+from order_partitions import write_partition
+from order_store import CsvOrderStore, ORDER_COLUMNS
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CsvOrderStore(path=str(tmp_path / 'orders.csv'), partitions_dir=str(tmp_path / 'partitions'))
+
+
+@pytest.fixture
+def history(store, make_order):
+    """Orders across three months; 2026-02 is the current one"""
+    store.add_orders([
+        make_order('A1', 'alice', '2025-12-05 09:00:00', items=2),
+        make_order('B1', 'bob', '2025-12-20 12:00:00'),
+        make_order('A2', 'alice', '2026-01-10 10:00:00'),
+        make_order('A3', 'alice', '2026-02-01 08:00:00'),
+    ])
+    return store
+
+
+def hot_order_ids(store):
+    with open(store.path, encoding='utf-8') as f:
+        return [line.split(',')[0] for line in f.read().splitlines()[1:]]
+
+
+def test_seal_moves_finished_months_out_of_orders_csv(history):
+    assert history.seal('2026-02') == 4
+
+    assert history.partitions.months() == ['2025-12', '2026-01']
+    assert hot_order_ids(history) == ['A3']
+    assert [r['order_id'] for r in history.iter_all_rows()] == ['A1', 'A1', 'B1', 'A2', 'A3']
+
+
+def test_sealed_orders_are_still_found(history):
+    history.seal('2026-02')
+
+    assert [r['order_id'] for r in history.customer_rows('alice')] == ['A1', 'A1', 'A2', 'A3']
+    assert [r['order_id'] for r in history.customer_rows('bob')] == ['B1']
+    assert all(history.order_exists(oid) for oid in ('A1', 'B1', 'A2', 'A3'))
+    assert not history.order_exists('Z9')
+
+
+def test_pages_span_partitions_and_orders_csv(history):
+    history.seal('2026-02')
+
+    rows, has_more = history.customer_page('alice', 2)
+    assert sorted({r['order_id'] for r in rows}) == ['A2', 'A3']
+    assert has_more
+
+    rows, has_more = history.customer_page('alice', 2, after=('2026-01-10 10:00:00', 'A2'))
+    assert [r['order_id'] for r in rows] == ['A1', 'A1']
+    assert not has_more
+
+
+def test_seal_again_moves_nothing(history):
+    history.seal('2026-02')
+    assert history.seal('2026-02') == 0
+    assert [r['order_id'] for r in history.iter_all_rows()] == ['A1', 'A1', 'B1', 'A2', 'A3']
+
+
+def test_interrupted_seal_does_not_duplicate_rows(history):
+    # The partition was written but orders.csv was not rewritten yet
+    with open(history.path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))[1:]
+    write_partition(history.partitions.directory, '2025-12', ORDER_COLUMNS,
+                    [r for r in rows if r[5].startswith('2025-12')])
+
+    assert history.seal('2026-02') == 1  # only 2026-01 is new
+    assert [r['order_id'] for r in history.iter_all_rows()] == ['A1', 'A1', 'B1', 'A2', 'A3']
+
+
+def test_orders_written_after_a_seal_are_indexed(history, make_order):
+    history.seal('2026-02')
+    history.add_order(make_order('A4', 'alice', '2026-02-03 08:00:00'))
+    assert [r['order_id'] for r in history.customer_rows('alice')] == ['A1', 'A1', 'A2', 'A3', 'A4']
+
+
+def test_warm_never_rewrites_orders_csv(history):
+    before = os.stat(history.path)
+    history.warm()
+    after = os.stat(history.path)
+    assert (after.st_ino, after.st_size, after.st_mtime_ns) == (before.st_ino, before.st_size, before.st_mtime_ns)
+    assert history.partitions.months() == []
+
+
+def test_autoseal_is_off_by_default(history, monkeypatch):
+    monkeypatch.setattr(order_store, '_store', history)
+    assert not order_store.ORDER_AUTOSEAL
+    assert order_store.autoseal() == 0
+    assert hot_order_ids(history) == ['A1', 'A1', 'B1', 'A2', 'A3']
+
+    monkeypatch.setattr(order_store, 'ORDER_AUTOSEAL', True)
+    assert order_store.autoseal() > 0
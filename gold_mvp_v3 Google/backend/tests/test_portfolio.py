@@ -0,0 +1,86 @@
+"""Customer holdings and their valuation (portfolio.py)"""
+
+import pytest
+from flask import Flask
+
+import portfolio
+from order_store import ORDER_COLUMNS
+from portfolio import HoldingsCache, aggregate_holdings
+
+
+def as_dicts(*orders):
+    return [dict(zip(ORDER_COLUMNS, row)) for rows in orders for row in rows]
+
+
+@pytest.fixture
+def holdings(tmp_path):
+    return HoldingsCache(str(tmp_path / 'sales.db'))
+
+
+def test_aggregate_holdings_per_customer(make_order):
+    totals = aggregate_holdings(as_dicts(make_order('A1', 'alice', items=2), make_order('B1', 'bob')))
+
+    orders, grams, cost_basis, gold_cost = totals['alice']
+    assert (orders, grams) == (1, 30.0)
+    assert cost_basis == pytest.approx(12526.9)
+    assert gold_cost == pytest.approx(30 * 588.9)
+    assert totals['bob'][:2] == [1, 10.0]
+
+
+def test_nothing_is_recorded_before_the_first_build(holdings, make_order):
+    holdings.record(as_dicts(make_order('A1', 'alice')))
+    assert not holdings.exists()
+    assert holdings.get('alice') is None
+
+
+def test_record_adds_each_order_once(holdings, make_order):
+    assert holdings.rebuild(as_dicts(make_order('A1', 'alice'))) == 1
+    holdings.record(as_dicts(make_order('A1', 'alice'), make_order('A2', 'alice', items=2)))
+    holdings.record(as_dicts(make_order('A2', 'alice', items=2)))
+
+    alice = holdings.get('alice')
+    assert (alice['orders'], alice['grams']) == (2, 40.0)
+    assert holdings.get('bob') is None
+
+
+def test_rebuild_replaces_the_holdings(holdings, make_order):
+    holdings.rebuild(as_dicts(make_order('A1', 'alice'), make_order('B1', 'bob')))
+    assert holdings.rebuild(as_dicts(make_order('A1', 'alice', items=2))) == 1
+
+    assert holdings.get('alice')['grams'] == 30.0
+    assert holdings.get('bob') is None
+    assert HoldingsCache(holdings.path).exists()
+
+
+@pytest.fixture
+def client(holdings, monkeypatch, make_order):
+    holdings.rebuild(as_dicts(make_order('A1', 'alice')))
+    monkeypatch.setattr(portfolio, '_holdings', holdings)
+    app = Flask(__name__)
+    app.register_blueprint(portfolio.portfolio_bp)
+    return app.test_client()
+
+
+def test_portfolio_is_valued_at_the_latest_price(client, monkeypatch):
+    monkeypatch.setattr(portfolio, 'current_price', lambda: (600.0, None))
+    body = client.get('/portfolio/alice').get_json()
+
+    assert (body['orders'], body['grams']) == (1, 10.0)
+    assert body['average_price_gram'] == 588.9
+    assert body['market_value'] == 6000.0
+    assert body['unrealized_gain'] == round(6000.0 - 6263.45, 2)
+
+
+def test_portfolio_without_orders_or_price(client, monkeypatch):
+    monkeypatch.setattr(portfolio, 'current_price', lambda: (None, None))
+    body = client.get('/portfolio/nobody').get_json()
+
+    assert (body['orders'], body['grams'], body['average_price_gram']) == (0, 0, None)
+    assert body['market_value'] is None
+
+
+def test_rebuild_command(run_rebuild, make_order):
+    conn = run_rebuild('portfolio', [make_order('A1', 'alice', items=2), make_order('B1', 'bob')])
+    assert conn.execute("SELECT customer_id, orders, grams FROM customer_holdings ORDER BY customer_id").fetchall() \
+        == [('alice', 1, 30.0), ('bob', 1, 10.0)]
+    assert conn.execute("SELECT COUNT(*) FROM holdings_orders").fetchone() == (2,)
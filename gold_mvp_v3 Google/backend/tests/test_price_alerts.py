@@ -0,0 +1,156 @@
+"""Threshold crossings of the price alert index (price_alerts.py)"""
+
+import pytest
+from flask import Flask
+
+import price_alerts
+from price_alerts import AlertIndex
+
+
+def alert(alert_id, direction, threshold, status='active', customer_id='alice'):
+    return {
+        'alert_id': alert_id, 'customer_id': customer_id, 'email': f'{customer_id}@example.com',
+        'direction': direction, 'threshold': str(threshold), 'created_at': '2026-01-01T00:00:00',
+        'status': status, 'triggered_at': '', 'triggered_price': ''
+    }
+
+
+@pytest.fixture
+def index():
+    index = AlertIndex()
+    for a in (alert('up-300', 'above', 300), alert('up-305', 'above', 305.5), alert('up-310', 'above', 310),
+              alert('down-290', 'below', 290), alert('down-295', 'below', 295.5), alert('down-280', 'below', 280)):
+        index.add(a)
+    return index
+
+
+@pytest.mark.parametrize('previous, price, expected', [
+    (299.99, 300, ['up-300']),               # reaching the threshold fires
+    (300, 305.5, ['up-305']),                # starting on 300 does not fire it again
+    (299, 310, ['up-300', 'up-305', 'up-310']),
+    (299, 299.99, []),
+    (310, 400, []),
+    (100, 1000, ['up-300', 'up-305', 'up-310']),
+])
+def test_rising_price_fires_above_alerts_in_previous_exclusive_price_inclusive(index, previous, price, expected):
+    assert index.crossed(previous, price) == expected
+
+
+@pytest.mark.parametrize('previous, price, expected', [
+    (290.01, 290, ['down-290']),
+    (295.5, 290, ['down-290']),              # starting on 295.5 does not fire it again
+    (296, 280, ['down-280', 'down-290', 'down-295']),
+    (296, 295.51, []),
+    (280, 100, []),
+])
+def test_falling_price_fires_below_alerts_in_price_inclusive_previous_exclusive(index, previous, price, expected):
+    assert index.crossed(previous, price) == expected
+
+
+@pytest.mark.parametrize('previous, price', [(None, 300), (300, 300), (295.5, 295.5)])
+def test_no_move_fires_nothing(index, previous, price):
+    assert index.crossed(previous, price) == []
+
+
+def test_direction_decides_which_side_fires(index):
+    # A rise through a 'below' threshold and a fall through an 'above' one do nothing
+    assert index.crossed(285, 292) == []
+    assert index.crossed(306, 304) == []
+
+
+def test_alerts_on_the_same_threshold_all_fire(index):
+    index.add(alert('up-300-bob', 'above', 300, customer_id='bob'))
+    assert index.crossed(299, 300) == ['up-300', 'up-300-bob']
+
+
+def test_later_record_replaces_the_alert(index):
+    index.add(alert('up-300', 'above', 300, status='triggered'))
+    index.add(alert('down-290', 'below', 290, status='cancelled'))
+    assert index.crossed(299, 300) == []
+    assert index.crossed(291, 290) == []
+    assert index.alerts['up-300']['status'] == 'triggered'
+
+    index.add(alert('up-305', 'above', 320))
+    assert index.crossed(300, 310) == ['up-310']
+    assert index.crossed(310, 320) == ['up-305']
+
+
+# ============== SUBSCRIPTIONS ==============
+
+@pytest.fixture
+def alerts(tmp_path, monkeypatch):
+    alerts = price_alerts.PriceAlerts(str(tmp_path / 'price_alerts.csv'))
+    monkeypatch.setattr(price_alerts, '_alerts', alerts)
+    return alerts
+
+
+@pytest.fixture
+def emails(monkeypatch):
+    """Confirmation and triggered-alert emails queued, as (kind, args)"""
+    queued = []
+    monkeypatch.setattr(price_alerts, 'log_price_alert_confirmation', lambda *a: queued.append(('confirm', a)))
+    monkeypatch.setattr(price_alerts, 'log_price_alert', lambda *a: queued.append(('alert', a)))
+    return queued
+
+
+@pytest.fixture
+def client(alerts, emails):
+    app = Flask(__name__)
+    price_alerts.init_alerts(app)
+    return app.test_client()
+
+
+def subscribe(client, customer_id='alice', threshold=300):
+    response = client.post('/alerts', json={'customer_id': customer_id, 'email': f'{customer_id}@example.com',
+                                            'direction': 'above', 'threshold': threshold})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_alerts_fire_only_once_confirmed(client, alerts, emails):
+    alert_id = subscribe(client)['alert']['alert_id']
+    [(kind, (email, confirmed_id, _, _, token))] = emails
+    assert (kind, email, confirmed_id) == ('confirm', 'alice@example.com', alert_id)
+
+    assert alerts.check(299, 301) == []
+    assert client.get('/alerts/confirm', query_string={'token': token}).get_json() == \
+        {'success': True, 'alert_id': alert_id}
+    assert [a['alert_id'] for a in alerts.check(299, 301)] == [alert_id]
+    assert emails[-1][0] == 'alert'
+
+
+@pytest.mark.parametrize('token', ['', 'forged'])
+def test_confirmation_needs_a_valid_token(client, token):
+    subscribe(client)
+    assert client.get('/alerts/confirm', query_string={'token': token}).status_code == 400
+
+
+def test_cancel_token_does_not_confirm(client, alerts):
+    body = subscribe(client)
+    assert client.get('/alerts/confirm', query_string={'token': body['cancel_token']}).status_code == 400
+    assert alerts.index.alerts[body['alert']['alert_id']]['status'] == 'pending'
+
+
+def test_listing_has_no_email_addresses(client):
+    subscribe(client)
+    [listed] = client.get('/alerts/customer/alice').get_json()['alerts']
+    assert 'email' not in listed
+    assert listed['status'] == 'pending'
+
+
+def test_pending_alerts_count_toward_the_limit_until_they_expire(alerts, monkeypatch):
+    monkeypatch.setattr(price_alerts, 'MAX_ALERTS_PER_CUSTOMER', 2)
+    for _ in range(2):
+        assert alerts.create('alice', 'alice@example.com', 'above', 300)[1] is None
+    assert alerts.create('alice', 'alice@example.com', 'above', 300)[1]
+
+    monkeypatch.setattr(price_alerts, 'PRICE_ALERT_CONFIRM_EXPIRATION', -1)
+    assert alerts.create('alice', 'alice@example.com', 'above', 300)[1] is None
+
+
+def test_cancelled_alert_cannot_be_confirmed(client, alerts, emails):
+    body = subscribe(client)
+    alert_id = body['alert']['alert_id']
+    assert client.delete(f'/alerts/{alert_id}', headers={'X-Alert-Token': body['cancel_token']}).status_code == 200
+    token = emails[0][1][4]
+    assert client.get('/alerts/confirm', query_string={'token': token}).status_code == 404
@@ -0,0 +1,117 @@
+"""Incrementally maintained indicator windows (price_analytics.py)"""
+
+import math
+import random
+import statistics
+from datetime import datetime, timedelta
+
+import pytest
+
+import price_analytics
+from price_analytics import PriceAnalytics, RollingWindow
+
+T0 = datetime(2026, 1, 1)
+
+
+class FakeStore:
+    def __init__(self, prices):
+        self.daily = [{'timestamp': T0 + timedelta(minutes=i), 'price': p} for i, p in enumerate(prices)]
+
+    def daily_prices(self):
+        return self.daily
+
+    def append(self, *prices):
+        start = len(self.daily)
+        self.daily = self.daily + [{'timestamp': T0 + timedelta(minutes=start + i), 'price': p}
+                                   for i, p in enumerate(prices)]
+
+
+def walk(n, seed=3):
+    rng = random.Random(seed)
+    prices = [500.0]
+    for _ in range(n - 1):
+        prices.append(prices[-1] * math.exp(rng.gauss(0, 0.002)))
+    return prices
+
+
+ALL = {'sma': [5], 'ema': [5], 'volatility': [5], 'returns': [1, 5]}
+
+
+def test_window_matches_a_direct_computation():
+    prices = walk(30)
+    window = RollingWindow(5)
+    for p in prices:
+        window.push(p)
+
+    assert window.series['sma'][-1] == pytest.approx(statistics.mean(prices[-5:]))
+    log_returns = [math.log(b / a) for a, b in zip(prices[-6:], prices[-5:])]
+    assert window.series['volatility'][-1] == pytest.approx(statistics.stdev(log_returns) * 100)
+    assert window.series['returns'][-1] == pytest.approx((prices[-1] / prices[-6] - 1) * 100)
+    ema = prices[0]
+    for p in prices[1:]:
+        ema += (p - ema) / 3
+    assert window.series['ema'][-1] == pytest.approx(ema)
+
+
+def test_values_are_none_until_the_window_is_full():
+    window = RollingWindow(3)
+    for p in (100.0, 101.0, 102.0):
+        window.push(p)
+    assert window.series['sma'][1] is None
+    assert window.series['sma'][2] == pytest.approx(101.0)
+    assert window.series['returns'][2] is None
+    assert window.series['volatility'][2] is None
+
+
+def test_new_ticks_are_added_incrementally():
+    prices = walk(60)
+    store = FakeStore(prices[:40])
+    analytics = PriceAnalytics(store)
+    analytics.compute(ALL, 10)
+
+    store.append(*prices[40:])
+    incremental = analytics.compute(ALL, 10)
+    assert incremental == PriceAnalytics(FakeStore(prices)).compute(ALL, 10)
+    assert incremental['count'] == 60
+
+
+def test_a_new_window_replays_only_recent_ticks(monkeypatch):
+    monkeypatch.setattr(price_analytics, 'MAX_ANALYTICS_POINTS', 10)
+    prices = walk(1000)
+    analytics = PriceAnalytics(FakeStore(prices))
+    analytics.compute({'sma': [5]}, 10)
+
+    pushes = []
+    monkeypatch.setattr(RollingWindow, 'push', lambda self, p: pushes.append(p))
+    analytics.compute({'ema': [20]}, 10)
+    assert len(pushes) == price_analytics.WARMUP_WINDOWS * 20 + 10
+
+
+def test_replayed_ema_is_close_to_the_full_one(monkeypatch):
+    monkeypatch.setattr(price_analytics, 'MAX_ANALYTICS_POINTS', 10)
+    prices = walk(1000)
+    analytics = PriceAnalytics(FakeStore(prices))
+    analytics.compute({'sma': [5]}, 0)
+
+    replayed = analytics.compute({'ema': [20]}, 0)['ema']['20']['latest']
+    full = RollingWindow(20)
+    for p in prices:
+        full.push(p)
+    assert replayed == pytest.approx(full.series['ema'][-1], rel=0.001)
+
+
+def test_a_rewritten_series_starts_over():
+    store = FakeStore(walk(30))
+    analytics = PriceAnalytics(store)
+    analytics.compute(ALL, 5)
+
+    store.daily = FakeStore(walk(20, seed=9)).daily
+    assert analytics.compute(ALL, 5) == PriceAnalytics(FakeStore(walk(20, seed=9))).compute(ALL, 5)
+
+
+def test_least_recently_used_windows_are_dropped(monkeypatch):
+    monkeypatch.setattr(price_analytics, 'MAX_TRACKED_WINDOWS', 2)
+    analytics = PriceAnalytics(FakeStore(walk(30)))
+    for size in (3, 4, 3, 5):
+        analytics.compute({'sma': [size]}, 0)
+    assert list(analytics.windows) == [3, 5]
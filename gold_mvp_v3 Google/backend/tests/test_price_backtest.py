@@ -0,0 +1,61 @@
+"""Lump-sum and DCA backtests (price_backtest.py)"""
+
+import json
+
+import numpy as np
+import pytest
+from flask import Flask
+
+import price_backtest
+from price_backtest import parse_scenario, run_scenario
+
+
+def month_series(*prices, start='2020-01'):
+    """Price arrays with one price on the first of each month"""
+    months = np.arange(np.datetime64(start, 'M'), np.datetime64(start, 'M') + len(prices))
+    return months.astype('datetime64[s]').astype(np.int64), np.array(prices, dtype=np.float64)
+
+
+@pytest.mark.parametrize('amount', ['inf', '-inf', 'nan', 'Infinity', '1e400', 0, -5, 'ten', None])
+def test_amounts_that_are_not_finite_and_positive_are_rejected(amount):
+    with pytest.raises(ValueError, match='Invalid amount'):
+        parse_scenario({'amount': amount, 'start': '2020-01'})
+
+
+@pytest.mark.parametrize('raw, error', [
+    ([], 'Invalid scenario'),
+    ({'mode': 'yearly', 'start': '2020-01'}, 'mode'),
+    ({'amount': 100}, 'Missing start'),
+    ({'start': '2020-13'}, 'Invalid start'),
+    ({'start': '2020-05', 'end': '2020-01'}, 'end is before start'),
+])
+def test_invalid_scenarios(raw, error):
+    with pytest.raises(ValueError, match=error):
+        parse_scenario(raw)
+
+
+def test_lump_sum():
+    ts, prices = month_series(100, 50, 200)
+    result = run_scenario(ts, prices, *parse_scenario({'amount': 1000, 'start': '2020-01'}))
+    assert (result['purchases'], result['invested'], result['grams']) == (1, 1000.0, 10.0)
+    assert (result['final_value'], result['gain_percent']) == (2000.0, 100.0)
+    assert result['max_drawdown_percent'] == 50.0
+
+
+def test_dca_buys_every_month_until_end():
+    ts, prices = month_series(100, 50, 200, 400)
+    result = run_scenario(ts, prices, *parse_scenario({'mode': 'dca', 'amount': 100, 'start': '2020-01',
+                                                      'end': '2020-03'}))
+    assert (result['purchases'], result['invested'], result['grams']) == (3, 300.0, 3.5)
+    assert result['final_value'] == 700.0
+    assert result['end'] == '2020-03-01T00:00:00'
+
+
+def test_non_finite_amount_is_a_json_error(monkeypatch):
+    monkeypatch.setattr(price_backtest, 'price_arrays', lambda: month_series(100, 200))
+    app = Flask(__name__)
+    price_backtest.init_backtest(app)
+    response = app.test_client().get('/price/backtest?amount=nan&start=2020-01')
+
+    body = json.loads(response.data, parse_constant=lambda c: pytest.fail(f'{c} is not JSON'))
+    assert body['results'] == [{'index': 0, 'error': 'Invalid amount'}]
@@ -0,0 +1,96 @@
+"""Point-in-time price lookup (lookup_price in Goldprices.py)"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+@pytest.fixture(scope='module')
+def lookup_price(goldprices):
+    return goldprices.lookup_price
+
+
+def series(*points):
+    """(all_prices, timestamps) from (hours after T0, price) pairs"""
+    all_prices = [{'timestamp': T0 + timedelta(hours=h), 'price': price} for h, price in points]
+    return all_prices, [p['timestamp'] for p in all_prices]
+
+
+def at(hours):
+    return T0 + timedelta(hours=hours)
+
+
+def test_no_prices(lookup_price):
+    assert lookup_price(T0, [], []) is None
+
+
+def test_exact_match(lookup_price):
+    prices, ts = series((0, 100.0), (24, 110.0), (48, 120.0))
+    result = lookup_price(at(24), prices, ts, 1)
+    assert result == {'timestamp': at(24), 'price': 110.0, 'actual_timestamp': at(24), 'interpolated': False}
+
+
+def test_nearest_point_within_tolerance(lookup_price):
+    prices, ts = series((0, 100.0), (24, 110.0))
+    assert lookup_price(at(5), prices, ts, 1)['actual_timestamp'] == at(0)
+    assert lookup_price(at(19), prices, ts, 1)['actual_timestamp'] == at(24)
+
+
+def test_tie_goes_to_the_earlier_point(lookup_price):
+    prices, ts = series((0, 100.0), (24, 110.0))
+    result = lookup_price(at(12), prices, ts)
+    assert (result['actual_timestamp'], result['price']) == (at(0), 100.0)
+
+
+def test_equal_timestamps_use_the_first(lookup_price):
+    prices, ts = series((0, 100.0), (24, 110.0), (24, 111.0), (48, 120.0))
+    assert lookup_price(at(24), prices, ts)['price'] == 110.0
+    assert lookup_price(at(25), prices, ts)['price'] == 110.0
+
+
+@pytest.mark.parametrize('hours, expected', [(-100, 100.0), (-1, 100.0), (1000, 120.0), (49, 120.0)])
+def test_outside_the_series_without_tolerance(lookup_price, hours, expected):
+    prices, ts = series((0, 100.0), (24, 110.0), (48, 120.0))
+    result = lookup_price(at(hours), prices, ts)
+    assert result['price'] == expected
+    assert result['interpolated'] is False
+
+
+@pytest.mark.parametrize('hours, expected', [(-100, 100.0), (1000, 120.0)])
+def test_outside_the_series_beyond_tolerance_uses_the_end_price(lookup_price, hours, expected):
+    prices, ts = series((0, 100.0), (24, 110.0), (48, 120.0))
+    result = lookup_price(at(hours), prices, ts, 1)
+    assert result == {'timestamp': at(hours), 'price': expected, 'interpolated': True}
+
+
+def test_gap_beyond_tolerance_is_interpolated(lookup_price):
+    prices, ts = series((0, 100.0), (24 * 10, 200.0))
+    result = lookup_price(at(24 * 4), prices, ts, 1)
+    assert result['interpolated'] is True
+    assert result['price'] == pytest.approx(140.0)
+
+
+def test_single_point(lookup_price):
+    prices, ts = series((0, 100.0))
+    assert lookup_price(at(0), prices, ts, 1)['interpolated'] is False
+    assert lookup_price(at(-48), prices, ts, 1)['price'] == 100.0
+    assert lookup_price(at(48), prices, ts, 1)['price'] == 100.0
+
+
+@pytest.mark.parametrize('tolerance', [None, 0.5, 1, 3])
+def test_matches_the_linear_scan(goldprices, lookup_price, tolerance):
+    """Same answers as find_closest_price falling back to interpolate_price"""
+    rng = random.Random(tolerance)
+    hours = sorted(rng.choice(range(0, 24 * 60, 6)) for _ in range(200))
+    prices, ts = series(*((h, 100 + rng.random() * 50) for h in hours))
+
+    for _ in range(300):
+        target = at(rng.uniform(-24 * 5, 24 * 65))
+        closest = goldprices.find_closest_price(target, prices, tolerance)
+        expected = closest['price'] if closest else goldprices.interpolate_price(target, prices)['price']
+        result = lookup_price(target, prices, ts, tolerance)
+        assert result['price'] == pytest.approx(expected)
+        assert result['interpolated'] is (closest is None)
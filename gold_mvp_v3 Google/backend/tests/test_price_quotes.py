@@ -0,0 +1,70 @@
+"""Pricing orders from signed quotes (price_quotes.py, orders_handler.price_order)"""
+
+from datetime import datetime
+
+import pytest
+
+import orders_handler
+import price_quotes
+from orders_handler import price_order
+from tokens import generate_price_quote_token
+
+
+class FakeSegment:
+    def __init__(self, price):
+        self.price = price
+
+    def latest(self, max_age_seconds):
+        if self.price is None:
+            return None
+        return {'price': self.price, 'timestamp': datetime.now()}
+
+
+@pytest.fixture
+def tick(monkeypatch):
+    segment = FakeSegment(500.0)
+    monkeypatch.setattr(price_quotes, 'get_segment', lambda: segment)
+    return segment
+
+
+def order(**fields):
+    return dict({'customer_id': 'alice', 'gold_price_gram': 450.0,
+                 'items': [{'weight': 10, 'quantity': 1, 'commission': 80}]}, **fields)
+
+
+def test_quotes_are_required_by_default():
+    assert price_quotes.REQUIRE_PRICE_QUOTE
+    assert price_order(order()) == (order(), 'Missing price quote')
+
+
+def test_order_is_priced_from_the_quote_not_the_client(tick):
+    quote = price_quotes.issue_quote()
+    data, error = price_order(order(quote_token=quote['token']))
+    assert error is None
+    assert data['gold_price_gram'] == 500.0
+
+
+@pytest.mark.parametrize('token', [12345, ['abc'], {'price': 1}, True, 'not-a-token'])
+def test_unusable_token_is_an_order_error(token):
+    data, error = price_order(order(quote_token=token))
+    assert error
+    assert data['gold_price_gram'] == 450.0
+
+
+def test_token_for_another_purpose_is_rejected():
+    token = generate_price_quote_token('500')
+    assert price_order(order(quote_token=token))[1]
+
+
+@pytest.mark.parametrize('client_price, accepted', [(500.0, True), (502.4, True), (497.6, True),
+                                                    (503, False), (450, False), ('inf', False), ('abc', False)])
+def test_without_required_quotes_client_price_must_match_the_tick(tick, monkeypatch, client_price, accepted):
+    monkeypatch.setattr(orders_handler, 'REQUIRE_PRICE_QUOTE', False)
+    data, error = price_order(order(gold_price_gram=client_price))
+    assert (error is None) is accepted
+
+
+def test_without_required_quotes_and_no_tick_the_order_is_rejected(tick, monkeypatch):
+    monkeypatch.setattr(orders_handler, 'REQUIRE_PRICE_QUOTE', False)
+    tick.price = None
+    assert price_order(order(gold_price_gram=500.0))[1]
@@ -0,0 +1,91 @@
+"""Price CSV tailing and the warm-start snapshot (price_store.py)"""
+
+import gzip
+import json
+
+import pytest
+
+from price_store import PriceStore, SNAPSHOT_FORMAT
+
+
+@pytest.fixture
+def csv_paths(tmp_path):
+    daily = tmp_path / 'DailyGold.csv'
+    daily.write_text('Date,Price\n'
+                     '00/01/00/01/01/2026,509.54\n'
+                     '00/01/00/02/01/2026,511.38\n')
+    historical = tmp_path / 'HistoricalMVPGold.csv'
+    historical.write_text('Date,USD_to_UAE,Price_oz_USD,Price_g_USD,Price_g_UAE\n'
+                          '11/2025,3.6725,4000.0,128.6,472.28\n'
+                          '12/2025,3.6725,4100.0,131.8,484.09\n')
+    return str(daily), str(historical)
+
+
+def append_tick(path, line):
+    with open(path, 'a') as f:
+        f.write(line)
+
+
+def test_appended_ticks_are_tailed(csv_paths):
+    store = PriceStore(*csv_paths)
+    assert [p['price'] for p in store.daily_prices()] == [509.54, 511.38]
+    version = store.version
+
+    append_tick(csv_paths[0], '00/01/00/05/01/2026,525')
+    assert len(store.daily_prices()) == 2  # partial line waits
+    append_tick(csv_paths[0], '.23\n')
+    assert [p['price'] for p in store.daily_prices()][-1] == 525.23
+    assert store.version > version
+
+
+def test_snapshot_round_trip(csv_paths, tmp_path):
+    store = PriceStore(*csv_paths)
+    store.refresh()
+    path = str(tmp_path / 'price_cache.snapshot')
+    assert store.save_snapshot(path)
+
+    with gzip.open(path, 'rt') as f:
+        assert json.load(f)['format'] == SNAPSHOT_FORMAT
+
+    restored = PriceStore(*csv_paths)
+    assert restored.load_snapshot(path)
+    assert restored.all_prices() == store.all_prices()
+    assert restored.historical[0]['price_usd'] == store.historical[0]['price_usd']
+
+
+def test_snapshot_tails_ticks_appended_after_it(csv_paths, tmp_path):
+    store = PriceStore(*csv_paths)
+    store.refresh()
+    path = str(tmp_path / 'price_cache.snapshot')
+    store.save_snapshot(path)
+    append_tick(csv_paths[0], '00/01/00/05/01/2026,525.23\n')
+
+    restored = PriceStore(*csv_paths)
+    assert restored.load_snapshot(path)
+    assert [p['price'] for p in restored.daily_prices()] == [509.54, 511.38, 525.23]
+
+
+@pytest.mark.parametrize('damage', ['edit_daily', 'edit_historical', 'garbage', 'old_format'])
+def test_stale_or_unreadable_snapshot_is_ignored(csv_paths, tmp_path, damage):
+    store = PriceStore(*csv_paths)
+    store.refresh()
+    path = str(tmp_path / 'price_cache.snapshot')
+    store.save_snapshot(path)
+
+    if damage == 'edit_daily':
+        with open(csv_paths[0], 'r+') as f:
+            f.seek(len('Date,Price\n00/01/00/01/01/2026,'))
+            f.write('6')
+    elif damage == 'edit_historical':
+        append_tick(csv_paths[1], '01/2026,3.6725,4200.0,135.0,495.9\n')
+    elif damage == 'garbage':
+        with open(path, 'wb') as f:
+            f.write(b'not a snapshot')
+    else:
+        with gzip.open(path, 'rt') as f:
+            snapshot = json.load(f)
+        snapshot['format'] = SNAPSHOT_FORMAT + 1
+        with gzip.open(path, 'wt') as f:
+            json.dump(snapshot, f)
+
+    assert not PriceStore(*csv_paths).load_snapshot(path)
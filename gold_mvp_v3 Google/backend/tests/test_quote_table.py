@@ -0,0 +1,82 @@
+"""The per-tick quote table and order pricing (quote_table.py)"""
+
+import sys
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+import quote_table
+from config import GRAMS_PER_OUNCE
+from orders_handler import build_order_rows
+from order_store import ORDER_COLUMNS
+from quote_table import QuoteTable, build_quote_table, price_lines
+
+TAX, COMMISSION, TOTAL = (ORDER_COLUMNS.index(c) for c in ('tax_amount', 'commission_amount', 'total'))
+
+
+def test_price_lines():
+    gold_cost, vat, commission, total = price_lines(500.0, 10.0, 2, 80.0)
+    assert (gold_cost, commission) == (10000.0, 160.0)
+    assert vat == pytest.approx(500.0)
+    assert total == pytest.approx(10660.0)
+
+
+def test_table_products_and_units():
+    table = build_quote_table(500.0)
+
+    assert [p['weight'] for p in table['products']] == list(quote_table.PRODUCT_WEIGHTS)
+    ten_grams = table['products'][3]
+    assert ten_grams == {'weight': 10, 'gold_cost': 5000.0, 'vat': 250.0, 'commission': 80.0, 'total': 5330.0}
+    assert table['units']['gram'] == {'price': 500.0, 'price_with_vat': 525.0}
+    assert table['units']['ounce']['price'] == round(500.0 * GRAMS_PER_OUNCE, 2)
+
+
+def test_orders_are_priced_like_the_table():
+    data = {'customer_id': 'alice', 'gold_price_gram': 500.0,
+            'items': [{'weight': w, 'quantity': 1, 'commission': c}
+                      for w, c in zip(quote_table.PRODUCT_WEIGHTS, quote_table.DEFAULT_COMMISSIONS)]}
+    rows, order_total = build_order_rows(data, 'A1', '2026-01-25 20:13:52')
+
+    products = build_quote_table(500.0)['products']
+    assert [(r[TAX], r[COMMISSION], r[TOTAL]) for r in rows] == \
+        [(p['vat'], p['commission'], p['total']) for p in products]
+    assert order_total == pytest.approx(sum(p['total'] for p in products))
+
+
+def test_orders_are_priced_without_numpy(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    data = {'gold_price_gram': 500.0, 'items': [{'weight': 10, 'quantity': 2, 'commission': 80}]}
+    [row], order_total = build_order_rows(data, 'A1', '2026-01-25 20:13:52')
+    assert (row[TAX], row[COMMISSION], row[TOTAL], order_total) == (500.0, 160.0, 10660.0, 10660.0)
+
+    with pytest.raises(ImportError):
+        quote_table.init_quote_table(Flask(__name__))
+
+
+def test_table_is_rebuilt_only_when_the_tick_changes(monkeypatch):
+    tick = [500.0, datetime(2026, 1, 25, 20, 0)]
+    monkeypatch.setattr(quote_table, 'current_price', lambda: tuple(tick))
+    builds = []
+    monkeypatch.setattr(quote_table, 'build_quote_table', lambda price: builds.append(price) or {'price': price})
+    table = QuoteTable()
+
+    assert table.get() is table.get()
+    tick[:] = [510.0, datetime(2026, 1, 25, 20, 1)]
+    assert table.get()['price_gram_24k'] == 510.0
+    assert builds == [500.0, 510.0]
+
+
+def test_price_table_route(monkeypatch):
+    app = Flask(__name__)
+    quote_table.init_quote_table(app)
+    client = app.test_client()
+    monkeypatch.setattr(quote_table, '_quote_table', QuoteTable())
+
+    monkeypatch.setattr(quote_table, 'current_price', lambda: (None, None))
+    assert client.get('/price/table').status_code == 503
+
+    monkeypatch.setattr(quote_table, 'current_price', lambda: (500.0, datetime(2026, 1, 25, 20, 0)))
+    body = client.get('/price/table').get_json()
+    assert (body['karat'], body['price_gram_24k'], body['vat_rate']) == ('24k', 500.0, 0.05)
+    assert len(body['products']) == len(quote_table.PRODUCT_WEIGHTS)
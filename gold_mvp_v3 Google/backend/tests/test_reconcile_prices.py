@@ -0,0 +1,99 @@
+"""Merge-join of order prices against recorded ticks (reconcile_prices.py)"""
+
+import csv
+from datetime import datetime, timedelta
+
+import pytest
+
+import order_journal
+import order_store
+import reconcile_prices
+from order_store import CsvOrderStore, ORDER_COLUMNS
+from reconcile_prices import iter_orders, iter_ticks, reconcile
+
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+def at(hours):
+    return T0 + timedelta(hours=hours)
+
+
+def row(order_id, hours, price, customer_id='alice'):
+    return {'order_id': order_id, 'customer_id': customer_id,
+            'purchase_date': at(hours).strftime('%Y-%m-%d %H:%M:%S'), 'gold_price_gram': str(price)}
+
+
+def test_orders_are_put_back_in_time_order_within_the_window(monkeypatch):
+    monkeypatch.setattr(reconcile_prices, 'REORDER_WINDOW', 2)
+    rows = [row('A', 2, 500), row('B', 0, 500), row('C', 1, 500), row('D', 5, 500), row('E', 3, 500)]
+    assert [o[1] for o in iter_orders(rows)] == ['B', 'C', 'A', 'E', 'D']
+
+
+def test_reordering_beyond_the_window_is_not_absorbed(monkeypatch):
+    monkeypatch.setattr(reconcile_prices, 'REORDER_WINDOW', 1)
+    rows = [row('A', 2, 500), row('B', 3, 500), row('C', 0, 500)]
+    # A left the buffer before C arrived
+    assert [o[1] for o in iter_orders(rows)] == ['A', 'C', 'B']
+
+
+def test_one_entry_per_order_and_unreadable_orders_are_counted():
+    counts = {}
+    rows = [row('A', 0, 500), row('A', 0, 500), row('B', 1, 'n/a'), dict(row('C', 2, 500), purchase_date='')]
+    assert [o[1] for o in iter_orders(rows, counts)] == ['A']
+    assert counts == {'skipped': 2}
+
+
+def test_each_order_is_matched_to_its_nearest_tick():
+    ticks = [(at(0), 500.0), (at(10), 510.0), (at(100), 600.0)]
+    orders = [(at(-1), 'A', 'alice', 500.0), (at(4), 'B', 'bob', 500.0), (at(7), 'C', 'carol', 500.0),
+              (at(50), 'D', 'dan', 510.0), (at(101), 'E', 'eve', 612.0)]
+
+    records = {r['order_id']: r for r in reconcile(orders, iter(ticks), tolerance=0.01)}
+    assert {k: r['status'] for k, r in records.items()} == \
+        {'A': 'ok', 'B': 'ok', 'C': 'mismatch', 'D': 'no_tick', 'E': 'mismatch'}
+    assert records['B']['tick_price'] == 500.0
+    assert records['C']['tick_price'] == 510.0
+    assert records['C']['diff_pct'] == pytest.approx(-1.961, abs=1e-3)
+    assert records['D']['tick_time'] == ''
+
+
+def test_ticks_are_read_once_in_order():
+    consumed = []
+
+    def ticks():
+        for h in range(0, 48, 6):
+            consumed.append(h)
+            yield at(h), 500.0
+
+    orders = [(at(h), str(h), 'alice', 500.0) for h in (1, 13, 25, 37)]
+    assert [r['tick_time'] for r in reconcile(orders, ticks())] == \
+        [at(h).strftime('%Y-%m-%d %H:%M:%S') for h in (0, 12, 24, 36)]
+    # Up to the first tick after the last order, and no further
+    assert consumed == list(range(0, 43, 6))
+
+
+def test_iter_ticks_parses_daily_gold(tmp_path):
+    path = tmp_path / 'DailyGold.csv'
+    path.write_text('Date,Price\n00/00/12/01/01/2026,509.54\nbroken\n00/30/13/01/01/2026,511.38\n')
+    assert list(iter_ticks(str(path))) == [(at(0), 509.54), (at(1.5), 511.38)]
+
+
+def test_main_writes_flagged_orders(tmp_path, make_order, monkeypatch, capsys):
+    store = CsvOrderStore(path=str(tmp_path / 'orders.csv'), partitions_dir=str(tmp_path / 'partitions'))
+    store.add_orders([make_order('A1', 'alice', '2026-01-01 12:00:00'),
+                      make_order('B1', 'bob', '2026-01-01 13:00:00')])
+    price = ORDER_COLUMNS.index('gold_price_gram')
+    good = make_order('C1', 'carol', '2026-01-01 14:00:00')
+    good[0][price] = '509.54'
+    store.add_orders([good])
+    monkeypatch.setattr(order_store, 'get_order_store', lambda: store)
+    monkeypatch.setattr(order_journal, 'sync_journal', lambda: None)
+    monkeypatch.setattr(reconcile_prices, 'iter_ticks', lambda: iter([(at(0), 509.54)]))
+
+    output = tmp_path / 'flagged.csv'
+    assert reconcile_prices.main(['--output', str(output)]) == 1
+
+    with open(output, newline='') as f:
+        flagged = list(csv.DictReader(f))
+    assert [(r['order_id'], r['status']) for r in flagged] == [('A1', 'mismatch'), ('B1', 'mismatch')]
+    assert 'Checked 3 orders: 1 ok, 2 mismatched' in capsys.readouterr().err
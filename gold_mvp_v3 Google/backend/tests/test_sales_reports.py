@@ -0,0 +1,135 @@
+"""Sales aggregates, the reports token and the rebuild command (sales_reports.py)"""
+
+import pytest
+from flask import Flask
+
+import orders_handler
+import sales_reports
+from order_store import CsvOrderStore, ORDER_COLUMNS
+from sales_reports import SalesAggregates, aggregate_rows
+
+
+def as_dicts(*orders):
+    return [dict(zip(ORDER_COLUMNS, row)) for rows in orders for row in rows]
+
+
+@pytest.fixture
+def sales(tmp_path):
+    return SalesAggregates(str(tmp_path / 'sales.db'))
+
+
+def by_key(rows):
+    return {row['key']: row for row in rows}
+
+
+def test_an_order_counts_once_per_bucket(make_order):
+    totals = aggregate_rows(as_dicts(make_order('A1', 'alice', items=2)))
+
+    day = totals[('2026-01-25', 'all', '')]
+    assert day[:3] == [1, 3, 30.0]
+    assert day[3:] == pytest.approx([12526.9, 588.9, 160.0])
+    assert totals[('2026-01-25', 'emirate', 'Dubai')][0] == 1
+    assert totals[('2026-01-25', 'payment_type', 'Cash on Delivery')][0] == 1
+    assert totals[('2026-01-25', 'weight', '10')][:3] == [1, 3, 30.0]
+
+
+def test_rows_without_a_date_are_skipped(make_order):
+    assert aggregate_rows(as_dicts(make_order('A1', 'alice', purchase_date=''))) == {}
+
+
+def test_record_counts_an_order_once(sales, make_order):
+    sales.record(as_dicts(make_order('A1', 'alice', items=2)))
+    sales.record(as_dicts(make_order('A1', 'alice', items=2), make_order('B1', 'bob')))
+
+    [day] = sales.report('day', '2026-01-01', '2026-01-31')
+    assert (day['key'], day['orders'], day['bars']) == ('2026-01-25', 2, 4)
+
+
+def test_report_groups_by_dimension_within_the_range(sales, make_order):
+    dubai = make_order('A1', 'alice', '2026-01-10 09:00:00')
+    sharjah = make_order('B1', 'bob', '2026-01-20 09:00:00')
+    sharjah[0][ORDER_COLUMNS.index('emirate')] = 'Sharjah'
+    sales.record(as_dicts(dubai, sharjah, make_order('C1', 'carol', '2026-02-01 09:00:00')))
+
+    assert sorted(by_key(sales.report('day', '2026-01-01', '2026-01-31'))) == ['2026-01-10', '2026-01-20']
+    emirates = by_key(sales.report('emirate', '2026-01-01', '2026-01-31'))
+    assert {k: v['orders'] for k, v in emirates.items()} == {'Dubai': 1, 'Sharjah': 1}
+    assert by_key(sales.report('emirate', '2026-01-15', '2026-02-28'))['Dubai']['orders'] == 1
+
+
+def test_rebuild_replaces_the_aggregates(sales, make_order):
+    sales.record(as_dicts(make_order('A1', 'alice'), make_order('B1', 'bob')))
+
+    assert sales.rebuild(as_dicts(make_order('A1', 'alice', items=2))) == 2
+    [day] = sales.report('day', '2026-01-01', '2026-01-31')
+    assert (day['orders'], day['bars']) == (1, 3)
+
+    # B1 was not in the rebuild, so it is counted when it arrives
+    sales.record(as_dicts(make_order('A1', 'alice', items=2), make_order('B1', 'bob')))
+    [day] = sales.report('day', '2026-01-01', '2026-01-31')
+    assert (day['orders'], day['bars']) == (2, 4)
+
+
+# ============== ROUTES ==============
+
+@pytest.fixture
+def client(sales, tmp_path, monkeypatch, make_order):
+    store = CsvOrderStore(path=str(tmp_path / 'orders.csv'), partitions_dir=str(tmp_path / 'partitions'))
+    store.add_orders([make_order('A1', 'alice')])
+    sales.record(as_dicts(make_order('A1', 'alice')))
+    monkeypatch.setattr(sales_reports, '_aggregates', sales)
+    monkeypatch.setattr(orders_handler, 'get_order_store', lambda: store)
+    monkeypatch.setattr(orders_handler, 'sync_journal', lambda: None)
+
+    app = Flask(__name__)
+    app.register_blueprint(sales_reports.reports_bp)
+    app.register_blueprint(orders_handler.orders_bp)
+    return app.test_client()
+
+
+ROUTES = ['/reports/sales?from=2026-01-01&to=2026-01-31', '/orders/export?format=ndjson']
+
+
+@pytest.mark.parametrize('path', ROUTES)
+def test_reports_are_disabled_without_a_token(client, path, monkeypatch):
+    monkeypatch.setattr(sales_reports, 'REPORTS_TOKEN', '')
+    assert client.get(path, headers={'X-Reports-Token': ''}).status_code == 503
+
+
+@pytest.mark.parametrize('path', ROUTES)
+@pytest.mark.parametrize('headers', [{}, {'X-Reports-Token': 'wrong'}])
+def test_reports_need_the_token(client, path, headers, monkeypatch):
+    monkeypatch.setattr(sales_reports, 'REPORTS_TOKEN', 's3cret')
+    assert client.get(path, headers=headers).status_code == 401
+
+
+def test_sales_report_with_the_token(client, monkeypatch):
+    monkeypatch.setattr(sales_reports, 'REPORTS_TOKEN', 's3cret')
+    response = client.get(ROUTES[0], headers={'X-Reports-Token': 's3cret'})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [row['key'] for row in body['rows']] == ['2026-01-25']
+    assert body['totals']['orders'] == 1
+    assert body['totals']['revenue'] == 6263.45
+
+
+def test_export_with_the_token(client, monkeypatch):
+    monkeypatch.setattr(sales_reports, 'REPORTS_TOKEN', 's3cret')
+    response = client.get(ROUTES[1], headers={'X-Reports-Token': 's3cret'})
+    assert response.status_code == 200
+    assert b'"order_id": "A1"' in response.data
+
+
+def test_bad_report_parameters(client, monkeypatch):
+    monkeypatch.setattr(sales_reports, 'REPORTS_TOKEN', 's3cret')
+    headers = {'X-Reports-Token': 's3cret'}
+    assert client.get('/reports/sales?by=customer', headers=headers).status_code == 400
+    assert client.get('/reports/sales?from=01/01/2026', headers=headers).status_code == 400
+
+
+# ============== REBUILD COMMAND ==============
+
+def test_rebuild_command(run_rebuild, make_order):
+    conn = run_rebuild('sales_reports', [make_order('A1', 'alice', items=2), make_order('B1', 'bob')])
+    assert conn.execute("SELECT orders, bars FROM sales_daily WHERE dimension = 'all'").fetchall() == [(2, 4)]
+    assert conn.execute("SELECT COUNT(*) FROM sales_orders").fetchone() == (2,)
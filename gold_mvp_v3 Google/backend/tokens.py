@@ -5,7 +5,8 @@ Secure token generation and verification using itsdangerous
 """
 
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
-from config import SECRET_KEY, EMAIL_VERIFICATION_EXPIRATION, PASSWORD_RESET_EXPIRATION
+from config import (SECRET_KEY, EMAIL_VERIFICATION_EXPIRATION, PASSWORD_RESET_EXPIRATION, PRICE_QUOTE_EXPIRATION,
+                    PRICE_ALERT_CONFIRM_EXPIRATION)
 
 # Token serializer
 serializer = URLSafeTimedSerializer(SECRET_KEY)
@@ -128,3 +129,103 @@ def verify_remember_me_token(token, max_age_days=30):
         return None
     except (SignatureExpired, BadSignature, ValueError):
         return None
+
+
+def generate_price_quote_token(quote):
+    """
+    Generate a signed price quote for checkout
+    
+    Args:
+        quote: dict with the quoted price and the tick it came from
+        
+    Returns:
+        str: URL-safe token
+    """
+    return serializer.dumps(quote, salt='price-quote')
+
+
+def verify_price_quote_token(token, expiration=PRICE_QUOTE_EXPIRATION):
+    """
+    Verify a price quote token
+    
+    Args:
+        token: The quote token
+        expiration: Max age in seconds (default: 15 minutes)
+        
+    Returns:
+        dict: The quote if valid
+        None: If invalid or expired
+    """
+    try:
+        return serializer.loads(
+            token,
+            salt='price-quote',
+            max_age=expiration
+        )
+    except (SignatureExpired, BadSignature):
+        return None
+
+
+def generate_alert_cancel_token(alert_id):
+    """
+    Generate the token that authorizes cancelling one price alert
+    
+    Args:
+        alert_id: The alert's id
+        
+    Returns:
+        str: URL-safe token
+    """
+    return serializer.dumps(alert_id, salt='price-alert-cancel')
+
+
+def verify_alert_cancel_token(token, alert_id):
+    """
+    Verify a price alert cancel token (valid for as long as the alert exists)
+    
+    Args:
+        token: The cancel token
+        alert_id: The alert being cancelled
+        
+    Returns:
+        bool: True if the token was issued for this alert
+    """
+    try:
+        return serializer.loads(token, salt='price-alert-cancel') == alert_id
+    except BadSignature:
+        return False
+
+
+def generate_alert_confirm_token(alert_id):
+    """
+    Generate the token, sent to the subscriber's email, that activates a price alert
+    
+    Args:
+        alert_id: The alert's id
+        
+    Returns:
+        str: URL-safe token
+    """
+    return serializer.dumps(alert_id, salt='price-alert-confirm')
+
+
+def verify_alert_confirm_token(token, expiration=PRICE_ALERT_CONFIRM_EXPIRATION):
+    """
+    Verify a price alert confirmation token
+    
+    Args:
+        token: The token to verify
+        expiration: Max age in seconds (default: 24 hours)
+        
+    Returns:
+        str: Alert id if valid
+        None: If token is invalid or expired
+    """
+    try:
+        return serializer.loads(
+            token,
+            salt='price-alert-confirm',
+            max_age=expiration
+        )
+    except (SignatureExpired, BadSignature):
+        return None
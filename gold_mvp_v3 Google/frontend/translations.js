@@ -245,6 +245,7 @@ const VitaNovaLang = (function() {
       alertCopied: "تم نسخ ملخص الطلب.",
       alertCopyFailed: "لم يتم النسخ. انسخ يدويًا من صفحة الملخص.",
       alertInvalidPrice: "سعر غير صالح.",
+      alertQuoteUnavailable: "تعذر الحصول على سعر حالي. من فضلك حاول مرة أخرى.",
       alertPriceSaved: "تم حفظ السعر اليدوي.",
       alertManualMode: "تم تفعيل الوضع اليدوي.",
       alertApiMode: "تم تفعيل وضع API. سيتم التحديث كل 60 ثانية.",
@@ -502,6 +503,7 @@ const VitaNovaLang = (function() {
       alertCopied: "Order summary copied.",
       alertCopyFailed: "Copy failed. Please copy manually from the summary page.",
       alertInvalidPrice: "Invalid price.",
+      alertQuoteUnavailable: "Could not get a current price quote. Please try again.",
       alertPriceSaved: "Manual price saved.",
       alertManualMode: "Manual mode activated.",
       alertApiMode: "API mode activated. Will update every 60 seconds.",